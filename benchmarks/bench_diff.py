@@ -0,0 +1,49 @@
+# Measures how long a FrameDiffer takes to find the changed tiles of a
+# screen capture and of a 3840x2160 (4K) frame, compared to finding the
+# changed area of two 4K Pillow Images with ImageChops.difference(). The
+# FrameDiffer only keeps a signature of each tile of the previous frame, not
+# its pixels. This needs NumPy. On Linux, run this with the DISPLAY
+# environment variable set (an Xvfb display works fine):
+#
+#     python benchmarks/bench_diff.py
+
+from __future__ import division, print_function
+import itertools, timeit
+import numpy
+import mouseinfo
+
+
+def timePerCall(func, number):
+    # Returns the best average seconds-per-call out of three runs.
+    func()
+    return min(timeit.repeat(func, repeat=3, number=number)) / number
+
+
+def run(number=10):
+    from PIL import Image, ImageChops
+
+    results = {}
+    differ = mouseinfo.createFrameDiffer()
+    results['diff() of the screen'] = timePerCall(differ.diff, number)
+
+    frame = numpy.zeros((2160, 3840, 3), dtype=numpy.uint8)
+    changedFrame = frame.copy()
+    changedFrame[1000:1020, 2000:2100] = 255 # Something like a changed line of text.
+    frames = itertools.cycle([frame, changedFrame]) # Every diff() has a change to find.
+    differ = mouseinfo.createFrameDiffer()
+    results['diff() of a 3840x2160 frame'] = timePerCall(lambda: differ.diff(next(frames)), number)
+
+    image, changedImage = Image.fromarray(frame), Image.fromarray(changedFrame)
+    results['ImageChops.difference() of 3840x2160 Images'] = timePerCall(
+        lambda: ImageChops.difference(image, changedImage).getbbox(), number)
+    return results
+
+
+def main():
+    results = run()
+    for name, seconds in sorted(results.items()):
+        print('%-45s %10.3f ms per call' % (name, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+# Compares reading 100 nearby pixels with getPixel() against reading them
+# with getPixel(maxAge=...), which reads them from the frame cache, and
+# taking a full screenshot with and without the cache. With the cache, the
+# first pixel captures the tile around it and the rest are free. On Linux,
+# run this with the DISPLAY environment variable set (an Xvfb display works
+# fine):
+#
+#     python benchmarks/bench_framecache.py
+
+from __future__ import division, print_function
+import timeit
+import mouseinfo
+
+
+def timePerCall(func, number):
+    # Returns the best average seconds-per-call out of three runs.
+    func()
+    return min(timeit.repeat(func, repeat=3, number=number)) / number
+
+
+def run(number=20):
+    # 100 points along a short mouse movement, all in one tile.
+    points = [(200 + i // 4, 200 + i // 5) for i in range(100)]
+    cache = mouseinfo.getFrameCache()
+
+    def cachedPixels():
+        cache.invalidate() # Make every call pay for one capture, as if the screen had changed.
+        return [mouseinfo.getPixel(x, y, maxAge=0.05) for x, y in points]
+
+    results = {}
+    results['getPixel() x 100'] = timePerCall(lambda: [mouseinfo.getPixel(x, y) for x, y in points], number)
+    results['getPixel(maxAge=0.05) x 100'] = timePerCall(cachedPixels, number)
+    results['screenshot()'] = timePerCall(mouseinfo.screenshot, number)
+    results['screenshot(maxAge=0.05) of a cached frame'] = timePerCall(lambda: mouseinfo.screenshot(maxAge=0.05), number)
+    cache.clear()
+    return results
+
+
+def main():
+    results = run()
+    for name, seconds in sorted(results.items()):
+        print('%-45s %10.3f ms per call' % (name, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
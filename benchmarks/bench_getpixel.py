@@ -0,0 +1,42 @@
+# Compares the per-call latency of the native X11 getPixel() path with the
+# old screenshot-based path. Run this on Linux with the DISPLAY environment
+# variable set (an Xvfb display works fine) and scrot installed:
+#
+#     python benchmarks/bench_getpixel.py
+
+from __future__ import division, print_function
+import os, sys, timeit
+import mouseinfo
+
+
+def timePerCall(func, number):
+    # Returns the best average seconds-per-call out of three runs.
+    func() # Warm up any caches (such as the pixel format lookup) before timing.
+    return min(timeit.repeat(func, repeat=3, number=number)) / number
+
+
+def run(number=20):
+    x, y = mouseinfo.position()
+    results = {}
+    results['getPixel'] = timePerCall(lambda: mouseinfo.getPixel(x, y), number)
+    if 'DISPLAY' not in os.environ:
+        return results # Only the selected backend (such as the fake display) can be timed without X.
+    results['xlibGetPixel'] = timePerCall(lambda: mouseinfo._xlibGetPixel(x, y), number)
+    if mouseinfo._programExists('scrot'):
+        results['scrotGetPixel'] = timePerCall(lambda: mouseinfo._scrotScreenshot().getpixel((x, y)), max(1, number // 10))
+    return results
+
+
+def main():
+    if not sys.platform.startswith('linux'):
+        sys.exit('This benchmark only applies to Linux.')
+
+    results = run()
+    for name, seconds in sorted(results.items()):
+        print('%-20s %10.3f ms per call' % (name, seconds * 1000))
+    if 'scrotGetPixel' in results:
+        print('Native path is %.0fx faster than the scrot screenshot path.' % (results['scrotGetPixel'] / results['xlibGetPixel']))
+
+
+if __name__ == '__main__':
+    main()
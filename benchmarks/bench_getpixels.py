@@ -0,0 +1,40 @@
+# Compares reading the colors of 50 points with one getPixels() call against
+# 50 getPixel() calls, and reading a region with getRegionPixels() against
+# screenshot(). getPixels() does a single capture, so 50 nearby points
+# should cost about the same as one. On Linux, run this with the DISPLAY
+# environment variable set (an Xvfb display works fine):
+#
+#     python benchmarks/bench_getpixels.py
+
+from __future__ import division, print_function
+import timeit
+import mouseinfo
+
+
+def timePerCall(func, number):
+    # Returns the best average seconds-per-call out of three runs.
+    func()
+    return min(timeit.repeat(func, repeat=3, number=number)) / number
+
+
+def run(number=20):
+    # 50 points spread over a 200x200 area, such as the indicators of a UI.
+    points = [(100 + (i % 10) * 20, 100 + (i // 10) * 40) for i in range(50)]
+    results = {}
+    results['getPixel() x 1'] = timePerCall(lambda: mouseinfo.getPixel(*points[0]), number)
+    results['getPixel() x 50'] = timePerCall(lambda: [mouseinfo.getPixel(x, y) for x, y in points], number)
+    results['getPixels() of 1 point'] = timePerCall(lambda: mouseinfo.getPixels(points[:1]), number)
+    results['getPixels() of 50 points'] = timePerCall(lambda: mouseinfo.getPixels(points), number)
+    results['getRegionPixels() of 64x64'] = timePerCall(lambda: mouseinfo.getRegionPixels((100, 100, 64, 64)), number)
+    results['screenshot() of 64x64'] = timePerCall(lambda: mouseinfo.screenshot(region=(100, 100, 64, 64)), number)
+    return results
+
+
+def main():
+    results = run()
+    for name, seconds in sorted(results.items()):
+        print('%-30s %10.3f ms per call' % (name, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
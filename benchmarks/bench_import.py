@@ -0,0 +1,56 @@
+# Measures how long "import mouseinfo" takes in a new Python process, and
+# which of the modules it imports take the longest. Importing mouseinfo
+# should be fast and shouldn't connect to the X server, since every
+# "import pyautogui" imports mouseinfo too. This uses the -X importtime
+# option, so it needs Python 3.7 or later:
+#
+#     python benchmarks/bench_import.py
+
+from __future__ import division, print_function
+import os, subprocess, sys
+import mouseinfo
+
+
+def importTimes(moduleName='mouseinfo'):
+    # Returns a dictionary that maps the name of every module imported by
+    # "import moduleName" to its (self, cumulative) import time in seconds.
+    env = dict(os.environ)
+    packageDir = os.path.dirname(os.path.dirname(os.path.abspath(mouseinfo.__file__)))
+    env['PYTHONPATH'] = os.pathsep.join([packageDir] + [path for path in [env.get('PYTHONPATH')] if path])
+    proc = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', 'import ' + moduleName],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    if proc.returncode != 0:
+        raise Exception('Could not import %s:\n%s' % (moduleName, stderr))
+
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        selfTime, cumulativeTime, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(selfTime) / 1000000, int(cumulativeTime) / 1000000)
+    return times
+
+
+def run(number=5):
+    # The first run also writes the .pyc files, so it's left out.
+    importTimes()
+    return {'import mouseinfo': min(importTimes()['mouseinfo'][1] for i in range(number))}
+
+
+def main():
+    if sys.version_info < (3, 7):
+        sys.exit('This benchmark requires Python 3.7 or later.')
+    results = run()
+    for name, seconds in sorted(results.items()):
+        print('%-30s %10.3f ms' % (name, seconds * 1000))
+
+    print()
+    print('Slowest imports (cumulative):')
+    times = importTimes()
+    for name in sorted(times, key=lambda name: times[name][1], reverse=True)[:10]:
+        print('    %-26s %10.3f ms' % (name, times[name][1] * 1000))
+
+
+if __name__ == '__main__':
+    main()
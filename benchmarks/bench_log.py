@@ -0,0 +1,55 @@
+# Measures the time it takes to log an entry in the MouseInfo window as the
+# log grows to 100,000 entries. Each entry should take about the same time
+# whether it's the first or the 100,000th. The Text widget timings are
+# skipped if tkinter can't open a window (e.g. when DISPLAY isn't set):
+#
+#     python benchmarks/bench_log.py
+
+from __future__ import division, print_function
+import mouseinfo
+
+ENTRIES = 100000
+WINDOW = 1000 # The number of entries timed at the start and end of the log.
+
+
+def timePerEntry(logBuffer):
+    # Returns the average seconds-per-append of the first WINDOW entries and
+    # of the last WINDOW entries.
+    startTimes = []
+    for i in range(ENTRIES):
+        if i in (0, WINDOW, ENTRIES - WINDOW):
+            startTimes.append(mouseinfo._timer())
+        logBuffer.append('%s,%s (255, 255, 255) #FFFFFF' % (i, i))
+    endTime = mouseinfo._timer()
+    return (startTimes[1] - startTimes[0]) / WINDOW, (endTime - startTimes[2]) / WINDOW
+
+
+def run():
+    results = {}
+    first, last = timePerEntry(mouseinfo.LogBuffer())
+    results['LogBuffer (first %s entries)' % (WINDOW)] = first
+    results['LogBuffer (last %s entries)' % (WINDOW)] = last
+
+    try:
+        mouseinfo._importTkinter()
+        root = mouseinfo.tkinter.Tk()
+    except Exception:
+        return results # tkinter can't open a window here.
+    try:
+        textWidget = mouseinfo.tkinter.Text(root)
+        first, last = timePerEntry(mouseinfo.LogBuffer(textWidget))
+        results['Text widget (first %s entries)' % (WINDOW)] = first
+        results['Text widget (last %s entries)' % (WINDOW)] = last
+    finally:
+        root.destroy()
+    return results
+
+
+def main():
+    results = run()
+    for name, seconds in sorted(results.items()):
+        print('%-36s %10.3f us per entry' % (name, seconds * 1000000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# Compares screenshot(), which allocates a new Image for every capture,
+# with leaseScreenshot(), which decodes the capture into an Image reused
+# from the frame pool, for the whole screen and for a 64x64 region. On
+# Linux, run this with the DISPLAY environment variable set (an Xvfb display
+# works fine):
+#
+#     python benchmarks/bench_pool.py
+
+from __future__ import division, print_function
+import timeit
+import mouseinfo
+
+
+def timePerCall(func, number):
+    # Returns the best average seconds-per-call out of three runs.
+    func()
+    return min(timeit.repeat(func, repeat=3, number=number)) / number
+
+
+def leaseAndRelease(region=None):
+    mouseinfo.leaseScreenshot(region).release()
+
+
+def run(number=10):
+    results = {}
+    results['screenshot()'] = timePerCall(mouseinfo.screenshot, number)
+    results['leaseScreenshot()'] = timePerCall(leaseAndRelease, number)
+    results['screenshot() of 64x64'] = timePerCall(lambda: mouseinfo.screenshot(region=(100, 100, 64, 64)), number * 10)
+    results['leaseScreenshot() of 64x64'] = timePerCall(lambda: leaseAndRelease((100, 100, 64, 64)), number * 10)
+    return results
+
+
+def main():
+    results = run()
+    for name, seconds in sorted(results.items()):
+        print('%-30s %10.3f ms per call' % (name, seconds * 1000))
+    pool = mouseinfo.getFramePool()
+    print('The frame pool allocated %s Images for %s captures.' % (pool.allocations, pool.leases))
+
+
+if __name__ == '__main__':
+    main()
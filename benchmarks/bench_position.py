@@ -0,0 +1,45 @@
+# Measures the throughput of position(), size(), getMonitors(), and
+# monitorAt() with the backends that MouseInfo selects, and of position()
+# and size() with every other available backend. These are called on every
+# update of the MouseInfo window, so they should take microseconds, not
+# milliseconds. On Linux, run this with the DISPLAY environment variable set
+# (an Xvfb display works fine):
+#
+#     python benchmarks/bench_position.py
+
+from __future__ import division, print_function
+import timeit
+import mouseinfo
+
+
+def timePerCall(func, number):
+    # Returns the best average seconds-per-call out of three runs.
+    func()
+    return min(timeit.repeat(func, repeat=3, number=number)) / number
+
+
+def run(number=1000):
+    results = {}
+    results['position()'] = timePerCall(mouseinfo.position, number)
+    results['size()'] = timePerCall(mouseinfo.size, number)
+    results['getMonitors()'] = timePerCall(mouseinfo.getMonitors, number)
+    results['monitorAt()'] = timePerCall(lambda: mouseinfo.monitorAt(100, 100), number)
+    for operation in ('position', 'size'):
+        for backend in mouseinfo.getBackends(operation):
+            if not backend.isAvailable():
+                continue
+            try:
+                results['%s (%s)' % (operation, backend.name)] = timePerCall(getattr(backend, operation), number)
+            except Exception:
+                pass # This backend doesn't work on this system.
+    return results
+
+
+def main():
+    results = run()
+    for name, seconds in sorted(results.items()):
+        print('%-30s %10.3f us per call %12.0f calls per second' % (name, seconds * 1000000, 1 / seconds))
+
+
+if __name__ == '__main__':
+    main()
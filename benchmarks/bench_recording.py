@@ -0,0 +1,61 @@
+# Measures the binary recording format with a synthetic three hour, 100 Hz
+# session (about a million samples): how fast samples can be written, how
+# long opening the recording takes, and how long a one-second time range
+# query takes. Opening and querying should take about the same time for any
+# length of recording:
+#
+#     python benchmarks/bench_recording.py
+
+from __future__ import division, print_function
+import os, tempfile, timeit
+import mouseinfo
+
+RATE = 100
+SAMPLES = RATE * 60 * 60 * 3
+
+
+def timePerCall(func, number):
+    # Returns the best average seconds-per-call out of three runs.
+    func()
+    return min(timeit.repeat(func, repeat=3, number=number)) / number
+
+
+def writeSyntheticRecording(filename, count=SAMPLES):
+    # The mouse moves in a circle-ish path with a color that changes slowly.
+    with mouseinfo.createRecording(filename, rate=RATE) as recordingWriter:
+        for i in range(count):
+            recordingWriter.writeRecord(i / RATE, i % 1920, (i // 7) % 1080, (i % 256, 128, 255 - i % 256))
+
+
+def run():
+    results = {}
+    fd, filename = tempfile.mkstemp(suffix='.mirec')
+    os.close(fd)
+    try:
+        startTime = mouseinfo._timer()
+        writeSyntheticRecording(filename)
+        results['write (per sample)'] = (mouseinfo._timer() - startTime) / SAMPLES
+
+        def openAndClose():
+            mouseinfo.openRecording(filename).close()
+        results['openRecording()'] = timePerCall(openAndClose, 100)
+
+        recording = mouseinfo.openRecording(filename)
+        middle = SAMPLES / RATE / 2
+        results['timeRange() of 1 second'] = timePerCall(lambda: recording.timeRange(middle, middle + 1), 1000)
+        results['between() of 1 second'] = timePerCall(lambda: recording.between(middle, middle + 1), 1000)
+        recording.close()
+    finally:
+        os.unlink(filename)
+    return results
+
+
+def main():
+    results = run()
+    for name, seconds in sorted(results.items()):
+        print('%-30s %10.3f us' % (name, seconds * 1000000))
+    print('%s samples, %.1f MB' % (SAMPLES, (32 + SAMPLES * 20) / 1000000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# Compares the per-call screenshot() latency of every available capture
+# backend (such as MIT-SHM, Xlib, xwd, and scrot on Linux), for both full
+# screenshots and a small region around the mouse cursor. On Linux, run this
+# with the DISPLAY environment variable set (an Xvfb display works fine).
+# It also measures the memory each screenshot allocates: the peak that
+# tracemalloc sees while capturing (which includes the bytes read from the X
+# server by the Xlib backend) and the size of the returned image's pixels:
+#
+#     python benchmarks/bench_screenshot.py
+
+from __future__ import division, print_function
+import timeit, tracemalloc
+import mouseinfo
+
+
+def timePerCall(func, number):
+    # Returns the best average seconds-per-call out of three runs.
+    func()
+    return min(timeit.repeat(func, repeat=3, number=number)) / number
+
+
+def run(number=10):
+    results = {}
+    for backend in mouseinfo.getBackends('screenshot'):
+        if not backend.isAvailable():
+            continue
+        try:
+            results[backend.name] = timePerCall(backend.screenshot, number)
+            if backend.region:
+                region = mouseinfo.regionAround(*mouseinfo.position(), regionSize=64)
+                results[backend.name + ' (64x64 region)'] = timePerCall(lambda: backend.screenshot(None, region), number)
+        except Exception:
+            pass # This backend doesn't work on this system.
+    return results
+
+
+def peakMemory(func):
+    # Returns the peak bytes allocated while func runs, and the bytes of
+    # pixel data in the image it returns.
+    func()
+    tracemalloc.start()
+    try:
+        im = func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak, im.width * im.height * len(im.getbands())
+
+
+def runMemory():
+    results = {}
+    for backend in mouseinfo.getBackends('screenshot'):
+        if not backend.isAvailable():
+            continue
+        try:
+            peak, imageBytes = peakMemory(backend.screenshot)
+            results[backend.name + ' peak'] = peak
+            results[backend.name + ' image'] = imageBytes
+            if backend.region:
+                region = mouseinfo.regionAround(*mouseinfo.position(), regionSize=64)
+                peak, imageBytes = peakMemory(lambda: backend.screenshot(None, region))
+                results[backend.name + ' (64x64 region) peak'] = peak
+                results[backend.name + ' (64x64 region) image'] = imageBytes
+        except Exception:
+            pass # This backend doesn't work on this system.
+    return results
+
+
+def main():
+    results = run()
+    for name, seconds in sorted(results.items()):
+        print('%-30s %10.3f ms per call' % (name, seconds * 1000))
+    for name, numBytes in sorted(runMemory().items()):
+        print('%-36s %10.1f MB' % (name, numBytes / 1000000))
+
+
+if __name__ == '__main__':
+    main()
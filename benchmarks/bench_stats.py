@@ -0,0 +1,45 @@
+# Measures the overhead that latency statistics add to each position() call,
+# using a backend that does no work, so that the overhead isn't hidden by the
+# time a real capture takes. With statistics disabled, the overhead should
+# be negligible:
+#
+#     python benchmarks/bench_stats.py
+
+from __future__ import division, print_function
+import timeit
+import mouseinfo
+
+
+def timePerCall(func, number):
+    # Returns the best average seconds-per-call out of three runs.
+    func()
+    return min(timeit.repeat(func, repeat=3, number=number)) / number
+
+
+def run(number=100000):
+    results = {}
+    backend = mouseinfo.CaptureBackend('bench', position=lambda: (0, 0))
+    mouseinfo.registerBackend(backend)
+    try:
+        mouseinfo.useBackend('bench')
+        results['backend.position() (no dispatch)'] = timePerCall(backend.position, number)
+        results['position(), stats disabled'] = timePerCall(mouseinfo.position, number)
+        mouseinfo.enableStats()
+        results['position(), stats enabled'] = timePerCall(mouseinfo.position, number)
+        mouseinfo.addStatsHook(lambda name, seconds: None)
+        results['position(), stats and a hook'] = timePerCall(mouseinfo.position, number)
+    finally:
+        del mouseinfo._statsHooks[:]
+        mouseinfo.disableStats()
+        mouseinfo.unregisterBackend('bench')
+    return results
+
+
+def main():
+    results = run()
+    for name, seconds in sorted(results.items()):
+        print('%-36s %10.3f us per call' % (name, seconds * 1000000))
+
+
+if __name__ == '__main__':
+    main()
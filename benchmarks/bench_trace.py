@@ -0,0 +1,86 @@
+# Measures the compressed trace format: how much smaller a trace is than the
+# same samples in the fixed-size binary recording format, and how many MB of
+# recording-format records a second can be encoded and decoded. This uses
+# synthetic traces, plus any recording files (made with createRecording() or
+# python -m mouseinfo --headless --format binary) given on the command line:
+#
+#     python benchmarks/bench_trace.py [session.mirec ...]
+
+from __future__ import division, print_function
+import io, random, sys
+import mouseinfo
+from mouseinfo._mouseinfo_recording import RECORD_SIZE, TraceReader, TraceWriter
+
+SAMPLES = 100000
+RATE = 100
+
+
+def stillTrace():
+    # The mouse sits still over one color the whole time.
+    return [mouseinfo.Sample(i / RATE, 500, 400, (229, 241, 251)) for i in range(SAMPLES)]
+
+
+def humanTrace(seed=42):
+    # The mouse moves to a random spot over about half a second, then rests
+    # there for a few seconds. Each spot has one of a few dozen colors, and
+    # the sampling times have up to 0.3 ms of jitter.
+    rand = random.Random(seed)
+    colors = [(rand.randint(0, 255), rand.randint(0, 255), rand.randint(0, 255)) for i in range(40)]
+    samples = []
+    x, y = 0, 0
+    while len(samples) < SAMPLES:
+        targetX, targetY, color = rand.randint(0, 1919), rand.randint(0, 1079), rand.choice(colors)
+        steps = rand.randint(20, 60)
+        for step in range(1, steps + 1):
+            moveX = x + (targetX - x) * step // steps
+            moveY = y + (targetY - y) * step // steps
+            samples.append((moveX, moveY, rand.choice(colors)))
+        x, y = targetX, targetY
+        samples.extend([(x, y, color)] * rand.randint(100, 500))
+    return [mouseinfo.Sample(i / RATE + rand.random() * 0.0003, sx, sy, rgb) for i, (sx, sy, rgb) in enumerate(samples[:SAMPLES])]
+
+
+def recordedTrace(filename):
+    recording = mouseinfo.openRecording(filename)
+    records = list(recording)
+    recording.close()
+    return records
+
+
+def measure(samples):
+    # Returns (compression ratio, encode MB/s, decode MB/s), where MB are of
+    # the fixed-size recording format.
+    rawMegabytes = len(samples) * RECORD_SIZE / 1000000
+    output = io.BytesIO()
+    startTime = mouseinfo._timer()
+    traceWriter = TraceWriter(output, RATE)
+    for sample in samples:
+        traceWriter.write(sample)
+    traceWriter.close()
+    encodeSeconds = mouseinfo._timer() - startTime
+
+    output.seek(0)
+    startTime = mouseinfo._timer()
+    decodedCount = sum(1 for record in TraceReader(output))
+    decodeSeconds = mouseinfo._timer() - startTime
+    assert decodedCount == len(samples)
+    return len(samples) * RECORD_SIZE / traceWriter.bytesWritten, rawMegabytes / encodeSeconds, rawMegabytes / decodeSeconds
+
+
+def run(recordingFilenames=()):
+    results = {'synthetic, still': measure(stillTrace()),
+               'synthetic, human-like': measure(humanTrace())}
+    for filename in recordingFilenames:
+        results[filename] = measure(recordedTrace(filename))
+    return results
+
+
+def main():
+    results = run(sys.argv[1:])
+    print('%-30s %10s %12s %12s' % ('trace', 'ratio', 'encode MB/s', 'decode MB/s'))
+    for name, (ratio, encodeSpeed, decodeSpeed) in sorted(results.items()):
+        print('%-30s %9.1fx %12.1f %12.1f' % (name, ratio, encodeSpeed, decodeSpeed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# Measures how quickly waitForPixel() returns after the pixel it's waiting
+# for changes, with the X server's damage reports and with the 50 ms polling
+# it falls back to without them, and how much CPU time waiting takes. With
+# damage reports, the reaction should take well under a millisecond and the
+# waiting should take almost no CPU time. On Linux, run this with the
+# DISPLAY environment variable set (an Xvfb display works fine):
+#
+#     python benchmarks/bench_wait.py
+
+from __future__ import division, print_function
+import threading, time
+import mouseinfo
+
+_processTime = getattr(time, 'process_time', None) or time.clock # time.clock() is Python 2's CPU time.
+
+X, Y = 100, 100 # The pixel that is changed and waited for.
+
+
+def makePainter():
+    # Returns a function that sets the pixel at X, Y to a (red, green, blue)
+    # color, and a function to clean up after it. On an X server, the pixel
+    # is a 1x1 window, so drawing on it is reported like any other app's.
+    backend = mouseinfo._backendFor('getPixel')
+    if isinstance(backend, mouseinfo.FakeDisplay):
+        return lambda color: backend.setPixel(X, Y, color), lambda: None
+
+    from Xlib.display import Display
+    display = Display()
+    screen = display.screen()
+    window = screen.root.create_window(X, Y, 1, 1, 0, screen.root_depth, override_redirect=True)
+    window.map()
+    display.sync()
+
+    def paint(color):
+        pixel = screen.default_colormap.alloc_color(*[value * 257 for value in color]).pixel
+        window.fill_rectangle(window.create_gc(foreground=pixel), 0, 0, 1, 1)
+        display.sync()
+
+    def close():
+        window.destroy()
+        display.close()
+    return paint, close
+
+
+def reactionLatency(paint, trials):
+    # Returns the average seconds between painting the pixel and waitForPixel() returning.
+    latencies = []
+    for i in range(trials):
+        color = ((255, 0, 0), (0, 0, 255))[i % 2]
+        paintTimes = []
+
+        def paintLater():
+            time.sleep(0.01)
+            paintTimes.append(mouseinfo._timer())
+            paint(color)
+        thread = threading.Thread(target=paintLater)
+        thread.start()
+        mouseinfo.waitForPixel(X, Y, color, timeout=5)
+        latencies.append(mouseinfo._timer() - paintTimes[0])
+        thread.join()
+    return sum(latencies) / len(latencies)
+
+
+def waitingCpuTime(seconds=0.5):
+    # Returns the CPU seconds used per second of waiting for a pixel that never changes.
+    startTime = _processTime()
+    mouseinfo.waitForPixel(X, Y, (1, 2, 3), timeout=seconds)
+    return (_processTime() - startTime) / seconds
+
+
+def run(trials=20):
+    results = {}
+    paint, close = makePainter()
+    try:
+        paint((0, 255, 0))
+        results['waitForPixel() reaction latency'] = reactionLatency(paint, trials)
+        results['waitForPixel() CPU time per second waiting'] = waitingCpuTime()
+
+        # Hide the damage reports to measure the polling fallback.
+        backend = mouseinfo._backendFor('getPixel')
+        subscribeDamage, backend.subscribeDamage = backend.subscribeDamage, None
+        try:
+            results['waitForPixel() reaction latency (polling)'] = reactionLatency(paint, trials)
+            results['waitForPixel() CPU time per second waiting (polling)'] = waitingCpuTime()
+        finally:
+            backend.subscribeDamage = subscribeDamage
+    finally:
+        close()
+    return results
+
+
+def main():
+    results = run()
+    for name, seconds in sorted(results.items()):
+        print('%-55s %10.3f ms' % (name, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+# Measures the cost of one PixelWatcher tick with 1, 100, and 500 point
+# watches spread over a 400x400 area, and with 500 watches compared to
+# polling the same points with getPixel(). All of the watches share one
+# capture, so 500 watches should cost about the same as one. This needs
+# NumPy. On Linux, run this with the DISPLAY environment variable set (an
+# Xvfb display works fine):
+#
+#     python benchmarks/bench_watch.py
+
+from __future__ import division, print_function
+import timeit
+import mouseinfo
+
+
+def timePerCall(func, number):
+    # Returns the best average seconds-per-call out of three runs.
+    func()
+    return min(timeit.repeat(func, repeat=3, number=number)) / number
+
+
+def run(number=20):
+    points = [(100 + (i % 25) * 16, 100 + (i // 25) * 20) for i in range(500)]
+    results = {}
+    for count in (1, 100, 500):
+        watcher = mouseinfo.createPixelWatcher()
+        for point in points[:count]:
+            watcher.watch(point, color=(0, 255, 0), tolerance=10)
+        results['poll() of %s watches' % (count)] = timePerCall(watcher.poll, number)
+
+    watcher = mouseinfo.createPixelWatcher()
+    watcher.watch((100, 100, 400, 400), predicate=lambda pixels: pixels.mean() > 128)
+    results['poll() of a 400x400 predicate watch'] = timePerCall(watcher.poll, number)
+    results['getPixel() of 500 points'] = timePerCall(lambda: [mouseinfo.getPixel(x, y) for x, y in points], max(1, number // 10))
+    return results
+
+
+def main():
+    results = run()
+    for name, seconds in sorted(results.items()):
+        print('%-36s %10.3f ms per call' % (name, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
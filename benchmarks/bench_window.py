@@ -0,0 +1,67 @@
+# Measures the cost of one refresh tick of the MouseInfo window (one call to
+# _updateMouseInfoTextFields()): when there's no new sample, when a new
+# sample at the same position and color arrives, and when every sample
+# moves the mouse and changes the color. The window is opened for real, so
+# this needs a display (an Xvfb display works fine):
+#
+#     python benchmarks/bench_window.py
+
+from __future__ import division, print_function
+import mouseinfo
+
+TICKS = 300
+
+
+class _BenchmarkWindow(mouseinfo.MouseInfoWindow):
+    # Feeds each tick a sample made by makeSample() instead of a real one,
+    # times the ticks after the first few, and closes the window after
+    # TICKS of them. The ticks run about once a millisecond.
+    def __init__(self, makeSample):
+        self.makeSample = makeSample
+        self.tickCount = 0
+        self.tickSeconds = 0
+        mouseinfo.MouseInfoWindow.__init__(self, maxRate=1000, idleInterval=1)
+
+
+    def _updateMouseInfoTextFields(self):
+        sample = self.makeSample(self.tickCount)
+        self.sampler.takeLatest = lambda: sample
+        startTime = mouseinfo._timer()
+        mouseinfo.MouseInfoWindow._updateMouseInfoTextFields(self)
+        if self.tickCount >= 10: # Skip timing the first ticks, which create Tk objects.
+            self.tickSeconds += mouseinfo._timer() - startTime
+        self.tickCount += 1
+        if self.tickCount == TICKS + 10:
+            self.root.quit()
+
+
+def timePerTick(makeSample):
+    window = _BenchmarkWindow(makeSample)
+    return window.tickSeconds / TICKS
+
+
+def run():
+    try:
+        mouseinfo._importTkinter()
+        mouseinfo.tkinter.Tk().destroy()
+    except Exception:
+        return {} # tkinter can't open a window here.
+
+    results = {}
+    still = mouseinfo.Sample(0, 100, 100, (0, 0, 0), None)
+    results['tick (no new sample)'] = timePerTick(lambda i: None)
+    results['tick (unchanged sample)'] = timePerTick(lambda i: still)
+    results['tick (moved, new color)'] = timePerTick(lambda i: mouseinfo.Sample(i, i % 1000, 100, (i % 256, 0, 0), None))
+    return results
+
+
+def main():
+    results = run()
+    if not results:
+        print('tkinter could not open a window; is DISPLAY set?')
+    for name, seconds in sorted(results.items()):
+        print('%-30s %10.3f us per tick' % (name, seconds * 1000000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+# Runs the MouseInfo benchmarks on a private Xvfb display and writes the
+# results to a JSON file, so that they can be compared between versions of
+# MouseInfo and between machines. This needs Xvfb to be installed (or pass
+# --display to use a display that's already running):
+#
+#     python benchmarks/run_benchmarks.py --output results.json
+#
+# Every result is checked against the ceilings in thresholds.json, and, if
+# --baseline gives the results file of an earlier run, against that run's
+# results. Any result over its ceiling or more than --tolerance slower than
+# the baseline is a regression, and the exit code is 1 if there were any:
+#
+#     python benchmarks/run_benchmarks.py --baseline old.json --output new.json
+#
+# With --fake, the benchmarks run against the in-memory fake display (see
+# mouseinfo.useFakeDisplay()) instead of an X server, so they measure only
+# MouseInfo's own overhead and don't need Xvfb.
+
+from __future__ import division, print_function
+import argparse, collections, datetime, fnmatch, itertools, json, os, subprocess, sys, traceback
+import mouseinfo
+
+import bench_diff, bench_framecache, bench_getpixel, bench_getpixels, bench_import, bench_log, bench_pool, bench_position, bench_screenshot, bench_wait, bench_watch, bench_window
+
+# Maps each suite name to the function that runs it and the unit of its results.
+SUITES = collections.OrderedDict([
+    ('import', (bench_import.run, 's')),
+    ('position', (bench_position.run, 's')),
+    ('getpixel', (bench_getpixel.run, 's')),
+    ('getpixels', (bench_getpixels.run, 's')),
+    ('framecache', (bench_framecache.run, 's')),
+    ('screenshot', (bench_screenshot.run, 's')),
+    ('screenshotMemory', (bench_screenshot.runMemory, 'bytes')),
+    ('pool', (bench_pool.run, 's')),
+    ('watch', (bench_watch.run, 's')),
+    ('wait', (bench_wait.run, 's')),
+    ('diff', (bench_diff.run, 's')),
+    ('log', (bench_log.run, 's')),
+    ('window', (bench_window.run, 's')),
+])
+
+DEFAULT_THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'thresholds.json')
+
+
+def startXvfb(screen='1920x1080x24'):
+    # Starts Xvfb on an unused display number and returns the Popen object
+    # and the display name. Xvfb writes the number it picked to the pipe
+    # given to -displayfd once it's ready for connections.
+    if not mouseinfo._programExists('Xvfb'):
+        raise EnvironmentError('Xvfb is not installed; install it or run with --display')
+    readFd, writeFd = os.pipe()
+    proc = subprocess.Popen(['Xvfb', '-displayfd', str(writeFd), '-screen', '0', screen, '-nolisten', 'tcp'],
+                            pass_fds=(writeFd,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.close(writeFd)
+    with os.fdopen(readFd) as displayFile:
+        displayNumber = displayFile.readline().strip()
+    if not displayNumber:
+        proc.wait()
+        raise EnvironmentError('Xvfb exited with code %s before it was ready' % (proc.returncode))
+    return proc, ':' + displayNumber
+
+
+def runSuites(names):
+    # Returns a dictionary that maps "suite/benchmark" names to {'value': ...,
+    # 'unit': ...} dictionaries, and a dictionary of the suites that failed
+    # mapped to their tracebacks.
+    results = collections.OrderedDict()
+    errors = {}
+    for name in names:
+        func, unit = SUITES[name]
+        print('Running %s...' % (name), file=sys.stderr)
+        try:
+            suiteResults = func()
+        except Exception:
+            errors[name] = traceback.format_exc()
+            continue
+        for benchmark, value in sorted(suiteResults.items()):
+            results['%s/%s' % (name, benchmark)] = {'value': value, 'unit': unit}
+    return results, errors
+
+
+def findRegressions(results, thresholds=None, baseline=None, tolerance=0.25):
+    """Returns a list of dictionaries describing the results that are over
+    their ceiling in thresholds (a dictionary that maps fnmatch patterns of
+    result names to the highest allowed value) or more than tolerance (0.25
+    is 25%) higher than the same result in baseline (the "results" of an
+    earlier run)."""
+    regressions = []
+    for name, result in results.items():
+        value = result['value']
+        for pattern, ceiling in sorted((thresholds or {}).items()):
+            if fnmatch.fnmatchcase(name, pattern) and value > ceiling:
+                regressions.append({'name': name, 'value': value, 'limit': ceiling, 'reason': 'threshold %s' % (pattern)})
+        if baseline is not None and name in baseline:
+            limit = baseline[name]['value'] * (1 + tolerance)
+            if value > limit:
+                regressions.append({'name': name, 'value': value, 'limit': limit, 'reason': 'baseline'})
+    return regressions
+
+
+def _formatValue(value, unit):
+    if unit == 'bytes':
+        return '%.3f MB' % (value / 1000000)
+    return '%.3f us' % (value * 1000000)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the MouseInfo benchmarks on a private Xvfb display.')
+    parser.add_argument('--output', '-o', default=None,
+                        help='file to write the JSON results to (default: print them only)')
+    parser.add_argument('--suite', action='append', dest='suites', choices=list(SUITES),
+                        help='run only this suite; can be given more than once (default: all of them)')
+    parser.add_argument('--display', default=None,
+                        help='use this X display instead of starting Xvfb')
+    parser.add_argument('--fake', action='store_true',
+                        help='use the in-memory fake display instead of an X server')
+    parser.add_argument('--screen', default='1920x1080x24', metavar='WIDTHxHEIGHTxDEPTH',
+                        help='screen size and depth of the Xvfb display (default: 1920x1080x24)')
+    parser.add_argument('--thresholds', default=DEFAULT_THRESHOLDS,
+                        help='JSON file of the highest allowed result values (default: benchmarks/thresholds.json)')
+    parser.add_argument('--baseline', default=None,
+                        help='results file of an earlier run to compare these results to')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='how much higher than the baseline a result can be, as a fraction (default: 0.25)')
+    args = parser.parse_args(argv)
+
+    xvfb = None
+    if args.fake:
+        fakeDisplay = mouseinfo.useFakeDisplay()
+        fakeDisplay.setPath(((i % fakeDisplay.width, i // 7 % fakeDisplay.height) for i in itertools.count()))
+        display = 'fake'
+    elif args.display is not None:
+        os.environ['DISPLAY'] = display = args.display
+    elif sys.platform.startswith('linux'):
+        try:
+            xvfb, display = startXvfb(args.screen)
+        except EnvironmentError as e:
+            parser.error(str(e))
+        os.environ['DISPLAY'] = display
+    else:
+        display = None # There's no X display on Windows and macOS.
+    try:
+        results, errors = runSuites(args.suites or list(SUITES))
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+
+    with open(args.thresholds) as fileObj:
+        thresholds = json.load(fileObj)['thresholds']
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline) as fileObj:
+            baseline = json.load(fileObj)['results']
+    regressions = findRegressions(results, thresholds, baseline, args.tolerance)
+
+    for name, result in results.items():
+        print('%-50s %14s' % (name, _formatValue(result['value'], result['unit'])))
+    for name, error in sorted(errors.items()):
+        print('Suite %s failed:\n%s' % (name, error), file=sys.stderr)
+    for regression in regressions:
+        unit = results[regression['name']]['unit']
+        print('REGRESSION: %s is %s, over %s (%s)' % (regression['name'], _formatValue(regression['value'], unit),
+                                                      _formatValue(regression['limit'], unit), regression['reason']))
+
+    if args.output is not None:
+        report = {'mouseinfo': mouseinfo.__version__,
+                  'python': sys.version.split()[0],
+                  'platform': sys.platform,
+                  'display': 'Xvfb %s' % (args.screen) if xvfb is not None else display,
+                  'time': datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+                  'results': results,
+                  'errors': errors,
+                  'regressions': regressions}
+        with open(args.output, 'w') as fileObj:
+            json.dump(report, fileObj, indent=2)
+    return 1 if regressions or errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
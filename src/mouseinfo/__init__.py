@@ -16,13 +16,17 @@ Features that have been considered and rejected:
 """
 
 __version__ = '0.1.4'
-import pyperclip, sys, os, platform, webbrowser
+import sys, os
 
 #from enum import Enum
-from ctypes import (
-    c_bool, c_int32, c_int64, c_size_t, c_uint16, c_uint32, c_void_p,
-    cdll, util,
-)
+
+# NOTE: Importing mouseinfo must be fast and have no side effects, since
+# every "import pyautogui" imports it too. Pillow, tkinter, pyperclip, the
+# platform libraries, and the display connection are all imported or opened
+# the first time they're needed instead of here. The module attributes that
+# used to be set while importing (tkinter, ttk, Event, _PILLOW_INSTALLED,
+# and on Linux, scrotExists and xwdExists) are provided by the module's
+# __getattr__() at the end of this file on Python 3.7 and later.
 
 # =========================================================================
 # Originally, these functions were pulled in from PyAutoGUI. However, to
@@ -35,57 +39,534 @@ from ctypes import (
 # Alternatively, this code makes this application not dependent on PyAutoGUI
 # by copying the code for the position() and screenshot() functions into this
 # source code file.
-import datetime, subprocess
 
-try:
-    from PIL import Image
-    _PILLOW_INSTALLED = True
-except ImportError:
-    _PILLOW_INSTALLED = False
+_pillowInstalledCache = None # None means we haven't tried importing Pillow yet.
+
+def _pillowInstalled():
+    # Returns True if Pillow can be imported. Importing Pillow is slow, so this
+    # isn't done until the first time it's needed.
+    global _pillowInstalledCache
+    if _pillowInstalledCache is None:
+        try:
+            from PIL import Image
+            _pillowInstalledCache = True
+        except ImportError:
+            _pillowInstalledCache = False
+    return _pillowInstalledCache
+
+# =========================================================================
+# Capture backends
+#
+# Each platform can read the mouse position, the screen size, and screen
+# pixels in more than one way (for example, on Linux: scrot, Xlib's
+# get_image(), or the MIT-SHM extension). Each of these ways is registered as
+# a named CaptureBackend, and the module-level position(), size(),
+# screenshot(), and getPixel() functions call whichever backend is selected
+# for that operation.
+#
+# By default, the first available backend that was registered for an
+# operation is used. A backend can be pinned with useBackend() or with the
+# MOUSEINFO_BACKEND environment variable (either a backend name like "xshm",
+# or per-operation names like "screenshot=xshm,getPixel=xlib"). Alternatively,
+# calibrateBackends() times every available backend and selects the fastest
+# one for each operation. Setting the MOUSEINFO_CALIBRATE environment
+# variable to 1 runs this calibration automatically the first time each
+# operation is used.
+import array, bisect, collections, itertools, math, threading, time
+
+OPERATIONS = ('position', 'size', 'screenshot', 'getPixel')
+
+# time.perf_counter() doesn't exist in Python 2.
+_timer = getattr(time, 'perf_counter', time.time)
+
+class CaptureBackend(object):
+    """A named way of getting the mouse position, screen size, screenshots,
+    and pixel colors. Operations the backend can't do are left as None.
+
+    region is True if the backend's screenshot function accepts a (left, top,
+    width, height) region argument and captures just that part of the
+    screen. Screenshots of a region from other backends are cropped from a
+    full screenshot. cursorFree is True if its screenshots never include
+    the mouse cursor. isAvailable is an optional function that returns False
+    (or raises an exception) if the backend can't be used on this system.
+
+    monitors is a function that returns a list of Monitor namedtuples, with
+    the primary monitor first. getMonitors() calls it on the backend selected
+    for size(). It should cache the list and return the same list object
+    until the monitor layout changes, since the MonitorIndex is only rebuilt
+    when the list is a different one.
+
+    rawPixels is an optional function that captures a (left, top, width,
+    height) region and returns a (buffer, offset, bytesPerLine, rawmode)
+    tuple without converting it to an Image: the region's top-left pixel
+    starts offset bytes into buffer, each row is bytesPerLine bytes after
+    the previous one, and rawmode ('RGB' or 'BGRX') is the byte order of each
+    pixel. The buffer only has to stay valid until the next capture.
+    getPixels() and getRegionPixels() use it when this backend is selected
+    for screenshot().
+
+    subscribeDamage is an optional function that takes a (left, top, width,
+    height) region and a callback, and calls callback() (on any thread)
+    whenever that region of the screen may have changed, until close() is
+    called on the object it returns. It returns None if it can't report
+    changes after all. waitForPixel() and waitForRegionChange() use it to
+    sleep until the screen changes instead of checking it over and over."""
+
+    def __init__(self, name, position=None, size=None, screenshot=None, getPixel=None,
+                 region=False, cursorFree=False, isAvailable=None, monitors=None, rawPixels=None,
+                 subscribeDamage=None):
+        self.name = name
+        self.position = position
+        self.size = size
+        self.screenshot = screenshot
+        self.getPixel = getPixel
+        self.monitors = monitors
+        self.rawPixels = rawPixels
+        self.subscribeDamage = subscribeDamage
+        self.region = region
+        self.cursorFree = cursorFree
+        self._isAvailableFunc = isAvailable
+        self._available = None # None means availability hasn't been checked yet.
+
+
+    def supports(self, operation):
+        """Returns True if this backend implements operation, which is one of
+        'position', 'size', 'screenshot', or 'getPixel'."""
+        return getattr(self, operation, None) is not None
+
+
+    def capabilities(self):
+        """Returns a set of strings describing what this backend can do:
+        'fullFrame', 'region', 'singlePixel', 'cursorFree', 'position',
+        'size', 'monitors', and 'damage'."""
+        caps = set()
+        if self.screenshot is not None:
+            caps.add('fullFrame')
+            if self.region:
+                caps.add('region')
+            if self.cursorFree:
+                caps.add('cursorFree')
+        if self.getPixel is not None:
+            caps.add('singlePixel')
+        if self.position is not None:
+            caps.add('position')
+        if self.size is not None:
+            caps.add('size')
+        if self.monitors is not None:
+            caps.add('monitors')
+        if self.subscribeDamage is not None:
+            caps.add('damage')
+        return caps
+
+
+    def isAvailable(self):
+        """Returns True if this backend works on this system. The check is
+        only done once."""
+        if self._available is None:
+            try:
+                self._available = self._isAvailableFunc is None or bool(self._isAvailableFunc())
+            except Exception:
+                self._available = False
+        return self._available
+
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.name)
+
+
+_backends = [] # All registered CaptureBackend objects, in order of preference.
+_selectedBackends = {} # Maps an operation name to the CaptureBackend used for it.
+_pinnedBackends = {} # Maps an operation name to the backend name pinned by useBackend() or MOUSEINFO_BACKEND.
+_backendCosts = {} # Maps (backendName, operation) to the seconds per call measured by calibrateBackends().
+_backendEnvParsed = False
+
+
+def registerBackend(backend):
+    """Add a CaptureBackend to the registry. If a backend with the same name
+    is already registered, it is replaced. Backends registered earlier are
+    preferred over later ones until calibrateBackends() is run."""
+    for i, existing in enumerate(_backends):
+        if existing.name == backend.name:
+            _backends[i] = backend
+            break
+    else:
+        _backends.append(backend)
+
+    # Let the next call of each operation pick a backend again.
+    for operation, selected in list(_selectedBackends.items()):
+        if selected.name == backend.name:
+            del _selectedBackends[operation]
+
+
+def unregisterBackend(name):
+    """Remove the named CaptureBackend from the registry, along with any
+    selection or pin that refers to it."""
+    _backends.remove(getBackend(name))
+    for operation, selected in list(_selectedBackends.items()):
+        if selected.name == name:
+            del _selectedBackends[operation]
+    for operation, pinnedName in list(_pinnedBackends.items()):
+        if pinnedName == name:
+            del _pinnedBackends[operation]
+
+
+def getBackend(name):
+    """Returns the registered CaptureBackend with the given name. Raises
+    ValueError if there isn't one."""
+    for backend in _backends:
+        if backend.name == name:
+            return backend
+    raise ValueError('No capture backend named %r. Registered backends: %s' % (name, ', '.join(b.name for b in _backends)))
+
+
+def getBackends(operation=None):
+    """Returns a list of the registered CaptureBackends, in order of
+    preference. If operation is given, only the backends that support it are
+    returned."""
+    if operation is None:
+        return list(_backends)
+    return [backend for backend in _backends if backend.supports(operation)]
+
+
+def useBackend(name, operations=None):
+    """Pin the named backend for the given operations (by default, every
+    operation the backend supports). Passing None for name unpins the
+    operations so that a backend is picked automatically again."""
+    if operations is None:
+        operations = OPERATIONS if name is None else [op for op in OPERATIONS if getBackend(name).supports(op)]
+    elif isinstance(operations, str):
+        operations = [operations]
+
+    _parseBackendEnv() # Make sure the environment variable doesn't override this call later.
+    for operation in operations:
+        if operation not in OPERATIONS:
+            raise ValueError('operation must be one of %s, not %r' % (', '.join(OPERATIONS), operation))
+        if name is None:
+            _pinnedBackends.pop(operation, None)
+        else:
+            if not getBackend(name).supports(operation):
+                raise ValueError('Capture backend %r does not support %s().' % (name, operation))
+            _pinnedBackends[operation] = name
+        _selectedBackends.pop(operation, None)
+
+
+def _parseBackendEnv():
+    # Read the MOUSEINFO_BACKEND environment variable the first time a backend
+    # is selected. It's either a single backend name, or a comma-delimited
+    # list of operation=name pairs.
+    global _backendEnvParsed
+    if _backendEnvParsed:
+        return
+    _backendEnvParsed = True
+
+    setting = os.environ.get('MOUSEINFO_BACKEND', '').strip()
+    if not setting:
+        return
+    for item in setting.split(','):
+        item = item.strip()
+        if '=' in item:
+            operation, name = [part.strip() for part in item.split('=', 1)]
+            _pinnedBackends[operation] = name
+        else:
+            for operation in OPERATIONS:
+                try:
+                    if getBackend(item).supports(operation):
+                        _pinnedBackends[operation] = item
+                except ValueError:
+                    # Pin it anyway so that the error is raised when the operation is used.
+                    _pinnedBackends[operation] = item
+
+
+def _callForMeasurement(backend, operation):
+    if operation == 'getPixel':
+        return backend.getPixel(0, 0)
+    return getattr(backend, operation)()
+
+
+def _measureBackend(backend, operation, maxSeconds):
+    # Return the median seconds per call of backend's operation, or None if
+    # the backend doesn't work. Calls are repeated up to 5 times, but slow
+    # backends stop being timed once maxSeconds has passed.
+    if not backend.isAvailable():
+        return None
+    try:
+        _callForMeasurement(backend, operation) # Warm up, and make sure it works at all.
+        durations = []
+        startTime = _timer()
+        while len(durations) < 5 and (_timer() - startTime) < maxSeconds:
+            callStartTime = _timer()
+            _callForMeasurement(backend, operation)
+            durations.append(_timer() - callStartTime)
+    except Exception:
+        return None
+    if not durations:
+        return None
+    durations.sort()
+    return durations[len(durations) // 2]
+
+
+def calibrateBackends(operations=None, maxSeconds=0.05):
+    """Time every available backend for each operation and select the
+    fastest one. Operations pinned with useBackend() or MOUSEINFO_BACKEND
+    keep their pinned backend. Returns the same dictionary as
+    getBackendInfo()."""
+    _parseBackendEnv()
+    if operations is None:
+        operations = OPERATIONS
+    for operation in operations:
+        bestBackend = None
+        for backend in getBackends(operation):
+            cost = _measureBackend(backend, operation, maxSeconds)
+            if cost is None:
+                continue
+            _backendCosts[(backend.name, operation)] = cost
+            if bestBackend is None or cost < _backendCosts[(bestBackend.name, operation)]:
+                bestBackend = backend
+        if operation not in _pinnedBackends and bestBackend is not None:
+            _selectedBackends[operation] = bestBackend
+    return getBackendInfo()
+
+
+def getBackendInfo():
+    """Returns a dictionary that maps each operation name to a dictionary
+    with the selected 'backend' name (or None if no backend has been selected
+    yet), whether it was 'pinned', its measured 'cost' in seconds per call
+    (or None if it hasn't been calibrated), and the measured 'costs' of every
+    calibrated backend."""
+    info = {}
+    for operation in OPERATIONS:
+        selected = _selectedBackends.get(operation)
+        selectedName = None if selected is None else selected.name
+        info[operation] = {'backend': selectedName,
+                           'pinned': operation in _pinnedBackends,
+                           'cost': _backendCosts.get((selectedName, operation)),
+                           'costs': dict((name, cost) for (name, op), cost in _backendCosts.items() if op == operation)}
+    return info
+
+
+def _selectBackend(operation):
+    _parseBackendEnv()
+    if operation in _pinnedBackends:
+        backend = getBackend(_pinnedBackends[operation])
+        if not backend.supports(operation):
+            raise ValueError('Capture backend %r does not support %s().' % (backend.name, operation))
+    else:
+        backend = None
+        if os.environ.get('MOUSEINFO_CALIBRATE', '') == '1':
+            calibrateBackends([operation])
+            backend = _selectedBackends.get(operation)
+        if backend is None:
+            for candidate in getBackends(operation):
+                if candidate.isAvailable():
+                    backend = candidate
+                    break
+        if backend is None:
+            raise NotImplementedError('No capture backend on this system supports %s().' % (operation))
+    _selectedBackends[operation] = backend
+    return backend
+
+
+def _backendFor(operation):
+    try:
+        return _selectedBackends[operation]
+    except KeyError:
+        return _selectBackend(operation)
+
+
+def _regionBox(region):
+    # Convert a (left, top, width, height) region to a Pillow (left, upper, right, lower) box.
+    left, top, width, height = region
+    return (left, top, left + width, top + height)
+
+
+def _imageGetPixel(im, x, y):
+    # NOTE: On Windows & Linux, Pillow's getpixel() returns a 3-integer tuple, but on macOS it returns a 4-integer tuple.
+    rgbValue = im.getpixel((x, y))
+    return rgbValue[0], rgbValue[1], rgbValue[2]
+
+
+# =========================================================================
+# Monitors
+#
+# The backend selected for size() also lists the monitors, if it can. It
+# loads the monitor layout once and returns the same cached list until the
+# layout changes (on Linux, when the X server sends a RandR event). getMonitors() builds a
+# MonitorIndex from that list the first time it sees it, so finding the
+# monitor under the mouse on every update is just two binary searches.
+
+Monitor = collections.namedtuple('Monitor', ['left', 'top', 'width', 'height', 'name', 'primary'])
+Monitor.__doc__ = """The position and size of a monitor on the desktop, in the same
+coordinates that position() returns. Monitors to the left of or above the
+primary monitor can have negative left and top values."""
+
+
+class MonitorIndex(object):
+    """Finds the Monitor that contains a point in O(log n) time. The
+    monitors' edges split the desktop into a grid of cells that are each
+    entirely covered by one monitor (the earliest one in the list, where
+    monitors overlap) or by none, so a lookup is a binary search for the
+    column and another for the row."""
+
+    def __init__(self, monitors):
+        self.monitors = monitors
+        self._xEdges = sorted(set([m.left for m in monitors] + [m.left + m.width for m in monitors]))
+        self._yEdges = sorted(set([m.top for m in monitors] + [m.top + m.height for m in monitors]))
+        self._columns = []
+        for x in self._xEdges[:-1]:
+            column = []
+            for y in self._yEdges[:-1]:
+                for monitor in monitors:
+                    if monitor.left <= x < monitor.left + monitor.width and monitor.top <= y < monitor.top + monitor.height:
+                        column.append(monitor)
+                        break
+                else:
+                    column.append(None)
+            self._columns.append(column)
+
+
+    def monitorAt(self, x, y):
+        """Returns the Monitor that contains x, y, or None if the point
+        isn't on any monitor."""
+        i = bisect.bisect_right(self._xEdges, x) - 1
+        j = bisect.bisect_right(self._yEdges, y) - 1
+        if 0 <= i < len(self._columns) and 0 <= j < len(self._yEdges) - 1:
+            return self._columns[i][j]
+        return None
+
+
+_monitorIndex = None # The MonitorIndex of the last list returned by getMonitors().
+_sizeMonitors = None # The single Monitor list made from size() when no backend can list the monitors.
+
+
+def getMonitors():
+    """Returns a list of Monitor namedtuples, with the primary monitor first.
+    The list is cached until the monitor layout changes. Platforms where the
+    monitors can't be listed (such as macOS) return only the primary monitor."""
+    global _sizeMonitors
+    backend = _backendFor('size')
+    if backend.monitors is None:
+        width, height = size()
+        if _sizeMonitors is None or (_sizeMonitors[0].width, _sizeMonitors[0].height) != (width, height):
+            _sizeMonitors = [Monitor(0, 0, width, height, 'primary', True)]
+        return _sizeMonitors
+    if _statsHistograms is None:
+        return backend.monitors()
+    return _timedCall('monitors:' + backend.name, backend.monitors)
+
+
+def monitorAt(x, y):
+    """Returns the Monitor that contains x, y, or None if the point isn't on
+    any monitor (such as in the gap between two monitors of different
+    sizes)."""
+    return _currentMonitorIndex().monitorAt(x, y)
+
+
+def _currentMonitorIndex():
+    # Returns the MonitorIndex of the current monitor layout. Callers that
+    # look up many points get it once instead of calling monitorAt() for
+    # each one, which checks whether the layout changed every time.
+    global _monitorIndex
+    monitors = getMonitors()
+    index = _monitorIndex
+    if index is None or index.monitors is not monitors:
+        index = _monitorIndex = MonitorIndex(monitors)
+    return index
+
 
 if sys.platform == 'win32':
     import ctypes
 
-    if _PILLOW_INSTALLED:
-        from PIL import ImageGrab
+    dc = None # The screen's device context, which is gotten the first time it's needed.
 
-    # Makes this process aware of monitor scaling so the screenshots are correctly sized:
-    try:
-       ctypes.windll.user32.SetProcessDPIAware()
-    except AttributeError:
-        pass # Windows XP doesn't support this, so just do nothing.
+    def _winSetup():
+        # Get the screen's device context the first time any of the Windows
+        # functions are called, instead of when mouseinfo is imported.
+        global dc
+        if dc is None:
+            # Makes this process aware of monitor scaling so the screenshots are correctly sized:
+            try:
+               ctypes.windll.user32.SetProcessDPIAware()
+            except AttributeError:
+                pass # Windows XP doesn't support this, so just do nothing.
 
-    dc = ctypes.windll.user32.GetDC(0)
+            dc = ctypes.windll.user32.GetDC(0)
+        return dc
 
     class POINT(ctypes.Structure):
         _fields_ = [('x', ctypes.c_long),
                     ('y', ctypes.c_long)]
 
     def _winPosition():
+        _winSetup()
         cursor = POINT()
         ctypes.windll.user32.GetCursorPos(ctypes.byref(cursor))
         return (cursor.x, cursor.y)
-    position = _winPosition
 
 
-    def _winScreenshot(filename=None):
+    def _winScreenshot(filename=None, region=None):
         # TODO - Use the winapi to get a screenshot, and compare performance with ImageGrab.grab()
         # https://stackoverflow.com/a/3586280/1893164
+        _winSetup()
         try:
-            im = ImageGrab.grab()
+            from PIL import ImageGrab
+            if region is None:
+                im = ImageGrab.grab()
+            else:
+                im = ImageGrab.grab(bbox=_regionBox(region))
             if filename is not None:
                 im.save(filename)
-        except NameError:
+        except ImportError:
             raise ImportError('Pillow module must be installed to use screenshot functions on Windows.')
         return im
-    screenshot = _winScreenshot
 
     def _winSize():
+        _winSetup()
         return (ctypes.windll.user32.GetSystemMetrics(0), ctypes.windll.user32.GetSystemMetrics(1))
-    size = _winSize
+
+    class RECT(ctypes.Structure):
+        _fields_ = [('left', ctypes.c_long),
+                    ('top', ctypes.c_long),
+                    ('right', ctypes.c_long),
+                    ('bottom', ctypes.c_long)]
+
+    class MONITORINFOEXW(ctypes.Structure):
+        _fields_ = [('cbSize', ctypes.c_ulong),
+                    ('rcMonitor', RECT),
+                    ('rcWork', RECT),
+                    ('dwFlags', ctypes.c_ulong),
+                    ('szDevice', ctypes.c_wchar * 32)]
+
+    MONITORINFOF_PRIMARY = 1
+    MonitorEnumProc = ctypes.WINFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p, ctypes.POINTER(RECT), ctypes.c_ssize_t)
+
+    _winMonitorsKey = None # The virtual screen's rectangle and monitor count when _winMonitorsCache was loaded.
+    _winMonitorsCache = None
+
+    def _winMonitors():
+        # Windows only tells windows when the monitors change, so the layout
+        # is reloaded when the virtual screen's rectangle (SM_XVIRTUALSCREEN
+        # through SM_CYVIRTUALSCREEN) or the number of monitors (SM_CMONITORS)
+        # changes, which is much cheaper to check than enumerating the monitors.
+        global _winMonitorsKey, _winMonitorsCache
+        _winSetup()
+        key = tuple(ctypes.windll.user32.GetSystemMetrics(index) for index in (76, 77, 78, 79, 80))
+        if key != _winMonitorsKey:
+            monitors = []
+            def addMonitor(hMonitor, hdc, rect, data):
+                info = MONITORINFOEXW()
+                info.cbSize = ctypes.sizeof(info)
+                ctypes.windll.user32.GetMonitorInfoW(ctypes.c_void_p(hMonitor), ctypes.byref(info))
+                bounds = info.rcMonitor
+                monitors.append(Monitor(bounds.left, bounds.top, bounds.right - bounds.left, bounds.bottom - bounds.top,
+                                        info.szDevice, bool(info.dwFlags & MONITORINFOF_PRIMARY)))
+                return 1 # Continue enumerating.
+            ctypes.windll.user32.EnumDisplayMonitors(None, None, MonitorEnumProc(addMonitor), 0)
+            monitors.sort(key=lambda monitor: not monitor.primary)
+            _winMonitorsKey, _winMonitorsCache = key, monitors
+        return _winMonitorsCache
 
     def _winGetPixel(x, y):
-        colorRef = ctypes.windll.gdi32.GetPixel(dc, x, y)  # A COLORREF value as 0x00bbggrr. See https://docs.microsoft.com/en-us/windows/win32/gdi/colorref
+        colorRef = ctypes.windll.gdi32.GetPixel(_winSetup(), x, y)  # A COLORREF value as 0x00bbggrr. See https://docs.microsoft.com/en-us/windows/win32/gdi/colorref
         red = colorRef % 256
         colorRef //= 256
         green = colorRef % 256
@@ -93,93 +574,118 @@ if sys.platform == 'win32':
         blue = colorRef
 
         return (red, green, blue)
-    getPixel = _winGetPixel
+
+    registerBackend(CaptureBackend('win32', position=_winPosition, size=_winSize,
+                                   screenshot=_winScreenshot, getPixel=_winGetPixel, region=True, cursorFree=True,
+                                   monitors=_winMonitors))
 
 
 elif sys.platform == 'darwin':
-    from rubicon.objc import ObjCClass, CGPoint
-    from rubicon.objc.types import register_preferred_encoding
+    appkit = None # These are loaded the first time they're needed by _macSetup().
+    NSEvent = None
+    core_graphics = None
+
+    def _macSetup():
+        # Load AppKit and CoreGraphics the first time any of the macOS
+        # functions are called, instead of when mouseinfo is imported.
+        global appkit, NSEvent, core_graphics
+        if core_graphics is not None:
+            return
+
+        from ctypes import (
+            c_bool, c_int32, c_int64, c_size_t, c_uint16, c_uint32, c_void_p,
+            cdll, util,
+        )
+        from rubicon.objc import ObjCClass, CGPoint
+        from rubicon.objc.types import register_preferred_encoding
+
+        #####################################################################
 
-    #####################################################################
+        appkit = cdll.LoadLibrary(util.find_library('AppKit'))
 
-    appkit = cdll.LoadLibrary(util.find_library('AppKit'))
+        NSEvent = ObjCClass('NSEvent')
+        NSEvent.declare_class_property('mouseLocation')
+        # NSSystemDefined = ObjCClass('NSSystemDefined')
 
-    NSEvent = ObjCClass('NSEvent')
-    NSEvent.declare_class_property('mouseLocation')
-    # NSSystemDefined = ObjCClass('NSSystemDefined')
+        #####################################################################
 
-    #####################################################################
+        core_graphics = cdll.LoadLibrary(util.find_library('CoreGraphics'))
 
-    core_graphics = cdll.LoadLibrary(util.find_library('CoreGraphics'))
+        CGDirectDisplayID = c_uint32
 
-    CGDirectDisplayID = c_uint32
+        CGEventRef = c_void_p
+        register_preferred_encoding(b'^{__CGEvent=}', CGEventRef)
 
-    CGEventRef = c_void_p
-    register_preferred_encoding(b'^{__CGEvent=}', CGEventRef)
+        CGEventSourceRef = c_void_p
+        register_preferred_encoding(b'^{__CGEventSource=}', CGEventSourceRef)
 
-    CGEventSourceRef = c_void_p
-    register_preferred_encoding(b'^{__CGEventSource=}', CGEventSourceRef)
+        CGEventTapLocation = c_uint32
 
-    CGEventTapLocation = c_uint32
+        CGEventType = c_uint32
 
-    CGEventType = c_uint32
+        CGEventField = c_uint32
 
-    CGEventField = c_uint32
+        CGKeyCode = c_uint16
 
-    CGKeyCode = c_uint16
+        CGMouseButton = c_uint32
 
-    CGMouseButton = c_uint32
+        CGScrollEventUnit = c_uint32
 
-    CGScrollEventUnit = c_uint32
+        # size_t CGDisplayPixelsWide(CGDirectDisplayID display);
+        core_graphics.CGDisplayPixelsWide.argtypes = [CGDirectDisplayID]
+        core_graphics.CGDisplayPixelsWide.restype = c_size_t
 
-    # size_t CGDisplayPixelsWide(CGDirectDisplayID display);
-    core_graphics.CGDisplayPixelsWide.argtypes = [CGDirectDisplayID]
-    core_graphics.CGDisplayPixelsWide.restype = c_size_t
+        # CGEventRef CGEventCreateKeyboardEvent(CGEventSourceRef source, CGKeyCode virtualKey, bool keyDown);
+        core_graphics.CGEventCreateKeyboardEvent.argtypes = [CGEventSourceRef, CGKeyCode, c_bool]
+        core_graphics.CGEventCreateKeyboardEvent.restype = CGEventRef
 
-    # CGEventRef CGEventCreateKeyboardEvent(CGEventSourceRef source, CGKeyCode virtualKey, bool keyDown);
-    core_graphics.CGEventCreateKeyboardEvent.argtypes = [CGEventSourceRef, CGKeyCode, c_bool]
-    core_graphics.CGEventCreateKeyboardEvent.restype = CGEventRef
+        # CGEventRef CGEventCreateMouseEvent(
+        #   CGEventSourceRef source, CGEventType mouseType, CGPoint mouseCursorPosition, CGMouseButton mouseButton);
+        core_graphics.CGEventCreateMouseEvent.argtypes = [CGEventSourceRef, CGEventType, CGPoint, CGMouseButton]
+        core_graphics.CGEventCreateMouseEvent.restype = CGEventRef
 
-    # CGEventRef CGEventCreateMouseEvent(
-    #   CGEventSourceRef source, CGEventType mouseType, CGPoint mouseCursorPosition, CGMouseButton mouseButton);
-    core_graphics.CGEventCreateMouseEvent.argtypes = [CGEventSourceRef, CGEventType, CGPoint, CGMouseButton]
-    core_graphics.CGEventCreateMouseEvent.restype = CGEventRef
+        # CGEventRef CGEventCreateScrollWheelEvent(
+        #   CGEventSourceRef source, CGScrollEventUnit units, uint32_t wheelCount, int32_t wheel1, ...);
+        core_graphics.CGEventCreateScrollWheelEvent.argtypes = [CGEventSourceRef, CGScrollEventUnit, c_uint32, c_int32]
+        core_graphics.CGEventCreateScrollWheelEvent.restype = CGEventRef
 
-    # CGEventRef CGEventCreateScrollWheelEvent(
-    #   CGEventSourceRef source, CGScrollEventUnit units, uint32_t wheelCount, int32_t wheel1, ...);
-    core_graphics.CGEventCreateScrollWheelEvent.argtypes = [CGEventSourceRef, CGScrollEventUnit, c_uint32, c_int32]
-    core_graphics.CGEventCreateScrollWheelEvent.restype = CGEventRef
+        # void CGEventSetIntegerValueField(CGEventRef event, CGEventField field, int64_t value);
+        core_graphics.CGEventSetIntegerValueField.argtypes = [CGEventRef, CGEventField, c_int64]
+        core_graphics.CGEventSetIntegerValueField.restype = None
 
-    # void CGEventSetIntegerValueField(CGEventRef event, CGEventField field, int64_t value);
-    core_graphics.CGEventSetIntegerValueField.argtypes = [CGEventRef, CGEventField, c_int64]
-    core_graphics.CGEventSetIntegerValueField.restype = None
+        # void CGEventSetType(CGEventRef event, CGEventType type);
+        core_graphics.CGEventSetType.argtype = [CGEventRef, CGEventType]
+        core_graphics.CGEventSetType.restype = None
 
-    # void CGEventSetType(CGEventRef event, CGEventType type);
-    core_graphics.CGEventSetType.argtype = [CGEventRef, CGEventType]
-    core_graphics.CGEventSetType.restype = None
+        # void CGEventPost(CGEventTapLocation tap, CGEventRef event);
+        core_graphics.CGEventPost.argtypes = [CGEventTapLocation, CGEventRef]
+        core_graphics.CGEventPost.restype = None
+
+        # CGDirectDisplayID CGMainDisplayID(void);
+        core_graphics.CGMainDisplayID.argtypes = []
+        core_graphics.CGMainDisplayID.restype = CGDirectDisplayID
 
-    # void CGEventPost(CGEventTapLocation tap, CGEventRef event);
-    core_graphics.CGEventPost.argtypes = [CGEventTapLocation, CGEventRef]
-    core_graphics.CGEventPost.restype = None
 
-    # CGDirectDisplayID CGMainDisplayID(void);
-    core_graphics.CGMainDisplayID.argtypes = []
-    core_graphics.CGMainDisplayID.restype = CGDirectDisplayID
 
 
 
     def _macPosition():
+        _macSetup()
         loc = NSEvent.mouseLocation
         return int(loc.x), int(core_graphics.CGDisplayPixelsHigh(0) - loc.y)
-    position = _macPosition
 
 
-    def _macScreenshot(filename=None):
+    def _macScreenshot(filename=None, region=None):
+        import datetime, subprocess
         if filename is not None:
             tmpFilename = filename
         else:
             tmpFilename = 'screenshot%s.png' % (datetime.datetime.now().strftime('%Y-%m%d_%H-%M-%S-%f'))
-        subprocess.call(['screencapture', '-x', tmpFilename])
+        from PIL import Image
+        if region is None:
+            subprocess.call(['screencapture', '-x', tmpFilename])
+        else:
+            subprocess.call(['screencapture', '-x', '-R%s,%s,%s,%s' % tuple(region), tmpFilename])
         im = Image.open(tmpFilename)
 
         # force loading before unlinking, Image.open() is lazy
@@ -188,46 +694,60 @@ elif sys.platform == 'darwin':
         if filename is None:
             os.unlink(tmpFilename)
         return im
-    screenshot = _macScreenshot
 
     def _macSize():
+        _macSetup()
         return (
             core_graphics.CGDisplayPixelsWide(core_graphics.CGMainDisplayID()),
             core_graphics.CGDisplayPixelsHigh(core_graphics.CGMainDisplayID())
         )
-    size = _macSize
 
     def _macGetPixel(x, y):
-        rgbValue = screenshot().getpixel((x, y))
-        return rgbValue[0], rgbValue[1], rgbValue[2]
-    getPixel = _macGetPixel
-
-
-elif platform.system() == 'Linux':
-    from Xlib.display import Display
-    import errno
-
-    scrotExists = False
-    try:
-            whichProc = subprocess.Popen(
-                ['which', 'scrot'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            scrotExists = whichProc.wait() == 0
-    except OSError as ex:
-        if ex.errno == errno.ENOENT:
-            # if there is no "which" program to find scrot, then assume there
-            # is no scrot.
-            pass
-        else:
-            raise
-
-    _display = Display(os.environ['DISPLAY'])
+        return _imageGetPixel(_macScreenshot(region=(x, y, 1, 1)), 0, 0)
+
+    # TODO - Until I can get screenshots without the mouse cursor, this backend isn't cursor-free.
+    registerBackend(CaptureBackend('quartz', position=_macPosition, size=_macSize,
+                                   screenshot=_macScreenshot, getPixel=_macGetPixel, region=True))
+
+
+elif sys.platform.startswith('linux'):
+    # python-xlib is imported and the display connection is opened the first
+    # time they're needed, so importing mouseinfo works (and is fast) even
+    # when there is no X server, such as in headless worker processes.
+    import struct
+
+    _programExistsCache = {} # Maps a program name to True or False.
+
+    def _programExists(name):
+        # Search the PATH directories for the program ourselves instead of
+        # running "which", which would fork a new process.
+        if name not in _programExistsCache:
+            _programExistsCache[name] = False
+            for directory in os.environ.get('PATH', os.defpath).split(os.pathsep):
+                filename = os.path.join(directory, name)
+                if os.path.isfile(filename) and os.access(filename, os.X_OK):
+                    _programExistsCache[name] = True
+                    break
+        return _programExistsCache[name]
+
+    _display = None # The python-xlib Display object, opened the first time it's needed.
+
+    def _getDisplay():
+        global _display
+        if _display is None:
+            if not os.environ.get('DISPLAY'):
+                raise NotImplementedError('The DISPLAY environment variable must be set to use MouseInfo on Linux.')
+            from Xlib.display import Display
+            _display = Display(os.environ['DISPLAY'])
+        return _display
 
     def _linuxPosition():
-        coord = _display.screen().root.query_pointer()._data
+        coord = _getDisplay().screen().root.query_pointer()._data
         return coord["root_x"], coord["root_y"]
-    position = _linuxPosition
 
-    def _linuxScreenshot(filename=None):
+    def _scrotScreenshot(filename=None):
+        import datetime, subprocess
+        scrotExists = _programExists('scrot')
         if not scrotExists:
             raise NotImplementedError('"scrot" must be installed to use screenshot functions in Linux. Run: sudo apt-get install scrot')
 
@@ -237,6 +757,7 @@ elif platform.system() == 'Linux':
             tmpFilename = '.screenshot%s.png' % (datetime.datetime.now().strftime('%Y-%m%d_%H-%M-%S-%f'))
 
         if scrotExists:
+            from PIL import Image
             subprocess.call(['scrot', '-z', tmpFilename])
             im = Image.open(tmpFilename)
 
@@ -248,98 +769,2191 @@ elif platform.system() == 'Linux':
             return im
         else:
             raise Exception('The scrot program must be installed to take a screenshot with PyScreeze on Linux. Run: sudo apt-get install scrot')
-    screenshot = _linuxScreenshot
+
+    _xshmCapture = None # An XShmCapture object, created the first time it's needed.
+
+    def _xshmCaptureObject():
+        global _xshmCapture
+        if _xshmCapture is None:
+            from mouseinfo._mouseinfo_x11 import XShmCapture
+            _xshmCapture = XShmCapture()
+        return _xshmCapture
+
+    def _xshmRawPixels(region):
+        buffer, width, height, bytesPerLine = _xshmCaptureObject().grab(region)
+        return buffer, 0, bytesPerLine, 'BGRX'
+
+    _damageMonitor = None # A DamageMonitor, created the first time it's needed, or False if DAMAGE can't be used.
+    _damageMonitorLock = threading.Lock() # Keeps two waiting threads from each creating a DamageMonitor.
+
+    def _xDamageSubscribe(region, callback):
+        global _damageMonitor
+        with _damageMonitorLock:
+            if _damageMonitor is None:
+                try:
+                    from mouseinfo._mouseinfo_x11 import DamageMonitor
+                    _damageMonitor = DamageMonitor(os.environ.get('DISPLAY'))
+                except Exception:
+                    _damageMonitor = False # Don't try again on every wait.
+            monitor = _damageMonitor
+        if monitor is False:
+            return None
+        return monitor.subscribe(region, callback)
+
+    def _xshmScreenshot(filename=None, region=None):
+        im = _xshmCaptureObject().screenshot(region)
+        if filename is not None:
+            im.save(filename)
+        return im
+
+    def _xlibScreenshot(filename=None, region=None):
+        # Get the screen with a single GetImage request over the Xlib
+        # connection. This works over remote X connections where MIT-SHM doesn't.
+        from Xlib import X
+        from PIL import Image
+        rawmode = _xlibRawmode()
+        if region is None:
+            left, top = 0, 0
+            width, height = _linuxSize()
+        else:
+            left, top, width, height = region
+        data = _getDisplay().screen().root.get_image(left, top, width, height, X.ZPixmap, 0xffffffff).data
+        im = Image.frombytes('RGB', (width, height), data, 'raw', rawmode)
+        if filename is not None:
+            im.save(filename)
+        return im
+
+    def _xwdScreenshot(filename=None):
+        # Have xwd write the screen to its stdout in the X Window Dump format
+        # and decode it in memory, without any temporary file or PNG encoding.
+        import subprocess
+        from Xlib import X
+        from PIL import Image
+        data = subprocess.check_output(['xwd', '-root', '-silent'])
+        (headerSize, fileVersion, pixmapFormat, depth, width, height, xoffset, byteOrder,
+         bitmapUnit, bitmapBitOrder, bitmapPad, bitsPerPixel, bytesPerLine, visualClass,
+         redMask, greenMask, blueMask, bitsPerRgb, colormapEntries, ncolors) = struct.unpack_from('>20I', data, 0)
+        if fileVersion != 7 or pixmapFormat != X.ZPixmap or bitsPerPixel != 32 \
+                or (redMask, greenMask, blueMask) != (0xff0000, 0xff00, 0xff):
+            raise NotImplementedError('Unsupported xwd pixel format.')
+        pixelsOffset = headerSize + ncolors * 12 # Each XWDColor structure is 12 bytes.
+        rawmode = 'BGRX' if byteOrder == X.LSBFirst else 'XRGB'
+        im = Image.frombytes('RGB', (width, height), data[pixelsOffset:pixelsOffset + bytesPerLine * height],
+                             'raw', rawmode, bytesPerLine, 1)
+        if filename is not None:
+            im.save(filename)
+        return im
+
+    def _imageGrabAvailable():
+        # Pillow 7.1 and later can take screenshots on Linux if it was built with XCB support.
+        from PIL import Image, ImageGrab
+        return getattr(Image.core, 'HAVE_XCB', False)
+
+    def _imageGrabScreenshot(filename=None, region=None):
+        from PIL import ImageGrab
+        if region is None:
+            im = ImageGrab.grab()
+        else:
+            im = ImageGrab.grab(bbox=_regionBox(region))
+        if filename is not None:
+            im.save(filename)
+        return im
+
+    _linuxGeometry = None # The (rootSize, monitors) loaded by _loadLinuxGeometry().
+    _randrFirstEvent = None # The RANDR extension's first event code, once its events are selected.
+    # The geometry has its own display connection, so that reading its RandR
+    # events never takes other events off of _display's queue, and a lock,
+    # since the Sampler thread and the GUI thread both ask for it.
+    _geometryDisplay = None
+    _geometryLock = threading.Lock()
+
+    def _loadLinuxGeometry(display):
+        # Returns the root window's (width, height) and the list of Monitors,
+        # from RandR 1.5 monitors, RandR CRTCs, or Xinerama screens, whichever
+        # the X server and python-xlib support first. This also asks the X
+        # server to send RandR events when the layout changes.
+        global _randrFirstEvent
+        from Xlib.error import XError
+        root = display.screen().root
+        geometry = root.get_geometry()
+        rootSize = (geometry.width, geometry.height)
+        monitors = []
+        if display.has_extension('RANDR'):
+            from Xlib.ext import randr
+            if _randrFirstEvent is None:
+                root.xrandr_select_input(randr.RRScreenChangeNotifyMask | randr.RRCrtcChangeNotifyMask | randr.RROutputChangeNotifyMask)
+                _randrFirstEvent = display.query_extension('RANDR').first_event
+            try:
+                for info in root.xrandr_get_monitors().monitors:
+                    monitors.append(Monitor(info.x, info.y, info.width_in_pixels, info.height_in_pixels,
+                                            display.get_atom_name(info.name), bool(info.primary)))
+            except (AttributeError, XError):
+                # RandR 1.5 monitors aren't supported, so use the active CRTCs.
+                resources = root.xrandr_get_screen_resources()
+                primaryCrtc = None
+                try:
+                    primaryOutput = root.xrandr_get_output_primary().output
+                    if primaryOutput:
+                        primaryCrtc = display.xrandr_get_output_info(primaryOutput, resources.config_timestamp).crtc
+                except (AttributeError, XError):
+                    pass
+                for crtc in resources.crtcs:
+                    info = display.xrandr_get_crtc_info(crtc, resources.config_timestamp)
+                    if info.mode and info.width and info.height:
+                        monitors.append(Monitor(info.x, info.y, info.width, info.height, 'crtc%s' % (crtc), crtc == primaryCrtc))
+        if not monitors and display.has_extension('XINERAMA'):
+            for i, screenInfo in enumerate(display.xinerama_query_screens().screens):
+                monitors.append(Monitor(screenInfo.x, screenInfo.y, screenInfo.width, screenInfo.height, 'screen%s' % (i), i == 0))
+        if not monitors:
+            monitors.append(Monitor(0, 0, rootSize[0], rootSize[1], 'root', True))
+        monitors.sort(key=lambda monitor: not monitor.primary)
+        return rootSize, monitors
+
+    def _linuxCurrentGeometry():
+        # Returns the cached (rootSize, monitors), reloading them only after
+        # the X server has sent a RandR event. Checking for events doesn't
+        # wait for a reply from the X server.
+        global _linuxGeometry, _geometryDisplay
+        with _geometryLock:
+            if _geometryDisplay is None:
+                if not os.environ.get('DISPLAY'):
+                    raise NotImplementedError('The DISPLAY environment variable must be set to use MouseInfo on Linux.')
+                from Xlib.display import Display
+                _geometryDisplay = Display(os.environ['DISPLAY'])
+            display = _geometryDisplay
+            if _linuxGeometry is not None and _randrFirstEvent is not None and display.pending_events():
+                changed = False
+                while display.pending_events():
+                    event = display.next_event()
+                    if _randrFirstEvent <= (event.type & 0x7f) <= _randrFirstEvent + 1: # RRScreenChangeNotify or RRNotify.
+                        changed = True
+                if changed:
+                    _linuxGeometry = None
+            if _linuxGeometry is None:
+                _linuxGeometry = _loadLinuxGeometry(display)
+            return _linuxGeometry
 
     def _linuxSize():
-        return _display.screen().width_in_pixels, _display.screen().height_in_pixels
-    size = _linuxSize
+        return _linuxCurrentGeometry()[0]
+
+    def _linuxMonitors():
+        return _linuxCurrentGeometry()[1]
+
+    _xlibPixelFormatCache = None
+
+    def _xlibPixelFormat():
+        # Returns (bytesPerPixel, structFormat, redMask, greenMask, blueMask)
+        # describing how the X server encodes the root window's pixels in a
+        # ZPixmap image. This is looked up once and cached, since it can't
+        # change while the display connection is open.
+        global _xlibPixelFormatCache
+        if _xlibPixelFormatCache is not None:
+            return _xlibPixelFormatCache
+
+        from Xlib import X
+        display = _getDisplay()
+        screen = display.screen()
+        rootVisual = None
+        for depthInfo in screen.allowed_depths:
+            for visual in depthInfo.visuals:
+                if visual.visual_id == screen.root_visual:
+                    rootVisual = visual
+        if rootVisual is None:
+            raise NotImplementedError('Could not find the root window visual.')
+
+        bitsPerPixel = None
+        for pixmapFormat in display.display.info.pixmap_formats:
+            if pixmapFormat.depth == screen.root_depth:
+                bitsPerPixel = pixmapFormat.bits_per_pixel
+        if bitsPerPixel == 32:
+            structFormat = 'I'
+        elif bitsPerPixel == 16:
+            structFormat = 'H'
+        else:
+            raise NotImplementedError('Unsupported X pixmap format: %s bits per pixel.' % (bitsPerPixel))
+
+        if display.display.info.image_byte_order == X.LSBFirst:
+            structFormat = '<' + structFormat
+        else:
+            structFormat = '>' + structFormat
+
+        _xlibPixelFormatCache = (bitsPerPixel // 8, structFormat,
+                                 rootVisual.red_mask, rootVisual.green_mask, rootVisual.blue_mask)
+        return _xlibPixelFormatCache
+
+    def _xlibRawmode():
+        # Returns the Pillow raw mode for decoding the X server's ZPixmap data.
+        bytesPerPixel, structFormat, redMask, greenMask, blueMask = _xlibPixelFormat()
+        if bytesPerPixel != 4 or (redMask, greenMask, blueMask) != (0xff0000, 0xff00, 0xff):
+            raise NotImplementedError('Only 32-bit X pixel formats can be captured as images.')
+        return 'BGRX' if structFormat[0] == '<' else 'XRGB'
+
+    def _xlibMaskToByte(pixelValue, mask):
+        # Extract the color channel selected by mask, scaled to 0-255.
+        if mask == 0:
+            return 0
+        shift = 0
+        while not (mask >> shift) & 1:
+            shift += 1
+        maxValue = mask >> shift
+        value = (pixelValue & mask) >> shift
+        if maxValue == 255:
+            return value
+        return value * 255 // maxValue
+
+    def _xlibGetPixel(x, y):
+        # Ask the X server for just the 1x1 image at x, y instead of taking a
+        # screenshot of the entire screen.
+        from Xlib import X
+        bytesPerPixel, structFormat, redMask, greenMask, blueMask = _xlibPixelFormat()
+        data = _getDisplay().screen().root.get_image(x, y, 1, 1, X.ZPixmap, 0xffffffff).data
+        pixelValue = struct.unpack_from(structFormat, data, 0)[0]
+        return (_xlibMaskToByte(pixelValue, redMask),
+                _xlibMaskToByte(pixelValue, greenMask),
+                _xlibMaskToByte(pixelValue, blueMask))
+
+    def _screenshotGetPixel(x, y):
+        return _imageGetPixel(screenshot(region=(x, y, 1, 1)), 0, 0)
 
     def _linuxGetPixel(x, y):
-        rgbValue = screenshot().getpixel((x, y))
-        return rgbValue[0], rgbValue[1], rgbValue[2]
-    getPixel = _linuxGetPixel
+        from Xlib.error import XError
+        try:
+            return _xlibGetPixel(x, y)
+        except (XError, NotImplementedError):
+            # The X server couldn't give us the pixel directly (e.g. an unusual
+            # pixel format), so fall back to the slower screenshot method.
+            return _screenshotGetPixel(x, y)
+
+    # All of the X server's own capture methods leave out the mouse cursor.
+    # They all capture the same X screen, so they all get its damage reports.
+    registerBackend(CaptureBackend('xshm', screenshot=_xshmScreenshot, region=True, cursorFree=True,
+                                   isAvailable=_xshmCaptureObject, rawPixels=_xshmRawPixels,
+                                   subscribeDamage=_xDamageSubscribe))
+    registerBackend(CaptureBackend('xlib', position=_linuxPosition, size=_linuxSize,
+                                   screenshot=_xlibScreenshot, getPixel=_linuxGetPixel, region=True, cursorFree=True,
+                                   monitors=_linuxMonitors, subscribeDamage=_xDamageSubscribe))
+    registerBackend(CaptureBackend('imagegrab', screenshot=_imageGrabScreenshot, region=True, cursorFree=True,
+                                   isAvailable=_imageGrabAvailable, subscribeDamage=_xDamageSubscribe))
+    registerBackend(CaptureBackend('xwd', screenshot=_xwdScreenshot, cursorFree=True,
+                                   isAvailable=lambda: _programExists('xwd'), subscribeDamage=_xDamageSubscribe))
+    registerBackend(CaptureBackend('scrot', screenshot=_scrotScreenshot, cursorFree=True,
+                                   getPixel=lambda x, y: _imageGetPixel(_scrotScreenshot(), x, y),
+                                   isAvailable=lambda: _programExists('scrot'), subscribeDamage=_xDamageSubscribe))
+
+
 # =========================================================================
+# Fake display
+#
+# The "fake" capture backend is an in-memory screen. It's registered on
+# every platform but is never selected automatically, so it only replaces
+# the real screen when it's pinned with useFakeDisplay(), useBackend('fake'),
+# or MOUSEINFO_BACKEND=fake. Everything built on position(), size(),
+# screenshot(), and getPixel() (the MouseInfo window, Sampler, recordings,
+# and the benchmarks) then runs without a display, and the captures take
+# the same time on every run, which separates MouseInfo's own overhead from
+# the X server's.
+
+class FakeDisplay(CaptureBackend):
+    """A CaptureBackend for an in-memory screen of width x height pixels,
+    all starting as color. The pixels are stored as RGB bytes, row by row,
+    in the framebuffer bytearray, which can be changed directly or with
+    fill() and setPixel().
+
+    The mouse starts at the center of the screen. moveTo() moves it, and
+    setPath() gives it an iterable of (x, y) positions to step through, one
+    for each position() call, which makes the mouse's movement repeatable.
+
+    monitors is an optional list of (left, top, width, height) rectangles
+    of the screen to report as monitors, with the primary monitor first. By
+    default the whole screen is one monitor.
+
+    fill() and setPixel() wake up waitForPixel() and waitForRegionChange()
+    calls that are waiting on the pixels they change. Call reportDamage()
+    after changing the framebuffer directly."""
+
+    def __init__(self, width=1920, height=1080, color=(0, 0, 0), name='fake', monitors=None):
+        CaptureBackend.__init__(self, name, position=self._position, size=self._size,
+                                screenshot=self._screenshot, getPixel=self._getPixel, region=True, cursorFree=True,
+                                monitors=self._monitors, rawPixels=self._rawPixels,
+                                subscribeDamage=self._subscribeDamage)
+        self.width = width
+        self.height = height
+        self.setMonitors(monitors)
+        self.x = width // 2
+        self.y = height // 2
+        self._color = tuple(color)
+        self._framebuffer = None # Allocated the first time it's used, since the default fake display is created on import.
+        self._path = None # An iterator of the (x, y) positions the mouse moves through.
+        self._lock = threading.Lock()
+        self._damageSubscriptions = [] # The _DamageSubscriptions from subscribeDamage.
+
+
+    def isAvailable(self):
+        """Returns True while this backend is pinned for any operation. The
+        fake display is never picked instead of the real screen otherwise."""
+        _parseBackendEnv()
+        return self.name in _pinnedBackends.values()
+
+
+    @property
+    def framebuffer(self):
+        if self._framebuffer is None:
+            self._framebuffer = bytearray(self._color) * (self.width * self.height)
+        return self._framebuffer
+
+
+    def moveTo(self, x, y):
+        """Move the mouse to x, y, and forget any path given to setPath()."""
+        with self._lock:
+            self._path = None
+            self.x, self.y = x, y
+
+
+    def setPath(self, points, loop=False):
+        """Make each position() call move the mouse to the next (x, y) point
+        in points, which can be any iterable (such as a generator). The mouse
+        stays at the last point when they run out, unless loop is True, in
+        which case they're repeated."""
+        with self._lock:
+            self._path = itertools.cycle(list(points)) if loop else iter(points)
+
+
+    def setMonitors(self, monitors=None):
+        """Change the list of (left, top, width, height) monitor rectangles,
+        as if the monitor layout had changed. None makes the whole screen one
+        monitor."""
+        if monitors is None:
+            monitors = [(0, 0, self.width, self.height)]
+        self._monitorList = [Monitor(left, top, width, height, '%s%s' % (self.name, i), i == 0)
+                             for i, (left, top, width, height) in enumerate(monitors)]
+
+
+    def fill(self, color, region=None):
+        """Set every pixel in the (left, top, width, height) region (by
+        default, the whole screen) to the (red, green, blue) color."""
+        left, top, width, height = self._checkRegion(region)
+        rowBytes = bytearray(color) * width
+        stride = self.width * 3
+        framebuffer = self.framebuffer
+        for start in range(top * stride + left * 3, (top + height) * stride, stride):
+            framebuffer[start:start + width * 3] = rowBytes
+        self.reportDamage((left, top, width, height))
+
+
+    def setPixel(self, x, y, color):
+        """Set the pixel at x, y to the (red, green, blue) color."""
+        start = self._pixelOffset(x, y)
+        self.framebuffer[start:start + 3] = bytearray(color)
+        self.reportDamage((x, y, 1, 1))
+
+
+    def reportDamage(self, region=None):
+        """Wake up whatever is waiting on the pixels in the (left, top, width,
+        height) region (by default, the whole screen), as the X server does
+        when part of the screen is drawn to. The callbacks are called on this
+        thread."""
+        region = self._checkRegion(region)
+        with self._lock:
+            subscriptions = list(self._damageSubscriptions)
+        for subscription in subscriptions:
+            if _regionsOverlap(subscription.region, region):
+                subscription.callback()
+
+
+    def _pixelOffset(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise ValueError('%s,%s is outside of the %sx%s fake display' % (x, y, self.width, self.height))
+        return (y * self.width + x) * 3
+
+
+    def _checkRegion(self, region):
+        if region is None:
+            return 0, 0, self.width, self.height
+        left, top, width, height = region
+        if left < 0 or top < 0 or width <= 0 or height <= 0 or left + width > self.width or top + height > self.height:
+            raise ValueError('region %r is outside of the %sx%s fake display' % (tuple(region), self.width, self.height))
+        return left, top, width, height
+
+
+    def _position(self):
+        with self._lock:
+            if self._path is not None:
+                try:
+                    self.x, self.y = next(self._path)
+                except StopIteration:
+                    self._path = None
+            return self.x, self.y
 
-RUNNING_PYTHON_2 = sys.version_info[0] == 2
 
-if platform.system() == 'Linux':
+    def _size(self):
+        return self.width, self.height
+
+
+    def _monitors(self):
+        return self._monitorList
+
+
+    def _subscribeDamage(self, region, callback):
+        subscription = _DamageSubscription(self._damageSubscriptions, self._lock, tuple(region), callback)
+        with self._lock:
+            self._damageSubscriptions.append(subscription)
+        return subscription
+
+
+    def _getPixel(self, x, y):
+        start = self._pixelOffset(x, y)
+        red, green, blue = self.framebuffer[start:start + 3]
+        return red, green, blue
+
+
+    def _rawPixels(self, region):
+        # The region is read straight out of the framebuffer.
+        left, top, width, height = self._checkRegion(region)
+        return self.framebuffer, (top * self.width + left) * 3, self.width * 3, 'RGB'
+
+
+    def _screenshot(self, filename=None, region=None):
+        from PIL import Image
+        left, top, width, height = self._checkRegion(region)
+        framebuffer = self.framebuffer
+        if width == self.width:
+            # Full-width rows are contiguous, so Pillow can read them without a copy.
+            data = memoryview(framebuffer)[top * width * 3:(top + height) * width * 3]
+        else:
+            stride = self.width * 3
+            data = b''.join([bytes(framebuffer[start:start + width * 3])
+                             for start in range(top * stride + left * 3, (top + height) * stride, stride)])
+        im = Image.frombuffer('RGB', (width, height), data, 'raw', 'RGB', 0, 1)
+        if filename is not None:
+            im.save(filename)
+        return im
+
+
+class _DamageSubscription(object):
+    # A region and the callback to call when it changes, in the subscriptions
+    # list of a backend that can report damage. close() removes it.
+    def __init__(self, subscriptions, lock, region, callback):
+        self.region = region
+        self.callback = callback
+        self._subscriptions = subscriptions
+        self._lock = lock
+
+
+    def close(self):
+        with self._lock:
+            if self in self._subscriptions:
+                self._subscriptions.remove(self)
+
+
+def _regionsOverlap(a, b):
+    # Returns True if the (left, top, width, height) rectangles a and b share any pixels.
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+def useFakeDisplay(width=1920, height=1080, color=(0, 0, 0), path=None, loop=False, monitors=None):
+    """Replace the "fake" capture backend with a new FakeDisplay of the given
+    size, color, and monitors, pin it for every operation, and return it. If
+    path is given, it's passed to the FakeDisplay's setPath(). Call
+    useBackend(None) to go back to the real screen."""
+    display = FakeDisplay(width, height, color, monitors=monitors)
+    if path is not None:
+        display.setPath(path, loop)
+    registerBackend(display)
+    useBackend(display.name)
+    return display
+
+
+registerBackend(FakeDisplay())
+
+
+# =========================================================================
+# Latency statistics
+#
+# When enabled with enableStats(), the time taken by every position(),
+# size(), screenshot(), and getPixel() call is recorded under the name
+# "operation:backend" (such as "getPixel:xlib"), and the MouseInfo window
+# records the time its refreshes, renders, and clipboard copies take. Each
+# name has a LatencyHistogram with a fixed number of buckets, so memory use
+# doesn't grow over time. Hooks added with addStatsHook() are called with
+# every (name, seconds) timing, to forward them to other metrics systems.
+#
+# While statistics are disabled (the default), the only cost is checking
+# that _statsHistograms is None.
+
+_statsHistograms = None # Maps a timing name to its LatencyHistogram, or None while statistics are disabled.
+_statsHooks = [] # Functions called with (name, seconds) for every timing.
+_statsLock = threading.Lock()
+
+
+class LatencyHistogram(object):
+    """Counts timings in logarithmically-sized buckets, STEPS_PER_DECADE
+    buckets for every power of ten from MIN_SECONDS up, so percentiles are
+    accurate to about 12% with a fixed amount of memory. The count, total,
+    and max are exact."""
+
+    MIN_SECONDS = 1e-7
+    STEPS_PER_DECADE = 20
+    BUCKETS = 200 # Covers 100 ns to 1000 seconds.
+
+    def __init__(self):
+        self.buckets = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+    def add(self, seconds):
+        if seconds <= self.MIN_SECONDS:
+            i = 0
+        else:
+            i = min(int(math.log10(seconds / self.MIN_SECONDS) * self.STEPS_PER_DECADE), self.BUCKETS - 1)
+        self.buckets[i] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+
+    def percentile(self, percent):
+        """Returns the upper bound of the bucket holding the given percentile
+        (0 to 100) of the timings, or 0.0 if there are no timings."""
+        if self.count == 0:
+            return 0.0
+        rank = self.count * percent / 100.0
+        seen = 0
+        for i, bucketCount in enumerate(self.buckets):
+            seen += bucketCount
+            if seen >= rank and bucketCount:
+                return min(self.MIN_SECONDS * 10 ** ((i + 1) / float(self.STEPS_PER_DECADE)), self.max)
+        return self.max
+
+
+    def summary(self):
+        """Returns a dictionary with the count, mean, p50, p95, p99, and max
+        of the timings, in seconds."""
+        return {'count': self.count,
+                'mean': self.total / self.count if self.count else 0.0,
+                'p50': self.percentile(50),
+                'p95': self.percentile(95),
+                'p99': self.percentile(99),
+                'max': self.max}
+
+
+def enableStats():
+    """Start recording latency statistics. See getStats()."""
+    global _statsHistograms
+    with _statsLock:
+        if _statsHistograms is None:
+            _statsHistograms = {}
+
+
+def disableStats():
+    """Stop recording latency statistics and discard the ones recorded."""
+    global _statsHistograms
+    with _statsLock:
+        _statsHistograms = None
+
+
+def statsEnabled():
+    """Returns True if latency statistics are being recorded."""
+    return _statsHistograms is not None
+
+
+def resetStats():
+    """Discard the latency statistics recorded so far, without disabling them."""
+    with _statsLock:
+        if _statsHistograms is not None:
+            _statsHistograms.clear()
+
+
+def getStats():
+    """Returns a dictionary that maps each timing name, such as
+    "position:xlib" or "window.refresh", to a dictionary of its count, mean,
+    p50, p95, p99, and max, in seconds. It's empty while statistics are
+    disabled."""
+    with _statsLock:
+        if _statsHistograms is None:
+            return {}
+        return dict((name, histogram.summary()) for name, histogram in _statsHistograms.items())
+
+
+def exportStats(filename=None):
+    """Returns the latency statistics from getStats() as a JSON string, and
+    writes it to filename if one is given."""
+    import json
+    text = json.dumps({'enabled': statsEnabled(), 'timings': getStats()}, indent=2, sort_keys=True)
+    if filename is not None:
+        with open(filename, 'w') as fileObj:
+            fileObj.write(text)
+    return text
+
+
+def addStatsHook(hook):
+    """Calls hook(name, seconds) with every timing recorded while statistics
+    are enabled. Hooks are called on the thread that made the call being
+    timed, which may be the Sampler's background thread."""
+    _statsHooks.append(hook)
+
+
+def removeStatsHook(hook):
+    """Stops calling a hook added with addStatsHook()."""
+    _statsHooks.remove(hook)
+
+
+def _recordTiming(name, seconds):
+    with _statsLock:
+        if _statsHistograms is None:
+            return # Statistics were disabled while this call was being timed.
+        histogram = _statsHistograms.get(name)
+        if histogram is None:
+            histogram = _statsHistograms[name] = LatencyHistogram()
+        histogram.add(seconds)
+    for hook in list(_statsHooks):
+        hook(name, seconds)
+
+
+def _timedCall(name, func, *args):
+    # Call func(*args) and record how long it took under name.
+    startTime = _timer()
+    try:
+        return func(*args)
+    finally:
+        _recordTiming(name, _timer() - startTime)
+
+
+def position():
+    """Returns the (x, y) coordinates of the mouse cursor."""
+    backend = _backendFor('position')
+    if _statsHistograms is None:
+        return backend.position()
+    return _timedCall('position:' + backend.name, backend.position)
+
+
+def size():
+    """Returns the (width, height) of the primary monitor."""
+    backend = _backendFor('size')
+    if _statsHistograms is None:
+        return backend.size()
+    return _timedCall('size:' + backend.name, backend.size)
+
+
+def screenshot(filename=None, region=None, maxAge=0):
+    """Returns a Pillow Image of the screen, or of just the (left, top, width,
+    height) region of the screen if region is given. If filename is given,
+    the screenshot is also saved to that file.
+
+    If maxAge is more than 0, the screenshot may come from a capture up to
+    maxAge seconds old in the frame cache (see getFrameCache()) instead of a
+    new one."""
+    if maxAge:
+        return _frameCache.screenshot(filename, region, maxAge)
+    if _statsHistograms is not None:
+        return _timedCall('screenshot:' + _backendFor('screenshot').name, _screenshot, filename, region)
+    return _screenshot(filename, region)
+
+
+def _screenshot(filename, region):
+    backend = _backendFor('screenshot')
+    if region is None:
+        return backend.screenshot(filename)
+    if backend.region:
+        return backend.screenshot(filename, region)
+
+    # This backend can only capture the full screen, so crop it:
+    im = backend.screenshot().crop(_regionBox(region))
+    if filename is not None:
+        im.save(filename)
+    return im
+
+
+def grabRegion(left, top, width, height, filename=None):
+    """Returns a Pillow Image of the given region of the screen. Backends that
+    support regions (see CaptureBackend.region) only capture this region, so
+    this costs much less than a full screenshot for small regions."""
+    return screenshot(filename, region=(left, top, width, height))
+
+
+# =========================================================================
+# Frame cache
+#
+# getPixel() and screenshot() capture the screen again on every call. When
+# they're given a maxAge, they use the frame cache instead, so callers that
+# can use a slightly old frame share one capture. getPixel() caches the
+# tile of the screen around the pixel rather than the whole screen, since a
+# small region costs little more to capture than one pixel, and nearby
+# pixels are usually read next. Cached frames are dropped when they're too
+# old, when the capture backend reports that the screen under them changed,
+# and to keep the cache under its memory cap. Each frame remembers the
+# backend that captured it, and is only used while that backend is still
+# the one selected for screenshot(), so useBackend() and useFakeDisplay()
+# never get another backend's frames.
+
+CachedFrame = collections.namedtuple('CachedFrame', ['timestamp', 'generation', 'region', 'image'])
+CachedFrame.__doc__ = """A capture kept by a FrameCache. image is a Pillow Image of
+the (left, top, width, height) region of the screen, and generation is the
+FrameCache's generation number when it was captured."""
+
+_PIXEL_TILE_SIZE = 64 # The width and height of the tiles that FrameCache.getPixel() captures.
+
+
+class FrameCache(object):
+    """Keeps recent captures of the screen, so that callers that can use a
+    frame up to a few milliseconds old share one capture instead of each
+    making their own. getPixel() and screenshot() use the one returned by
+    getFrameCache() when they're given a maxAge.
+
+    A frame is never used once it's more than maxAge seconds old. Frames
+    are also dropped when the capture backend reports that the screen under
+    them changed (see CaptureBackend.subscribeDamage), when the mouse moves
+    if the backend's captures include the mouse cursor, and when
+    invalidate() is called. The oldest frames are dropped to keep the total
+    size of the frames under maxBytes.
+
+    generation goes up by one whenever a frame is captured or invalidate()
+    is called, so a caller can tell whether anything happened since it last
+    looked. hits and misses count the lookups that did and didn't find a
+    frame."""
+
+    def __init__(self, maxAge=1.0, maxBytes=64 * 1024 * 1024):
+        self.maxAge = maxAge
+        self.maxBytes = maxBytes
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.totalBytes = 0 # The size of the cached frames' pixels.
+        self._frames = collections.OrderedDict() # Maps a region to its (CachedFrame, backend, pointer, damage subscription), oldest first.
+        self._lock = threading.Lock()
+
+
+    def get(self, region=None, maxAge=None):
+        """Returns a CachedFrame that covers the (left, top, width, height)
+        region (by default, the whole screen) and is at most maxAge seconds
+        old (by default, this cache's maxAge), capturing one if there isn't
+        one. The CachedFrame may cover more of the screen than region."""
+        backend, pointer = self._captureState()
+        if region is None:
+            frame = self._find((0, 0) + tuple(size()), maxAge, backend, pointer)
+        else:
+            region = tuple(region)
+            frame = self._find(region, maxAge, backend, pointer)
+        return frame if frame is not None else self._capture(region, backend, pointer)
+
+
+    def screenshot(self, filename=None, region=None, maxAge=None):
+        """Returns a Pillow Image of the screen, or of the (left, top, width,
+        height) region of it, from a frame at most maxAge seconds old. The
+        Image is a copy that can be changed without affecting the cache."""
+        frame = self.get(region, maxAge)
+        frameLeft, frameTop = frame.region[:2]
+        if region is None:
+            region = frame.region
+        left, top, width, height = region
+        im = frame.image.crop((left - frameLeft, top - frameTop, left - frameLeft + width, top - frameTop + height))
+        if filename is not None:
+            im.save(filename)
+        return im
+
+
+    def getPixel(self, x, y, maxAge=None):
+        """Returns the (red, green, blue) color of the pixel at x, y from a
+        frame at most maxAge seconds old. If there isn't one, the tile of the
+        screen around the pixel is captured and cached."""
+        backend, pointer = self._captureState()
+        frame = self._find((x, y, 1, 1), maxAge, backend, pointer)
+        if frame is None:
+            monitor = monitorAt(x, y)
+            if monitor is None:
+                return getPixel(x, y) # Let the backend decide what a pixel off of every monitor is.
+            if not backend.region:
+                frame = self._capture(None, backend, pointer) # Capturing a tile would capture the whole screen anyway.
+            else:
+                left = max(x - x % _PIXEL_TILE_SIZE, monitor.left)
+                top = max(y - y % _PIXEL_TILE_SIZE, monitor.top)
+                right = min(x - x % _PIXEL_TILE_SIZE + _PIXEL_TILE_SIZE, monitor.left + monitor.width)
+                bottom = min(y - y % _PIXEL_TILE_SIZE + _PIXEL_TILE_SIZE, monitor.top + monitor.height)
+                frame = self._capture((left, top, right - left, bottom - top), backend, pointer)
+        return _imageGetPixel(frame.image, x - frame.region[0], y - frame.region[1])
+
+
+    def invalidate(self, region=None):
+        """Drop the frames that overlap the (left, top, width, height) region
+        (by default, every frame), because the screen there has changed."""
+        with self._lock:
+            self.generation += 1
+            dropped = [key for key in self._frames if region is None or _regionsOverlap(key, region)]
+            subscriptions = [self._drop(key) for key in dropped]
+        self._closeSubscriptions(subscriptions)
+
+
+    def clear(self):
+        """Drop every frame."""
+        self.invalidate()
+
+
+    def __len__(self):
+        return len(self._frames)
+
+
+    def _captureState(self):
+        # Returns the backend that screenshot() uses, and the mouse position
+        # if that backend's captures include the mouse cursor (or None). The
+        # position is read once per lookup, before taking the lock, since it
+        # can mean a round trip to the display server.
+        backend = _backendFor('screenshot')
+        return backend, None if backend.cursorFree else position()
+
+
+    def _find(self, region, maxAge, backend, pointer):
+        # Returns the newest CachedFrame that covers region, is young enough,
+        # and was captured by backend with the mouse at pointer, or None.
+        maxAge = self.maxAge if maxAge is None else min(maxAge, self.maxAge)
+        left, top, width, height = region
+        now = _timer()
+        with self._lock:
+            for key in reversed(list(self._frames)):
+                frame, frameBackend, framePointer, subscription = self._frames[key]
+                if now - frame.timestamp > maxAge or frameBackend is not backend:
+                    continue
+                if not (key[0] <= left and key[1] <= top and left + width <= key[0] + key[2] and top + height <= key[1] + key[3]):
+                    continue
+                if framePointer != pointer:
+                    continue # The mouse cursor moved since this frame (which includes it) was captured.
+                self.hits += 1
+                return frame
+            self.misses += 1
+        return None
+
+
+    def _capture(self, region, backend, pointer):
+        # Capture region (or the whole screen, if it's None) with backend and
+        # cache it. pointer is the mouse position read before the capture.
+        # Subscribe before capturing, so a change during the capture drops the frame.
+        watchedRegion = region if region is not None else (0, 0) + tuple(size())
+        subscription = _subscribeDamage('screenshot', watchedRegion, lambda: self.invalidate(watchedRegion))
+        timestamp = _timer()
+        im = screenshot(region=region)
+        if region is None:
+            region = (0, 0) + im.size
+
+        with self._lock:
+            self.generation += 1
+            frame = CachedFrame(timestamp, self.generation, region, im)
+            frameBytes = im.size[0] * im.size[1] * len(im.getbands())
+            subscriptions = []
+            if region in self._frames:
+                subscriptions.append(self._drop(region))
+            if frameBytes <= self.maxBytes:
+                self._frames[region] = (frame, backend, pointer, subscription)
+                self.totalBytes += frameBytes
+            else:
+                subscriptions.append(subscription) # This frame is too big to keep at all.
+
+            # Drop the frames that are too old to ever be used, then the oldest
+            # ones until the rest fit under maxBytes.
+            for key in list(self._frames):
+                if timestamp - self._frames[key][0].timestamp > self.maxAge or self.totalBytes > self.maxBytes:
+                    subscriptions.append(self._drop(key))
+        self._closeSubscriptions(subscriptions)
+        return frame
+
+
+    def _drop(self, key):
+        # Remove a frame from the cache and return its damage subscription.
+        # The caller must hold the lock.
+        frame, backend, pointer, subscription = self._frames.pop(key)
+        self.totalBytes -= frame.image.size[0] * frame.image.size[1] * len(frame.image.getbands())
+        return subscription
+
+
+    def _closeSubscriptions(self, subscriptions):
+        for subscription in subscriptions:
+            if subscription is not None:
+                subscription.close()
+
+
+_frameCache = FrameCache()
+_WINDOW_FRAME_MAX_AGE = 0.05 # The oldest cached frame, in seconds, that the MouseInfo window saves screenshots from.
+
+
+def getFrameCache():
+    """Returns the FrameCache that getPixel() and screenshot() use when
+    they're given a maxAge. Change its maxAge and maxBytes attributes to
+    change the oldest frame it will ever return and how much memory it
+    uses, and call its invalidate() method when you know the screen has
+    changed."""
+    return _frameCache
+
+
+# =========================================================================
+# Frame buffer pool
+#
+# Every screenshot() allocates a new Image, which at high capture rates
+# makes the process's memory use swing by a full frame each time. Captures
+# that are only needed for a moment can instead be leased from a
+# FrameBufferPool: the backend's raw pixels (see CaptureBackend.rawPixels)
+# are decoded in place into an Image that was used before, and the Image is
+# returned to the pool when the lease is released, so sustained capturing
+# doesn't allocate any new frames. Backends without rawPixels can only
+# return a new Image, so with them a lease just wraps a plain screenshot
+# and nothing is reused.
+
+class FrameLease(object):
+    """A capture in a Pillow Image borrowed from a FrameBufferPool. The
+    Image is only valid until release() is called, after which the pool
+    gives it to the next capture, so call keep() for an Image to keep. Use
+    a FrameLease in a with statement to release it automatically.
+
+    region is the (left, top, width, height) area of the screen that the
+    Image shows."""
+
+    def __init__(self, pool, image, region):
+        # pool is None for a plain screenshot that isn't given back to a pool.
+        self.region = region
+        self._pool = pool
+        self._image = image
+
+
+    @property
+    def image(self):
+        """The leased Pillow Image. Raises ValueError after release()."""
+        if self._image is None:
+            raise ValueError('This FrameLease was released.')
+        return self._image
+
+
+    def keep(self):
+        """Returns a copy of the Image that stays valid after release()."""
+        return self.image.copy()
+
+
+    def getPixel(self, x, y):
+        """Returns the (red, green, blue) color of the pixel at the screen
+        coordinates x, y, which must be in region."""
+        left, top, width, height = self.region
+        if not (left <= x < left + width and top <= y < top + height):
+            raise ValueError('%s,%s is outside of the leased region %r' % (x, y, self.region))
+        return _imageGetPixel(self.image, x - left, y - top)
+
+
+    def release(self):
+        """Give the Image back to the pool. Releasing it again does nothing."""
+        if self._image is not None:
+            image, self._image = self._image, None
+            if self._pool is not None:
+                self._pool._return(image)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, excType, excValue, traceback):
+        self.release()
+
+
+class FrameBufferPool(object):
+    """Lends out Pillow Images to capture the screen into, reusing released
+    ones of the same size instead of allocating new ones. At most maxIdle
+    released Images are kept for reuse; the ones that were released longest
+    ago are dropped first.
+
+    allocations counts the Images the pool has had to create, and leases
+    counts the FrameLeases it has given out, so allocations staying the
+    same while leases goes up means the memory use is flat."""
+
+    def __init__(self, maxIdle=4):
+        self.maxIdle = maxIdle
+        self.allocations = 0
+        self.leases = 0
+        self._idle = [] # Released Images, oldest first.
+        self._lock = threading.Lock()
+
+
+    def lease(self, width, height):
+        """Returns a FrameLease of a width x height RGB Image with whatever
+        pixels it had last. Its region is (0, 0, width, height)."""
+        from PIL import Image
+        with self._lock:
+            self.leases += 1
+            for i in range(len(self._idle) - 1, -1, -1):
+                if self._idle[i].size == (width, height):
+                    return FrameLease(self, self._idle.pop(i), (0, 0, width, height))
+            self.allocations += 1
+        return FrameLease(self, Image.new('RGB', (width, height)), (0, 0, width, height))
+
+
+    def screenshot(self, region=None):
+        """Capture the screen, or the (left, top, width, height) region of
+        it, into a leased Image and return the FrameLease. With backends
+        that have a rawPixels function (such as xshm and the fake display),
+        the pixels are decoded straight into the leased Image. Other
+        backends can only capture into a new Image, so the lease holds a
+        plain screenshot that isn't reused (and counts as an allocation)."""
+        if region is None:
+            region = (0, 0) + tuple(size())
+        left, top, width, height = region
+        if width <= 0 or height <= 0:
+            raise ValueError('region width and height must be positive: %r' % (tuple(region),))
+        if _backendFor('screenshot').rawPixels is None:
+            im = _screenshot(None, tuple(region))
+            with self._lock:
+                self.leases += 1
+                self.allocations += 1
+            return FrameLease(None, im if im.mode == 'RGB' else im.convert('RGB'), tuple(region))
+        frameLease = self.lease(width, height)
+        frameLease.region = tuple(region)
+        try:
+            buffer, offset, bytesPerLine, rawmode = _rawPixels(frameLease.region)
+            frameLease.image.frombytes(_byteView(buffer)[offset:], 'raw', rawmode, bytesPerLine)
+        except Exception:
+            frameLease.release()
+            raise
+        return frameLease
+
+
+    def clear(self):
+        """Drop every released Image."""
+        with self._lock:
+            del self._idle[:]
+
+
+    def _return(self, image):
+        with self._lock:
+            self._idle.append(image)
+            if len(self._idle) > self.maxIdle:
+                del self._idle[:len(self._idle) - self.maxIdle]
+
+
+_framePool = FrameBufferPool()
+
+
+def leaseScreenshot(region=None):
+    """Capture the screen, or the (left, top, width, height) region of it,
+    into a reused Image and return a FrameLease of it. Release the lease
+    (or use it in a with statement) when done with the Image, so the next
+    capture can reuse it:
+
+        with mouseinfo.leaseScreenshot((0, 0, 640, 480)) as frame:
+            color = frame.getPixel(320, 240)
+
+    Call the lease's keep() method for an Image that stays valid after it's
+    released. Capturing this way doesn't allocate a new frame each time."""
+    if _statsHistograms is None:
+        return _framePool.screenshot(region)
+    return _timedCall('leaseScreenshot:' + _backendFor('screenshot').name, _framePool.screenshot, region)
+
+
+def getFramePool():
+    """Returns the FrameBufferPool that leaseScreenshot() uses."""
+    return _framePool
+
+
+def regionAround(x, y, regionSize=9):
+    """Returns the (left, top, width, height) region of a regionSize x
+    regionSize square centered on x, y, clipped so that it doesn't extend past
+    the edges of the monitor that x, y is on (or the primary monitor, if it's
+    not on any). For example, to grab the pixels around the mouse cursor:
+    grabRegion(*regionAround(*position()))"""
+    monitor = monitorAt(x, y) or getMonitors()[0]
+    left = min(max(x - regionSize // 2, monitor.left), monitor.left + max(monitor.width - regionSize, 0))
+    top = min(max(y - regionSize // 2, monitor.top), monitor.top + max(monitor.height - regionSize, 0))
+    return (left, top, min(regionSize, monitor.width), min(regionSize, monitor.height))
+
+
+_pointerTracker = None # The PointerTracker started by startPointerTracking().
+_pinnedBeforeTracking = None # The backend name pinned for position() before startPointerTracking() was called.
+
+
+def startPointerTracking(historySize=10000):
+    """Start following the mouse with the X server's pointer motion events
+    (through the RECORD extension) instead of asking the X server where the
+    mouse is on every position() call. After this, position() returns the
+    latest known position without a round trip to the X server, and
+    getPointerHistory() returns the last historySize motion events.
+
+    This is only supported on Linux. Returns the PointerTracker object."""
+    global _pointerTracker, _pinnedBeforeTracking
+    if not sys.platform.startswith('linux'):
+        raise NotImplementedError('Pointer tracking is only supported on Linux.')
+    if _pointerTracker is not None:
+        return _pointerTracker
+
+    from mouseinfo._mouseinfo_x11 import PointerTracker
+    tracker = PointerTracker(os.environ.get('DISPLAY'), historySize)
+    tracker.start()
+    _pointerTracker = tracker
+    _parseBackendEnv()
+    _pinnedBeforeTracking = _pinnedBackends.get('position')
+    registerBackend(CaptureBackend('xrecord', position=tracker.position))
+    useBackend('xrecord', 'position')
+    return tracker
+
+
+def stopPointerTracking():
+    """Stop the pointer tracking started by startPointerTracking() and go
+    back to asking the X server for the mouse position. If a backend was
+    pinned for position() before tracking started, it's pinned again."""
+    global _pointerTracker, _pinnedBeforeTracking
+    if _pointerTracker is None:
+        return
+    unregisterBackend('xrecord')
+    if _pinnedBeforeTracking in [backend.name for backend in getBackends('position')]:
+        useBackend(_pinnedBeforeTracking, 'position')
+    _pinnedBeforeTracking = None
+    _pointerTracker.stop()
+    _pointerTracker = None
+
+
+def getPointerHistory():
+    """Returns a list of (serverTime, x, y) tuples for the pointer motion
+    events seen since startPointerTracking() was called, oldest first.
+    serverTime is the X server's timestamp in milliseconds."""
+    if _pointerTracker is None:
+        raise RuntimeError('Call startPointerTracking() before getPointerHistory().')
+    return _pointerTracker.history()
+
+
+Sample = collections.namedtuple('Sample', ['timestamp', 'x', 'y', 'rgb', 'points'])
+Sample.__new__.__defaults__ = (None,) # points is optional.
+Sample.__doc__ = """The mouse position and the (red, green, blue) color of the
+pixel under it at a moment in time. rgb is None if the color wasn't read,
+such as when the mouse is in a gap between monitors. points is either None
+or a list of the colors of other watched points (see takeSample())."""
+
+
+def takeSample(region=None, points=None):
+    """Returns a Sample of the mouse position and the color of the pixel
+    under it. points is an optional list of (x, y) coordinates whose colors
+    are put in the Sample's points list.
+
+    If region is a (left, top, width, height) tuple, the region is captured
+    once and all colors are read from that capture. Colors of coordinates
+    outside of the region (or, without a region, outside every monitor) are
+    None."""
+    x, y = position()
+    timestamp = _timer()
+    if region is None:
+        monitorIndex = _currentMonitorIndex() # The monitor layout is looked up once per sample.
+        def colorAt(pointX, pointY):
+            if monitorIndex.monitorAt(pointX, pointY) is not None:
+                return getPixel(pointX, pointY)
+            return None
+    else:
+        # The capture is only needed until the colors are read, so it's leased
+        # from the frame pool instead of allocating a new Image every sample.
+        left, top, width, height = region
+        frameLease = leaseScreenshot(region)
+        def colorAt(pointX, pointY):
+            if left <= pointX < left + width and top <= pointY < top + height:
+                return frameLease.getPixel(pointX, pointY)
+            return None
+
+    try:
+        rgb = colorAt(x, y)
+        if points is not None:
+            points = [colorAt(pointX, pointY) for pointX, pointY in points]
+    finally:
+        if region is not None:
+            frameLease.release()
+    return Sample(timestamp, x, y, rgb, points)
+
+
+class RateScheduler(object):
+    """An iterator that sleeps until each tick of a fixed-rate schedule and
+    then yields the tick's deadline (in _timer() seconds). Deadlines are
+    computed from the start time, so they don't drift. If the caller falls
+    more than one tick behind, the missed ticks are skipped (and counted in
+    the skipped attribute) instead of being run back to back. If duration is
+    given, the iteration stops after that many seconds.
+
+    clock and sleep replace _timer() and time.sleep(), so that tests can
+    run a schedule on a made-up clock."""
+
+    def __init__(self, rate, duration=None, clock=None, sleep=None):
+        if rate <= 0:
+            raise ValueError('rate must be a positive number, not %r' % (rate,))
+        self.rate = rate
+        self.period = 1.0 / rate
+        self.duration = duration
+        self.clock = _timer if clock is None else clock
+        self.sleep = time.sleep if sleep is None else sleep
+        self.ticks = 0 # The number of deadlines yielded.
+        self.skipped = 0 # The number of deadlines skipped because the caller fell behind.
+
+    def __iter__(self):
+        startTime = self.clock()
+        tick = 0
+        while True:
+            # (The small epsilon keeps floating point error from adding an extra tick.)
+            if self.duration is not None and tick >= self.duration * self.rate - 1e-9:
+                return
+            deadline = startTime + tick * self.period
+            now = self.clock()
+            if now < deadline:
+                self.sleep(deadline - now)
+            elif now - deadline >= self.period:
+                missed = int((now - deadline) / self.period)
+                self.skipped += missed
+                tick += missed
+                deadline = startTime + tick * self.period
+            self.ticks += 1
+            yield deadline
+            tick += 1
+
+
+def iterSamples(rate=60, duration=None, region=None, points=None):
+    """Yields a Sample (see takeSample()) rate times a second, for duration
+    seconds or forever if duration is None. Samples are generated one at a
+    time, so memory use doesn't grow no matter how long this runs."""
+    for deadline in RateScheduler(rate, duration):
+        yield takeSample(region, points)
+
+
+def stream(rate=60, region=None, points=None):
+    """Returns an asynchronous iterator of Samples (see takeSample()) for
+    asyncio code, taken rate times a second:
+
+        async for sample in mouseinfo.stream(rate=30):
+            print(sample.x, sample.y, sample.rgb)
+
+    The capturing is done in the event loop's default executor so that it
+    doesn't block the event loop. Streams with the same rate, region, and
+    points share one capture per tick. If a consumer falls behind, it gets
+    the newest sample and the older ones are dropped. Use async with, or
+    call aclose(), to stop a stream.
+
+    This requires Python 3.5 or later."""
     if RUNNING_PYTHON_2:
+        raise NotImplementedError('mouseinfo.stream() requires Python 3.5 or later.')
+    from mouseinfo._mouseinfo_async import SampleStream
+    return SampleStream(rate, region, points)
+
+
+def createRecording(filename, rate=0):
+    """Creates (or overwrites) a binary recording file and returns a
+    RecordingWriter for it. Call its write() method with each Sample to
+    record, and close() when done:
+
+        with mouseinfo.createRecording('session.mirec', rate=100) as recording:
+            for sample in mouseinfo.iterSamples(rate=100, duration=60):
+                recording.write(sample)
+
+    Each sample takes 20 bytes. rate is only stored in the file's header for
+    reference. Only the color under the mouse is recorded, not the colors of
+    a sample's points."""
+    from mouseinfo._mouseinfo_recording import RecordingWriter
+    return RecordingWriter(filename, rate)
+
+
+def openRecording(filename):
+    """Opens a binary recording file made by createRecording() (or by
+    python -m mouseinfo --headless --format binary) and returns a Recording
+    object. The file is memory-mapped, so this is fast no matter how big the
+    file is. See the Recording class for how to read the records."""
+    from mouseinfo._mouseinfo_recording import Recording
+    return Recording(filename)
+
+
+def createTrace(filename, rate=0, timeResolution=0.001):
+    """Creates (or overwrites) a compressed trace file and returns a
+    TraceWriter for it, which is used the same way as createRecording()'s
+    RecordingWriter. Each record is stored as what changed since the
+    previous one (samples where nothing changed take almost no space), and
+    timestamps are rounded to timeResolution seconds."""
+    from mouseinfo._mouseinfo_recording import TraceWriter
+    return TraceWriter(filename, rate, timeResolution)
+
+
+def openTrace(filename):
+    """Opens a compressed trace file made by createTrace() (or by python -m
+    mouseinfo --headless --format trace) and returns a TraceReader. Iterate
+    over it to decode its records, in order, as Record namedtuples."""
+    from mouseinfo._mouseinfo_recording import TraceReader
+    return TraceReader(filename)
+
+
+def createPixelWatcher(rate=10):
+    """Returns a new PixelWatcher, which checks many points and rectangles of
+    the screen for colors, conditions, and changes rate times a second, with
+    one capture per tick for all of them. For example, to wait up to 10
+    seconds for a button to turn green:
+
+        watcher = mouseinfo.createPixelWatcher(rate=20)
+        button = watcher.watch((640, 480), color=(0, 200, 0), tolerance=20)
+        with watcher:
+            if button.wait(timeout=10):
+                print('The button is green.')
+
+    This requires NumPy."""
+    from mouseinfo._mouseinfo_watch import PixelWatcher
+    return PixelWatcher(rate)
+
+
+def createFrameDiffer(tileSize=64, region=None):
+    """Returns a new FrameDiffer, whose diff() method captures the screen (or
+    the (left, top, width, height) region of it) and returns the rectangles
+    that changed since its last call. For example, to log what changed once a
+    second:
+
+        differ = mouseinfo.createFrameDiffer()
+        while True:
+            for left, top, width, height in differ.diff():
+                print('Changed: %s,%s %sx%s' % (left, top, width, height))
+            time.sleep(1)
+
+    The screen is compared in tileSize x tileSize tiles, and only a 64-bit
+    signature of each tile is kept between calls, so the rectangles are
+    always whole tiles (cut off at the edges of the screen). diff() can also
+    be given Pillow Images or NumPy arrays to compare instead. This requires
+    NumPy."""
+    from mouseinfo._mouseinfo_diff import FrameDiffer
+    return FrameDiffer(tileSize, region)
+
+
+class Sampler(object):
+    """Reads the mouse position and the color of the pixel under it on a
+    background thread, so that a slow capture backend never blocks the
+    thread that displays the information.
+
+    The position is polled up to maxRate times a second while the mouse is
+    moving, backing off towards once every idleInterval milliseconds while
+    it's still. The pixel color is read when the mouse moves. While it's
+    still, the color is only read again after the getPixel() backend reports
+    that the screen under it was drawn to (see CaptureBackend.subscribeDamage),
+    which also wakes the thread up for an early poll. With a backend that
+    can't report that, the color is read again every pixelInterval
+    milliseconds instead. Set readPixels to False to only sample the
+    position. maxPixelAge is passed to getPixel() as its maxAge,
+    so the colors can come from the frame cache. If calibrate is True, the
+    thread first runs calibrateBackends() for the operations it uses, and
+    sets the backendInfo attribute to the dictionary it returned.
+
+    Only the newest Sample is kept: takeLatest() returns it, and samples that
+    were replaced before anyone took them are counted in the dropped
+    attribute. Polls that started late because the previous one took longer
+    than the polling interval are counted in the late attribute. The
+    _timer() time of the next scheduled poll is kept in nextPollTime. The
+    last exception raised while sampling is kept in lastError; takeError()
+    returns it and clears it."""
+
+    def __init__(self, maxRate=60, idleInterval=1000, readPixels=True, maxPixelAge=0, calibrate=False, pixelInterval=5000):
+        if maxRate <= 0:
+            raise ValueError('maxRate must be a positive number, not %r' % (maxRate,))
+        if idleInterval <= 0:
+            raise ValueError('idleInterval must be a positive number, not %r' % (idleInterval,))
+        if pixelInterval <= 0:
+            raise ValueError('pixelInterval must be a positive number, not %r' % (pixelInterval,))
+
+        self.maxRate = maxRate
+        self.idleInterval = idleInterval
+        self.pixelInterval = pixelInterval
+        self.readPixels = readPixels
+        self.maxPixelAge = maxPixelAge
+        self.calibrate = calibrate
+        self.backendInfo = None # What calibrateBackends() returned, once the thread has run it.
+        self.polls = 0 # The number of times the position has been read.
+        self.samples = 0 # The number of samples published.
+        self.dropped = 0 # The number of samples replaced before they were taken.
+        self.late = 0 # The number of polls that started later than scheduled.
+        self.nextPollTime = None # The _timer() time of the next scheduled poll, once the thread is running.
+        self.lastError = None # The last exception raised while sampling, if any.
+
+        self._lock = threading.Lock()
+        self._latest = None
+        self._latestTaken = True
+        self._forceSample = False
+        self._interval = 1.0 / maxRate # Seconds until the next poll.
+        self._lastState = None # The (x, y, monitors) of the previous poll.
+        self._lastPixelTime = 0 # The pollTime of the last poll that read the pixel color.
+        self._watchedPixel = None # The (x, y) of the still mouse that _damageSubscription was made for.
+        self._damageSubscription = None # The damage report subscription for the pixel under the still mouse, if any.
+        self._pixelDamaged = False # Set when the screen under the still mouse may have changed.
+        self._stopEvent = threading.Event()
+        self._wakeEvent = threading.Event() # Set to start the next poll early.
+        self._thread = None
+
+
+    def start(self):
+        """Start sampling on a background thread."""
+        if self._thread is not None:
+            return
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target=self._run, name='mouseinfo-sampler')
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def stop(self):
+        """Stop sampling and wait for the background thread to finish."""
+        if self._thread is None:
+            return
+        self._stopEvent.set()
+        self._wakeEvent.set()
+        self._thread.join()
+        self._thread = None
+
+
+    def refresh(self):
+        """Make the next poll read the pixel color even if the mouse hasn't
+        moved, and start that poll now."""
+        self._forceSample = True
+        self._wakeEvent.set()
+
+
+    def takeLatest(self):
+        """Returns the newest Sample, or None if there hasn't been a new
+        sample since the last call."""
+        with self._lock:
+            if self._latestTaken:
+                return None
+            self._latestTaken = True
+            return self._latest
+
+
+    def latest(self):
+        """Returns the newest Sample (or None if there hasn't been one yet)
+        without marking it as taken."""
+        return self._latest
+
+
+    def takeError(self):
+        """Returns the last exception raised while sampling, or None if
+        there hasn't been one since the last call."""
+        with self._lock:
+            error, self.lastError = self.lastError, None
+            return error
+
+
+    def _publish(self, sample):
+        with self._lock:
+            if not self._latestTaken:
+                self.dropped += 1
+            self._latest = sample
+            self._latestTaken = False
+            self.samples += 1
+
+
+    def _poll(self, pollTime):
+        # Read the position (and, if needed, the pixel color) at the _timer()
+        # time pollTime, and return the number of seconds until the next poll.
+        moved = False
         try:
+            x, y = position()
+            monitors = getMonitors()
+            self.polls += 1
+            moved = self._lastState is None or (x, y) != self._lastState[:2] or monitors is not self._lastState[2]
+            self._lastState = (x, y, monitors)
+
+            # Skip the expensive pixel work while the mouse and the monitor
+            # layout haven't changed, until the backend reports that the
+            # screen under the mouse was drawn to. Backends that can't report
+            # that get the color read every pixelInterval milliseconds.
+            if moved:
+                self._unwatchPixel()
+            elif self.readPixels and self._watchedPixel != (x, y):
+                self._watchPixel(x, y)
+            damaged, self._pixelDamaged = self._pixelDamaged, False
+            stale = (self.readPixels and self._damageSubscription is None and
+                     (pollTime - self._lastPixelTime) * 1000 >= self.pixelInterval)
+            if moved or self._forceSample or damaged or stale:
+                self._forceSample = False
+                self._lastPixelTime = pollTime
+                rgb = None
+                if self.readPixels and monitorAt(x, y) is not None:
+                    rgb = getPixel(x, y, self.maxPixelAge)
+                self._publish(Sample(pollTime, x, y, rgb))
+        except Exception as e:
+            with self._lock:
+                self.lastError = e
+
+        # Poll at maxRate while the mouse is moving, and back off towards
+        # idleInterval while it's still:
+        if moved:
+            self._interval = 1.0 / self.maxRate
+        else:
+            self._interval = min(self._interval * 1.5, self.idleInterval / 1000.0)
+        return self._interval
+
+
+    def _watchPixel(self, x, y):
+        # Subscribe to damage reports for the pixel under the still mouse.
+        # The color is read once more after subscribing, since it could have
+        # changed between the last read and the subscription.
+        self._unwatchPixel()
+        self._watchedPixel = (x, y)
+        self._damageSubscription = _subscribeDamage('getPixel', (x, y, 1, 1), self._onPixelDamaged)
+        self._pixelDamaged = self._damageSubscription is not None
+
+
+    def _unwatchPixel(self):
+        if self._damageSubscription is not None:
+            self._damageSubscription.close()
+        self._damageSubscription = None
+        self._watchedPixel = None
+
+
+    def _onPixelDamaged(self):
+        # Called (on any thread) when the screen under the still mouse may have changed.
+        self._pixelDamaged = True
+        self._wakeEvent.set()
+
+
+    def _run(self):
+        if self.calibrate and self.backendInfo is None:
+            # Calibrating takes a while, so it's done here instead of
+            # holding up the thread that started the sampler.
+            try:
+                self.backendInfo = calibrateBackends(['position', 'getPixel'] if self.readPixels else ['position'])
+            except Exception as e:
+                with self._lock:
+                    self.lastError = e
+
+        self._interval = 1.0 / self.maxRate
+        self._lastState = None
+        self._lastPixelTime = 0
+        while not self._stopEvent.is_set():
+            pollTime = _timer()
+            self.nextPollTime = pollTime + self._poll(pollTime)
+            delay = self.nextPollTime - _timer()
+            if delay < 0:
+                self.late += 1
+                delay = 0
+            # Damage reports, refresh(), and stop() end the wait early.
+            self._wakeEvent.wait(delay)
+            self._wakeEvent.clear()
+        self._unwatchPixel()
+
+
+def getPixel(x, y, maxAge=0):
+    """Returns the (red, green, blue) color of the pixel at x, y.
+
+    If maxAge is more than 0, the color may come from a capture up to maxAge
+    seconds old in the frame cache (see getFrameCache()) instead of a new
+    one. That makes reading many nearby pixels much cheaper."""
+    if maxAge:
+        return _frameCache.getPixel(x, y, maxAge)
+    backend = _backendFor('getPixel')
+    if _statsHistograms is None:
+        return backend.getPixel(x, y)
+    return _timedCall('getPixel:' + backend.name, backend.getPixel, x, y)
+
+
+_RAW_MODES = {'RGB': (3, [0, 1, 2]), 'BGRX': (4, [2, 1, 0])} # Maps a rawmode to its bytes per pixel and the offsets of its red, green, and blue bytes.
+
+
+def _importNumpy():
+    # Returns the numpy module, or None if it isn't installed.
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _rawPixels(region):
+    # Capture region with the screenshot backend, returning the same
+    # (buffer, offset, bytesPerLine, rawmode) tuple as CaptureBackend.rawPixels.
+    backend = _backendFor('screenshot')
+    if backend.rawPixels is not None:
+        return backend.rawPixels(region)
+    im = _screenshot(None, region)
+    if im.mode != 'RGB':
+        im = im.convert('RGB')
+    return im.tobytes(), 0, im.size[0] * 3, 'RGB'
+
+
+def _byteView(buffer):
+    # Returns a memoryview of buffer's bytes. ctypes arrays (such as the
+    # MIT-SHM segment) have a format that has to be cast to bytes first.
+    view = memoryview(buffer)
+    if view.format != 'B' and hasattr(view, 'cast'):
+        view = view.cast('B')
+    return view
+
+
+def _rawArrayView(numpy, raw, width, height):
+    # Returns a read-only height x width x 3 NumPy view of the RGB pixels in
+    # the (buffer, offset, bytesPerLine, rawmode) tuple from _rawPixels(),
+    # without copying them. Each pixel's view starts at its red byte and steps
+    # towards blue (backwards, for BGRX). It's only valid until the next capture.
+    buffer, offset, bytesPerLine, rawmode = raw
+    bytesPerPixel, channels = _RAW_MODES[rawmode]
+    flat = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    return numpy.lib.stride_tricks.as_strided(flat[offset + channels[0]:], shape=(height, width, 3),
+                                              strides=(bytesPerLine, bytesPerPixel, channels[1] - channels[0]),
+                                              writeable=False)
+
+
+def getPixels(points):
+    """Returns the (red, green, blue) colors of the pixels at each (x, y)
+    point in points. They're all read from one capture of the smallest region
+    that contains every point, so checking many nearby points costs about the
+    same as checking one.
+
+    If NumPy is installed, the colors are returned as an n x 3 array of
+    uint8 values. Otherwise, they're returned as an array.array('B') of
+    3 * n values: the first point's red, green, and blue, then the second
+    point's, and so on."""
+    if _statsHistograms is None:
+        return _getPixels(points)
+    return _timedCall('getPixels:' + _backendFor('screenshot').name, _getPixels, points)
+
+
+def _getPixels(points):
+    numpy = _importNumpy()
+    points = list(points)
+    if not points:
+        return array.array('B') if numpy is None else numpy.zeros((0, 3), dtype=numpy.uint8)
+
+    if numpy is not None:
+        coordinates = numpy.asarray(points, dtype=numpy.intp).reshape(len(points), 2)
+        xs, ys = coordinates[:, 0], coordinates[:, 1]
+        left, top = int(xs.min()), int(ys.min())
+        region = (left, top, int(xs.max()) - left + 1, int(ys.max()) - top + 1)
+    else:
+        left = min(x for x, y in points)
+        top = min(y for x, y in points)
+        region = (left, top, max(x for x, y in points) - left + 1, max(y for x, y in points) - top + 1)
+
+    buffer, offset, bytesPerLine, rawmode = _rawPixels(region)
+    bytesPerPixel, channels = _RAW_MODES[rawmode]
+    if numpy is not None:
+        # Gather every point's three bytes with one fancy-indexing pass.
+        starts = offset + (ys - top) * bytesPerLine + (xs - left) * bytesPerPixel
+        return numpy.frombuffer(buffer, dtype=numpy.uint8)[starts[:, None] + channels]
+
+    data = _byteView(buffer)
+    colors = bytearray()
+    for x, y in points:
+        start = offset + (y - top) * bytesPerLine + (x - left) * bytesPerPixel
+        pixel = bytearray(data[start:start + bytesPerPixel].tobytes())
+        colors.extend([pixel[channel] for channel in channels])
+    return array.array('B', bytes(colors))
+
+
+def getRegionPixels(region):
+    """Returns the colors of every pixel in the (left, top, width, height)
+    region from one capture, without making a Pillow Image.
+
+    If NumPy is installed, the colors are returned as a height x width x 3
+    array of uint8 values, so the color at x, y is result[y - top, x - left].
+    Otherwise, they're returned as an array.array('B') of the red, green, and
+    blue values of each pixel, row by row."""
+    if _statsHistograms is None:
+        return _getRegionPixels(region)
+    return _timedCall('getRegionPixels:' + _backendFor('screenshot').name, _getRegionPixels, region)
+
+
+def _getRegionPixels(region):
+    left, top, width, height = region
+    if width <= 0 or height <= 0:
+        raise ValueError('region width and height must be positive: %r' % (tuple(region),))
+    numpy = _importNumpy()
+    raw = _rawPixels(tuple(region))
+    if numpy is not None:
+        return _rawArrayView(numpy, raw, width, height).copy() # Copy it out of the capture buffer in one pass.
+
+    buffer, offset, bytesPerLine, rawmode = raw
+    bytesPerPixel, channels = _RAW_MODES[rawmode]
+    data = _byteView(buffer)
+    colors = bytearray(width * height * 3)
+    for row in range(height):
+        start = offset + row * bytesPerLine
+        rowBytes = bytearray(data[start:start + width * bytesPerPixel].tobytes())
+        rowStart = row * width * 3
+        for i, channel in enumerate(channels):
+            colors[rowStart + i:rowStart + width * 3:3] = rowBytes[channel::bytesPerPixel]
+    return array.array('B', bytes(colors))
+
+
+_DAMAGE_POLL_INTERVAL = 0.05 # Seconds between checks while waiting on a backend that can't report damage.
+
+
+def _subscribeDamage(operation, region, callback):
+    # Subscribe callback to changes in region with the backend selected for
+    # operation. Returns the subscription, or None if it can't report them.
+    backend = _backendFor(operation)
+    if backend.subscribeDamage is None:
+        return None
+    return backend.subscribeDamage(region, callback)
+
+
+def _waitUntil(condition, operation, region, timeout):
+    # Call condition() until it returns True and return True, or return False
+    # once timeout seconds have passed. It's only called again after the
+    # backend selected for operation reports that region may have changed
+    # (or every _DAMAGE_POLL_INTERVAL seconds if it can't report that).
+    damaged = threading.Event()
+    subscription = _subscribeDamage(operation, region, damaged.set)
+    deadline = None if timeout is None else _timer() + timeout
+    try:
+        while True:
+            # Clear the flag before checking, so a change during the check isn't missed.
+            damaged.clear()
+            if condition():
+                return True
+            remaining = None if deadline is None else deadline - _timer()
+            if remaining is not None and remaining <= 0:
+                return False
+            if subscription is None:
+                remaining = _DAMAGE_POLL_INTERVAL if remaining is None else min(remaining, _DAMAGE_POLL_INTERVAL)
+            damaged.wait(remaining)
+    finally:
+        if subscription is not None:
+            subscription.close()
+
+
+def _pixelMatches(x, y, color, tolerance):
+    # Returns a function that returns True if the pixel at x, y is within tolerance of color.
+    def matches():
+        return all(abs(value - target) <= tolerance for value, target in zip(getPixel(x, y), color))
+    return matches
+
+
+def _regionChanged(region):
+    # Returns a function that returns True once region's pixels are different
+    # from what they were the first time it was called.
+    original = []
+    def changed():
+        pixels = getRegionPixels(region).tobytes()
+        if not original:
+            original.append(pixels)
+            return False
+        return pixels != original[0]
+    return changed
+
+
+def waitForPixel(x, y, color, tolerance=0, timeout=None):
+    """Wait until the pixel at x, y is within tolerance of the (red, green,
+    blue) color in every channel and return True, or return False if timeout
+    seconds pass first. With None for timeout, this waits forever.
+
+    With an X server that has the DAMAGE extension (and with the fake
+    display), the pixel is only read again after the X server reports that
+    the screen around it was drawn to, so waiting takes no CPU time and this
+    returns as soon as the pixel changes. Otherwise, the pixel is read every
+    50 ms."""
+    return _waitUntil(_pixelMatches(x, y, color, tolerance), 'getPixel', (x, y, 1, 1), timeout)
+
+
+def waitForRegionChange(region, timeout=None):
+    """Wait until any pixel in the (left, top, width, height) region is
+    different from when this was called and return True, or return False if
+    timeout seconds pass first. Like waitForPixel(), this sleeps until the X
+    server reports that the region was drawn to, if it can."""
+    region = tuple(region)
+    return _waitUntil(_regionChanged(region), 'screenshot', region, timeout)
+
+
+def waitForPixelAsync(x, y, color, tolerance=0, timeout=None):
+    """Returns a coroutine that does what waitForPixel() does without
+    blocking the event loop:
+
+        found = await mouseinfo.waitForPixelAsync(640, 480, (0, 200, 0), timeout=10)
+
+    The pixel is read in the event loop's default executor."""
+    from mouseinfo._mouseinfo_async import waitUntil
+    return waitUntil(_pixelMatches(x, y, color, tolerance), 'getPixel', (x, y, 1, 1), timeout)
+
+
+def waitForRegionChangeAsync(region, timeout=None):
+    """Returns a coroutine that does what waitForRegionChange() does
+    without blocking the event loop. The region is first read when the
+    coroutine starts running, not when this is called."""
+    from mouseinfo._mouseinfo_async import waitUntil
+    region = tuple(region)
+    return waitUntil(_regionChanged(region), 'screenshot', region, timeout)
+
+
+LogEntry = collections.namedtuple('LogEntry', ['timestamp', 'text'])
+
+
+class LogBuffer(object):
+    """The entries logged in the MouseInfo window. Every entry is kept in
+    memory for saving, while the optional tkinter Text widget only shows the
+    newest maxDisplayLines of them.
+
+    Appending an entry only inserts its line at the end of the widget (and
+    deletes the oldest lines once there are too many), so logging takes the
+    same time no matter how long the log is. Edits made by hand in the
+    widget are not part of the log. If journal is a LogJournal, every entry
+    is also written to it."""
+
+    def __init__(self, textWidget=None, maxDisplayLines=1000, journal=None):
+        if maxDisplayLines <= 0:
+            raise ValueError('maxDisplayLines must be a positive number, not %r' % (maxDisplayLines,))
+        self.textWidget = textWidget
+        self.maxDisplayLines = maxDisplayLines
+        self.journal = journal
+        self.entries = [] # The LogEntry objects of every logged line, oldest first.
+
+
+    def append(self, text):
+        """Adds a line of text to the log and returns its LogEntry."""
+        entry = LogEntry(time.time(), text)
+        self.entries.append(entry)
+        if self.journal is not None:
+            self.journal.write(text + '\n')
+        if self.textWidget is not None:
+            self.textWidget.insert('end-1c', text + '\n') # 'end-1c' is before the Text widget's final newline.
+
+            # 'end-1c' is at the start of the empty line after the last entry,
+            # so its line number is one more than the number of lines shown.
+            excessLines = int(self.textWidget.index('end-1c').split('.')[0]) - 1 - self.maxDisplayLines
+            if excessLines > 0:
+                self.textWidget.delete('1.0', '%s.0' % (excessLines + 1))
+            self.textWidget.see('end')
+        return entry
+
+
+    def text(self):
+        """Returns the entire log as a string with one entry per line."""
+        return ''.join([entry.text + '\n' for entry in self.entries])
+
+
+    def clear(self):
+        """Removes every entry from the log and the Text widget."""
+        self.entries = []
+        if self.textWidget is not None:
+            self.textWidget.delete('1.0', 'end')
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class _JournalRequest(object):
+    # A flush or snapshot that a LogJournal's writer thread will do after it
+    # writes the lines written before the request was made.
+    def __init__(self, filename):
+        self.filename = filename # The file to copy the journal to, or None to only flush.
+        self.error = None # The exception raised while handling the request, if any.
+        self._doneEvent = threading.Event()
+
+    def done(self):
+        return self._doneEvent.is_set()
+
+    def wait(self, timeout=None):
+        """Blocks until the request is handled, then raises its exception if
+        it failed. Returns False if timeout seconds passed first."""
+        if not self._doneEvent.wait(timeout):
+            return False
+        if self.error is not None:
+            raise self.error
+        return True
+
+
+class LogJournal(object):
+    """An append-only log file that is written to by a background thread, so
+    that logged entries are saved to disk as they happen without blocking
+    the caller.
+
+    Lines passed to write() are batched and written once flushInterval
+    seconds have passed since the oldest unwritten line, or once flushSize
+    bytes of lines are waiting, whichever comes first. When the file grows
+    past maxBytes, it is renamed to filename.1 (and any older backups are
+    renamed to filename.2 and so on, keeping backupCount of them) and a new
+    file is started. A maxBytes of None never rotates the file.
+
+    New lines are added to the end of an existing file, so the log of a
+    MouseInfo window that crashed is still on disk when it's restarted.
+    snapshot() only copies the lines written since this LogJournal was
+    created, and only the ones still in the file and its backupCount
+    backups: once a session's lines have been rotated out of the last
+    backup, they're gone from its snapshots too."""
+
+    def __init__(self, filename, flushInterval=1.0, flushSize=65536, maxBytes=10 * 1024 * 1024, backupCount=3):
+        if flushInterval <= 0:
+            raise ValueError('flushInterval must be a positive number, not %r' % (flushInterval,))
+        if maxBytes is not None and maxBytes <= 0:
+            raise ValueError('maxBytes must be a positive number or None, not %r' % (maxBytes,))
+        self.filename = os.path.abspath(filename)
+        self.flushInterval = flushInterval
+        self.flushSize = flushSize
+        self.maxBytes = maxBytes
+        self.backupCount = backupCount
+        self.writes = 0 # The number of batches written to the file.
+        self.rotations = 0 # The number of times the file was rotated.
+        self.lastError = None # The last exception raised while writing, if any.
+
+        self._condition = threading.Condition()
+        self._pending = [] # The lines that haven't been written yet.
+        self._pendingSize = 0
+        self._firstPendingTime = None # When the oldest line in _pending was written.
+        self._requests = [] # The _JournalRequest objects waiting to be handled.
+        self._closing = False
+
+        # Open the file here instead of in the writer thread so that errors,
+        # such as an unwritable directory, are raised to the caller.
+        self._fileObj = open(self.filename, 'a')
+        self._fileObj.seek(0, 2)
+        self._sessionStart = self._fileObj.tell() # Where this session's lines start in the file, for snapshot().
+        self._thread = threading.Thread(target=self._run, name='mouseinfo-journal')
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def write(self, line):
+        """Queues line (which should end with a newline) to be written to
+        the journal file. This never blocks on disk I/O."""
+        with self._condition:
+            if self._closing:
+                raise ValueError('Cannot write to a closed LogJournal.')
+            # Wake up the writer thread when the first line of a batch comes
+            # in (so it can start the flushInterval timer) or when the batch
+            # is big enough to be written right away.
+            notify = not self._pending
+            if notify:
+                self._firstPendingTime = _timer()
+            self._pending.append(line)
+            self._pendingSize += len(line)
+            if notify or self._pendingSize >= self.flushSize:
+                self._condition.notify()
+
+
+    def _request(self, filename):
+        request = _JournalRequest(filename)
+        with self._condition:
+            if self._closing:
+                raise ValueError('Cannot use a closed LogJournal.')
+            self._requests.append(request)
+            self._condition.notify()
+        return request
+
+
+    def flush(self, timeout=None):
+        """Blocks until every line written so far is on disk."""
+        return self._request(None).wait(timeout)
+
+
+    def snapshot(self, filename):
+        """Copies the journal, including its rotated backup files from oldest
+        to newest, to filename after writing every line written so far. The
+        copy is made by the writer thread, so this returns a request object
+        right away. Its done() method returns True once the copy is finished,
+        and its wait() method blocks until then.
+
+        Only this session's lines are copied (see the LogJournal docstring).
+        Raises ValueError if filename is the journal file or one of its
+        backup files, which the copy would overwrite while reading them."""
+        filename = os.path.abspath(filename)
+        if filename in self._journalFilenames():
+            raise ValueError('Cannot save a snapshot of the journal to its own file %r.' % (filename,))
+        return self._request(filename)
+
+
+    def close(self):
+        """Writes any remaining lines and stops the writer thread."""
+        with self._condition:
+            if self._closing:
+                return
+            self._closing = True
+            self._condition.notify()
+        self._thread.join()
+
+
+    def backupFilenames(self):
+        """Returns the filenames of the existing rotated backup files, oldest
+        first."""
+        filenames = ['%s.%s' % (self.filename, i) for i in range(self.backupCount, 0, -1)]
+        return [filename for filename in filenames if os.path.exists(filename)]
+
+
+    def _journalFilenames(self):
+        # Returns the journal file and every backup file it can rotate to,
+        # whether or not they exist yet.
+        return [self.filename] + ['%s.%s' % (self.filename, i) for i in range(1, self.backupCount + 1)]
+
+
+    def _rotate(self):
+        self._fileObj.close()
+        if self.backupCount > 0:
+            for i in range(self.backupCount, 0, -1):
+                source = self.filename if i == 1 else '%s.%s' % (self.filename, i - 1)
+                destination = '%s.%s' % (self.filename, i)
+                if os.path.exists(source):
+                    if os.path.exists(destination):
+                        os.remove(destination) # os.rename() can't replace a file on Windows.
+                    os.rename(source, destination)
+            self._fileObj = open(self.filename, 'a')
+        else:
+            self._fileObj = open(self.filename, 'w')
+        self.rotations += 1
+
+
+    def _copyTo(self, filename):
+        import shutil
+        # This session's lines start in the file that has been rotated
+        # self.rotations times since, at _sessionStart, unless that file
+        # has been rotated out of the last backup.
+        rotated = min(self.rotations, self.backupCount)
+        sourceFilenames = ['%s.%s' % (self.filename, i) for i in range(rotated, 0, -1)] + [self.filename]
+        start = self._sessionStart if self.rotations <= self.backupCount else 0
+        with open(filename, 'wb') as outputFileObj:
+            for sourceFilename in sourceFilenames:
+                with open(sourceFilename, 'rb') as inputFileObj:
+                    inputFileObj.seek(start)
+                    shutil.copyfileobj(inputFileObj, outputFileObj, 1024 * 1024)
+                start = 0
+
+
+    def _run(self):
+        while True:
+            with self._condition:
+                # Wait until a batch is due, a flush or snapshot is requested, or close() is called:
+                while not (self._closing or self._requests or self._pendingSize >= self.flushSize):
+                    if self._pending:
+                        timeout = self._firstPendingTime + self.flushInterval - _timer()
+                        if timeout <= 0:
+                            break
+                    else:
+                        timeout = None
+                    self._condition.wait(timeout)
+                lines, self._pending, self._pendingSize = self._pending, [], 0
+                requests, self._requests = self._requests, []
+                closing = self._closing
+
+            writeError = None
+            try:
+                if lines:
+                    self._fileObj.write(''.join(lines))
+                    self._fileObj.flush()
+                    self.writes += 1
+                    if self.maxBytes is not None and self._fileObj.tell() >= self.maxBytes:
+                        self._rotate()
+            except Exception as e:
+                self.lastError = writeError = e
+
+            for request in requests:
+                try:
+                    if writeError is not None:
+                        raise writeError
+                    if request.filename is not None:
+                        self._copyTo(request.filename)
+                except Exception as e:
+                    request.error = e
+                request._doneEvent.set()
+
+            if closing:
+                self._fileObj.close()
+                return
+# =========================================================================
+
+RUNNING_PYTHON_2 = sys.version_info[0] == 2
+
+def _importTkinter():
+    # Importing tkinter is slow, and it isn't needed unless the MouseInfo
+    # window is opened, so it isn't imported along with mouseinfo. This sets
+    # the tkinter, ttk, and Event module globals.
+    global tkinter, ttk, Event
+    if 'tkinter' in globals():
+        return
+
+    if sys.platform.startswith('linux'):
+        if RUNNING_PYTHON_2:
+            try:
+                import Tkinter as tkinter
+                ttk = tkinter
+                from Tkinter import Event
+            except ImportError:
+                raise ImportError('You must install tkinter on Linux to use MouseInfo. For Ubuntu Linux, run the following: sudo apt-get install python-tk python-dev')
+        else:
+            # Running Python 3+:
+            try:
+                import tkinter
+                from tkinter import ttk
+                from tkinter import Event
+            except ImportError:
+                raise ImportError('You must install tkinter on Linux to use MouseInfo. For Ubuntu Linux, run the following: sudo apt-get install python3-tk python3-dev')
+    else:
+        # Running Windows or macOS:
+        if RUNNING_PYTHON_2:
             import Tkinter as tkinter
             ttk = tkinter
             from Tkinter import Event
-        except ImportError:
-            raise ImportError('You must install tkinter on Linux to use MouseInfo. For Ubuntu Linux, run the following: sudo apt-get install python-tk python-dev')
-    else:
-        # Running Python 3+:
-        try:
+        else:
+            # Running Python 3+:
             import tkinter
             from tkinter import ttk
             from tkinter import Event
-        except ImportError:
-            raise ImportError('You must install tkinter on Linux to use MouseInfo. For Ubuntu Linux, run the following: sudo apt-get install python3-tk python3-dev')
-else:
-    # Running Windows or macOS:
-    if RUNNING_PYTHON_2:
-        import Tkinter as tkinter
-        ttk = tkinter
-        from Tkinter import Event
-    else:
-        # Running Python 3+:
-        import tkinter
-        from tkinter import ttk
-        from tkinter import Event
+
 
 MOUSE_INFO_BUTTON_WIDTH = 16 # A standard width for the buttons in the MouseInfo window.
 
-class MouseInfoWindow:
-    def _updateMouseInfoTextFields(self):
-        # Update the XY and RGB text fields in the MouseInfo window.
 
-        # Get the XY coordinates of the current mouse position:
-        x, y = position()
-        self.xyTextboxSV.set('%s,%s' % (x - self.xOrigin, y - self.yOrigin))
+class _WidgetRenderer(object):
+    # Sets tkinter variables and widget options only when the new value is
+    # different from the last one this renderer set. Every set() and
+    # configure() is a Tcl call that can make Tk redraw the widget, so an
+    # idle MouseInfo window should make none of them.
+    #
+    # The renderer only knows about values that it set itself, so a change
+    # the user typed into an Entry stays until the value changes again.
 
-        # MouseInfo currently only works on the primary monitor, and doesn't
-        # support multi-monitor setups. The color information isn't reliable
-        # when the mouse is not on the primary monitor, so display an error instead.
-        width, height = size()
-        if not _PILLOW_INSTALLED:
-            self.rgbSV.set('NA_Pillow_unsupported')
-        elif sys.platform == 'darwin':
-            # TODO - Until I can get screenshots without the mouse cursor, this feature doesn't work on mac.
-            self.rgbSV.set('NA_on_macOS')
-        elif not (0 <= x < width and 0 <= y < height):
-            self.rgbSV.set('NA_on_multimonitor_setups')
-        else:
-            # Get the RGB color value of the pixel currently under the mouse:
-            # NOTE: On Windows & Linux, Pillow's getpixel() returns a 3-integer tuple, but on macOS it returns a 4-integer tuple.
-            r, g, b = getPixel(x, y)
-            self.rgbSV.set('%s,%s,%s' % (r, g, b))
+    def __init__(self):
+        self._lastValues = {} # Maps (Tcl name, option) to the last value set.
+        self.tclCalls = 0 # The number of set() and configure() calls made.
+        self.skippedCalls = 0 # The number of calls skipped because the value hadn't changed.
+        self.redraws = 0 # The number of frames (see endFrame()) that changed at least one widget.
+        self._tclCallsAtFrameStart = 0
 
-        if not _PILLOW_INSTALLED:
-            self.rgbHexSV.set('NA_Pillow_unsupported')
-        elif sys.platform == 'darwin':
-            # TODO - Until I can get screenshots without the mouse cursor, this feature doesn't work on mac.
-            self.rgbHexSV.set('NA_on_macOS')
-        elif not (0 <= x < width and 0 <= y < height):
-            self.rgbHexSV.set('NA_on_multimonitor_setups')
-        else:
-            # Convert this RGB value into a hex RGB value:
-            rHex = hex(r)[2:].upper().rjust(2, '0')
-            gHex = hex(g)[2:].upper().rjust(2, '0')
-            bHex = hex(b)[2:].upper().rjust(2, '0')
-            hexColor = '#%s%s%s' % (rHex, gHex, bHex)
-            self.rgbHexSV.set(hexColor)
 
-        if (not _PILLOW_INSTALLED) or (sys.platform == 'darwin') or (not (0 <= x < width and 0 <= y < height)):
-            self.colorFrame.configure(background='black')
-        else:
-            # Update the color panel:
-            self.colorFrame.configure(background=hexColor)
+    def _changed(self, key, value):
+        if key in self._lastValues and self._lastValues[key] == value:
+            self.skippedCalls += 1
+            return False
+        self._lastValues[key] = value
+        self.tclCalls += 1
+        return True
+
+
+    def setVar(self, variable, value):
+        # str() of a tkinter variable or widget is its unique Tcl name.
+        if self._changed((str(variable), None), value):
+            variable.set(value)
+
+
+    def configure(self, widget, option, value):
+        if self._changed((str(widget), option), value):
+            widget.configure(**{option: value})
+
+
+    def endFrame(self):
+        # Call this at the end of every refresh to count redraws.
+        if self.tclCalls != self._tclCallsAtFrameStart:
+            self.redraws += 1
+            self._tclCallsAtFrameStart = self.tclCalls
+
+class MouseInfoWindow:
+    def _updateMouseInfoTextFields(self):
+        # Update the XY and RGB text fields in the MouseInfo window with the
+        # newest sample from the background sampler thread. The capturing is
+        # done in that thread, so this never blocks the GUI.
+        startTime = _timer() if _statsHistograms is not None else None
+        sample = self.sampler.takeLatest()
+        if sample is not None:
+            self._lastSample = sample
+        if sample is not None or (self._forceRender and self._lastSample is not None):
+            self._forceRender = False
+            if startTime is None:
+                self._updatePixelInfo(self._lastSample)
+            else:
+                _timedCall('window.render', self._updatePixelInfo, self._lastSample)
+        self.renderer.endFrame()
+
+        # Show which getPixel() backend the sampler's calibration picked, once it has finished:
+        if not self._calibrationShown and self.sampler.backendInfo is not None:
+            self._calibrationShown = True
+            getPixelInfo = self.sampler.backendInfo.get('getPixel')
+            if getPixelInfo is not None and getPixelInfo['cost'] is not None:
+                self.statusbarSV.set('Using %s for getPixel() (%.2f ms)' % (getPixelInfo['backend'], getPixelInfo['cost'] * 1000))
+
+        self._measureUpdateRate(_timer())
+        if startTime is not None:
+            _recordTiming('window.refresh', _timer() - startTime)
 
         # As long as the self.isRunning variable is True,
-        # schedule this function to be called again in 100 milliseconds.
+        # schedule this function to be called again after self._nextUpdateDelay() milliseconds.
         # NOTE: Previously this if-else code was at the top of the function
         # so that I could avoid the "invalid command name" message that
         # was popping up (this didn't work though), but it was also causing
@@ -348,17 +2962,145 @@ class MouseInfoWindow:
         # You can reproduce it by moving this if-else code to the top of this
         # function.
         if self.isRunning:
-            self._updateMouseInfoJob = self.root.after(100, self._updateMouseInfoTextFields)
+            self._updateMouseInfoJob = self.root.after(self._nextUpdateDelay(), self._updateMouseInfoTextFields)
         else:
             return # MouseInfo window has been closed, so return immediately.
 
 
+    def _nextUpdateDelay(self):
+        # Returns the milliseconds until the next refresh tick. The sampler
+        # thread backs off while the mouse is still, so the tick follows it:
+        # it runs just after the sampler's next poll, and never more often
+        # than maxRate. That way an idle window doesn't wake Tk up any more
+        # often than the sampler polls, and a sample is displayed soon after
+        # the poll that took it.
+        delay = self._updateInterval
+        if self.sampler.nextPollTime is not None:
+            delay = max(delay, (self.sampler.nextPollTime - _timer()) * 1000 + 1)
+        return max(1, int(delay))
+
+
+    def _updatePixelInfo(self, sample):
+        # Update the XY, RGB, and RGB hex text fields and the color panel.
+        # The renderer skips any of these that haven't changed.
+        x, y = sample.x, sample.y
+        self.renderer.setVar(self.xyTextboxSV, '%s,%s' % (x - self.xOrigin, y - self.yOrigin))
+
+        # The color is read on every monitor. When the mouse is somewhere no
+        # monitor shows (such as the gap next to a smaller monitor), the
+        # sampler doesn't read it (sample.rgb is None) and an error is
+        # displayed instead.
+        if self._colorUnavailableText is not None:
+            rgbText = hexText = self._colorUnavailableText
+            background = 'black'
+        elif sample.rgb is None:
+            rgbText = hexText = 'NA_off_screen'
+            background = 'black'
+        else:
+            # The RGB color value of the pixel under the mouse when it was sampled:
+            rgbText = '%s,%s,%s' % sample.rgb
+            hexText = background = '#%02X%02X%02X' % sample.rgb
+        self.renderer.setVar(self.rgbSV, rgbText)
+        self.renderer.setVar(self.rgbHexSV, hexText)
+        self.renderer.configure(self.colorFrame, 'background', background)
+
+
+    def _measureUpdateRate(self, now):
+        # Display how many times per second the sampler is polling the mouse,
+        # along with how many samples were dropped (replaced before this
+        # window displayed them) or late (polled later than scheduled because
+        # capturing took too long). Also display how many times per second
+        # the text fields and color panel were redrawn, and how many Tcl
+        # calls that took; both are 0 while the mouse is still.
+        elapsed = now - self._rateCheckTime
+        if elapsed >= 1.0:
+            rate = (self.sampler.polls - self._pollsAtRateCheck) / elapsed
+            self.redrawRate = (self.renderer.redraws - self._redrawsAtRateCheck) / elapsed
+            self.tclCallRate = (self.renderer.tclCalls - self._tclCallsAtRateCheck) / elapsed
+            self._pollsAtRateCheck = self.sampler.polls
+            self._redrawsAtRateCheck = self.renderer.redraws
+            self._tclCallsAtRateCheck = self.renderer.tclCalls
+            self._rateCheckTime = now
+            rateText = '%.0f Hz, %.0f redraws/s, %.0f Tcl calls/s' % (rate, self.redrawRate, self.tclCallRate)
+            if self.sampler.dropped or self.sampler.late:
+                rateText += ', %s dropped, %s late' % (self.sampler.dropped, self.sampler.late)
+            self._statusRenderer.setVar(self.rateSV, rateText)
+
+            error = self.sampler.takeError()
+            if error is not None:
+                self.statusbarSV.set('ERROR: ' + str(error))
+
+
+    def _showStatsWindow(self, *args):
+        # Open the hidden Stats window (with Ctrl+Shift+S), which turns on
+        # latency statistics and displays them, updated once a second.
+        if self._statsWindow is not None:
+            self._statsWindow.lift()
+            return
+        enableStats()
+        self._statsWindow = tkinter.Toplevel(self.root)
+        self._statsWindow.title('MouseInfo Stats')
+        self._statsWindow.protocol('WM_DELETE_WINDOW', self._closeStatsWindow)
+        self._statsTextarea = tkinter.Text(self._statsWindow, width=80, height=16)
+        self._statsTextarea.grid(column=1, row=1, columnspan=2, sticky=(tkinter.W, tkinter.E, tkinter.N, tkinter.S))
+        ttk.Button(self._statsWindow, text='Reset', width=MOUSE_INFO_BUTTON_WIDTH, command=resetStats).grid(column=1, row=2, sticky=tkinter.W)
+        ttk.Button(self._statsWindow, text='Export JSON', width=MOUSE_INFO_BUTTON_WIDTH, command=self._exportStats).grid(column=2, row=2, sticky=tkinter.E)
+        self._statsWindow.columnconfigure(1, weight=1)
+        self._statsWindow.rowconfigure(1, weight=1)
+        self._statsContents = None
+        self._updateStatsWindow()
+
+
+    def _updateStatsWindow(self):
+        if self._statsWindow is None or not self.isRunning:
+            return
+        lines = ['%-28s %8s %9s %9s %9s %9s' % ('Timing', 'Count', 'p50 ms', 'p95 ms', 'p99 ms', 'Max ms')]
+        for name, summary in sorted(getStats().items()):
+            lines.append('%-28s %8s %9.3f %9.3f %9.3f %9.3f' % (name, summary['count'], summary['p50'] * 1000,
+                                                                 summary['p95'] * 1000, summary['p99'] * 1000, summary['max'] * 1000))
+        contents = '\n'.join(lines)
+        if contents != self._statsContents:
+            self._statsContents = contents
+            self._statsTextarea.delete('1.0', tkinter.END)
+            self._statsTextarea.insert(tkinter.END, contents)
+        self._updateStatsJob = self.root.after(1000, self._updateStatsWindow)
+
+
+    def _closeStatsWindow(self):
+        # Statistics keep being recorded, so they're still there if the Stats window is opened again.
+        # Cancel the pending update, or reopening the window within a second would start a second update loop.
+        if self._updateStatsJob is not None:
+            self.root.after_cancel(self._updateStatsJob)
+            self._updateStatsJob = None
+        self._statsWindow.destroy()
+        self._statsWindow = None
+
+
+    def _exportStats(self):
+        filename = os.path.join(os.getcwd(), 'mouseInfoStats.json')
+        try:
+            exportStats(filename)
+        except Exception as e:
+            self.statusbarSV.set('ERROR: ' + str(e))
+        else:
+            self.statusbarSV.set('Stats saved to ' + filename)
+
+
+    def _openDocumentation(self):
+        import webbrowser
+        webbrowser.open('https://mouseinfo.readthedocs.io')
+
+
     def _copyText(self, textToCopy):
+        import pyperclip
         try:
-            pyperclip.copy(textToCopy)
+            if _statsHistograms is None:
+                pyperclip.copy(textToCopy)
+            else:
+                _timedCall('window.clipboard', pyperclip.copy, textToCopy)
             self.statusbarSV.set('Copied ' + textToCopy)
         except pyperclip.PyperclipException as e:
-            if platform.system() == 'Linux':
+            if sys.platform.startswith('linux'):
                 self.statusbarSV.set('Copy failed. Run "sudo apt-get install xsel".')
             else:
                 self.statusbarSV.set('Clipboard error: ' + str(e))
@@ -492,9 +3234,7 @@ class MouseInfoWindow:
             self.xyLogButtonSV.set('Log in 1')
         else:
             # Delay disabled or countdown has finished:
-            logContents = self.logTextarea.get('1.0', 'end-1c') + '%s\n' % (self.xyTextboxSV.get()) # 'end-1c' doesn't include the final newline
-            self.logTextboxSV.set(logContents)
-            self._setLogTextAreaContents(logContents)
+            self.logBuffer.append(self.xyTextboxSV.get())
             self.statusbarSV.set('Logged ' + self.xyTextboxSV.get())
             self.xyLogButtonSV.set('Log XY')
 
@@ -520,9 +3260,7 @@ class MouseInfoWindow:
             self.rgbLogButtonSV.set('Log in 1')
         else:
             # Delay disabled or countdown has finished:
-            logContents = self.logTextarea.get('1.0', 'end-1c') + '%s\n' % (self.rgbSV.get()) # 'end-1c' doesn't include the final newline
-            self.logTextboxSV.set(logContents)
-            self._setLogTextAreaContents(logContents)
+            self.logBuffer.append(self.rgbSV.get())
             self.statusbarSV.set('Logged ' + self.rgbSV.get())
             self.rgbLogButtonSV.set('Log RGB')
 
@@ -548,9 +3286,7 @@ class MouseInfoWindow:
             self.rgbHexLogButtonSV.set('Log in 1')
         else:
             # Delay disabled or countdown has finished:
-            logContents = self.logTextarea.get('1.0', 'end-1c') + '%s\n' % (self.rgbHexSV.get()) # 'end-1c' doesn't include the final newline
-            self.logTextboxSV.set(logContents)
-            self._setLogTextAreaContents(logContents)
+            self.logBuffer.append(self.rgbHexSV.get())
             self.statusbarSV.set('Logged ' + self.rgbHexSV.get())
             self.rgbHexLogButtonSV.set('Log RGB Hex')
 
@@ -579,9 +3315,7 @@ class MouseInfoWindow:
             textFieldContents = '%s %s %s' % (self.xyTextboxSV.get(),
                                               self.rgbSV.get(),
                                               self.rgbHexSV.get())
-            logContents = self.logTextarea.get('1.0', 'end-1c') + '%s\n' % (textFieldContents) # 'end-1c' doesn't include the final newline
-            self.logTextboxSV.set(logContents)
-            self._setLogTextAreaContents(logContents)
+            self.logBuffer.append(textFieldContents)
             self.statusbarSV.set('Logged ' + textFieldContents)
             self.allLogButtonSV.set('Log All')
 
@@ -596,54 +3330,115 @@ class MouseInfoWindow:
             return # Do nothing.
         self.xOrigin = int(x)
         self.yOrigin = int(y)
+        self._forceRender = True # Update the XY text field even if the mouse hasn't moved.
         self.statusbarSV.set('Set XY Origin to ' + str(self.xOrigin) + ', ' + str(self.yOrigin))
 
-    def _setLogTextAreaContents(self, logContents):
-        if RUNNING_PYTHON_2:
-            self.logTextarea.delete('1.0', tkinter.END)
-            self.logTextarea.insert(tkinter.END, logContents)
-        else:
-            self.logTextarea.replace('1.0', tkinter.END, logContents)
-
-        # Scroll to the bottom of the text area:
-        topOfTextArea, bottomOfTextArea = self.logTextarea.yview()
-        self.logTextarea.yview_moveto(bottomOfTextArea)
-
 
     def _saveLogFile(self, *args):
-        # Save the current contents of the log file text field. Automatically
-        # overwrites the file if it exists. Displays an error message in the
-        # status bar if there is a problem.
+        # Save every entry in the log, including the ones that have scrolled
+        # out of the log text field. Automatically overwrites the file if it
+        # exists. Displays an error message in the status bar if there is a
+        # problem.
+        if self.logJournal is not None:
+            # The journal thread copies the journal file, so the window
+            # doesn't freeze while a large log is saved.
+            try:
+                self._checkLogSnapshot(self.logJournal.snapshot(self.logFilenameSV.get()), self.logFilenameSV.get())
+            except Exception as e:
+                self.statusbarSV.set('ERROR: ' + str(e))
+            return
+
         try:
             with open(self.logFilenameSV.get(), 'w') as fo:
-                fo.write(self.logTextboxSV.get())
+                fo.write(self.logBuffer.text())
         except Exception as e:
             self.statusbarSV.set('ERROR: ' + str(e))
         else:
             self.statusbarSV.set('Log file saved to ' + self.logFilenameSV.get())
 
 
+    def _checkLogSnapshot(self, request, filename):
+        # Check every 50 milliseconds if the journal has been copied to the log file.
+        if not request.done():
+            self.statusbarSV.set('Saving log file to ' + filename + '...')
+            self.root.after(50, self._checkLogSnapshot, request, filename)
+        elif request.error is not None:
+            self.statusbarSV.set('ERROR: ' + str(request.error))
+        else:
+            self.statusbarSV.set('Log file saved to ' + filename)
+
+
     def _saveScreenshotFile(self, *args):
         # Saves a screenshot. Automatically overwrites the file if it exists.
         # Displays an error message in the status bar if there is a problem.
 
-        if not _PILLOW_INSTALLED:
+        if not _pillowInstalled():
             self.statusbarSV.set('ERROR: NA_Pillow_unsupported')
             return
 
         try:
-            screenshot(self.screenshotFilenameSV.get())
+            screenshot(self.screenshotFilenameSV.get(), maxAge=_WINDOW_FRAME_MAX_AGE)
         except Exception as e:
             self.statusbarSV.set('ERROR: ' + str(e))
         else:
             self.statusbarSV.set('Screenshot file saved to ' + self.screenshotFilenameSV.get())
 
 
-    def __init__(self):
+    def __init__(self, maxRate=60, idleInterval=1000, maxLogLines=1000, journalFilename=None):
         """Launches the MouseInfo window, which displays XY coordinate and RGB
-        color information for the mouse's current position."""
-
+        color information for the mouse's current position.
+
+        The text fields are updated up to maxRate times a second while the
+        mouse is moving. While the mouse is still, it's polled less often,
+        down to once every idleInterval milliseconds, and the color under it
+        is only read again when the screen there changes (see Sampler). The
+        log text field shows the newest maxLogLines entries, but Save Log
+        saves all of them.
+
+        If journalFilename is given, every log entry is also appended to that
+        file as it's logged (see LogJournal), and Save Log copies that file."""
+
+        if maxRate <= 0:
+            raise ValueError('maxRate must be a positive number, not %r' % (maxRate,))
+        if idleInterval <= 0:
+            raise ValueError('idleInterval must be a positive number, not %r' % (idleInterval,))
+        if maxLogLines <= 0:
+            raise ValueError('maxLogLines must be a positive number, not %r' % (maxLogLines,))
+
+        _importTkinter()
         self.isRunning = True # While True, the text fields will update.
+        self.maxRate = maxRate
+        self.idleInterval = idleInterval
+        self._updateInterval = 1000.0 / maxRate # Milliseconds between updates.
+        self._lastSample = None # The Sample currently displayed in the text fields.
+        self._forceRender = False
+        self._pollsAtRateCheck = 0
+        self._rateCheckTime = _timer()
+        self.renderer = _WidgetRenderer() # Updates the text fields and color panel only when they change.
+        self._statusRenderer = _WidgetRenderer() # Updates the rate label, without counting it in the rates it shows.
+        self._statsWindow = None # The hidden Stats window, while it's open.
+        self._updateStatsJob = None # The "after" id of the Stats window's next update.
+        self._redrawsAtRateCheck = 0
+        self._tclCallsAtRateCheck = 0
+        self.redrawRate = 0 # Redraws per second over the last second, as shown in the status bar.
+        self.tclCallRate = 0 # Tcl calls per second over the last second, as shown in the status bar.
+
+        # The color can't be shown without Pillow, or on macOS, where the
+        # screenshots include the mouse cursor.
+        if not _pillowInstalled():
+            self._colorUnavailableText = 'NA_Pillow_unsupported'
+        elif sys.platform == 'darwin':
+            # TODO - Until I can get screenshots without the mouse cursor, this feature doesn't work on mac.
+            self._colorUnavailableText = 'NA_on_macOS'
+        else:
+            self._colorUnavailableText = None
+
+        # The capture work is done on this background thread. On macOS, the
+        # color isn't displayed, so don't waste time taking screenshots:
+        # The sampler also picks the fastest backends for the operations it
+        # does on every poll before it starts polling.
+        self.sampler = Sampler(maxRate, idleInterval, readPixels=_pillowInstalled() and sys.platform != 'darwin', calibrate=True)
+        self._calibrationShown = False
 
         # Create the MouseInfo window:
         self.root = tkinter.Tk()
@@ -690,10 +3485,10 @@ class MouseInfoWindow:
         self.rgbSV                = tkinter.StringVar() # The str contents of the rgb text field.
         self.rgbHexSV             = tkinter.StringVar() # The str contents of the rgb hex text field.
         self.xyOriginSV           = tkinter.StringVar() # The str contents of the xy origin field.
-        self.logTextboxSV         = tkinter.StringVar() # The str contents of the log text area.
         self.logFilenameSV        = tkinter.StringVar() # The str contents of the log filename text field.
         self.screenshotFilenameSV = tkinter.StringVar() # The str contents of the screenshot filename text field.
         self.statusbarSV          = tkinter.StringVar() # The str contents of the status bar at the bottom of the window.
+        self.rateSV               = tkinter.StringVar() # The str contents of the update rate in the status bar.
 
         # WIDGETS ON ROW 3:
         CUR_ROW += 1
@@ -790,6 +3585,8 @@ class MouseInfoWindow:
         self.logTextareaScrollbar = ttk.Scrollbar(mainframe, orient=tkinter.VERTICAL, command=self.logTextarea.yview)
         self.logTextareaScrollbar.grid(column=5, row=CUR_ROW, sticky=(tkinter.N, tkinter.S))
         self.logTextarea['yscrollcommand'] = self.logTextareaScrollbar.set
+        self.logJournal = None if journalFilename is None else LogJournal(journalFilename)
+        self.logBuffer = LogBuffer(self.logTextarea, maxLogLines, self.logJournal) # Every logged entry, for saving to the log file.
 
         # WIDGETS ON ROW 9:
         CUR_ROW += 1
@@ -815,7 +3612,9 @@ class MouseInfoWindow:
         CUR_ROW += 1
 
         statusbar = ttk.Label(mainframe, relief=tkinter.SUNKEN, textvariable=self.statusbarSV)
-        statusbar.grid(column=1, row=CUR_ROW, columnspan=5, sticky=(tkinter.W, tkinter.E))
+        statusbar.grid(column=1, row=CUR_ROW, columnspan=3, sticky=(tkinter.W, tkinter.E))
+        rateLabel = ttk.Label(mainframe, relief=tkinter.SUNKEN, textvariable=self.rateSV, anchor=tkinter.E)
+        rateLabel.grid(column=4, row=CUR_ROW, columnspan=2, sticky=(tkinter.W, tkinter.E))
 
         # Add padding to all of the widgets:
         for child in mainframe.winfo_children():
@@ -824,7 +3623,7 @@ class MouseInfoWindow:
                 child.grid_configure(padx=0, pady=3)
             elif child == self.logTextarea:
                 child.grid_configure(padx=(3, 0), pady=3)
-            elif child == statusbar:
+            elif child in (statusbar, rateLabel):
                 child.grid_configure(padx=0, pady=(3, 0))
             else:
                 # All other widgets have a standard padding of 3:
@@ -851,7 +3650,7 @@ class MouseInfoWindow:
         menu.add_cascade(label='Log', menu=logMenu, underline=0)
 
         helpMenu = tkinter.Menu(menu)
-        helpMenu.add_command(label='Online Documentation', command=lambda: webbrowser.open('https://mouseinfo.readthedocs.io'), underline=6)
+        helpMenu.add_command(label='Online Documentation', command=self._openDocumentation, underline=6)
         menu.add_cascade(label='Help', menu=helpMenu, underline=0)
 
         self.root.bind_all('<F1>', self._copyAllMouseInfo)
@@ -862,12 +3661,15 @@ class MouseInfoWindow:
         self.root.bind_all('<F6>', self._logXyMouseInfo)
         self.root.bind_all('<F7>', self._logRgbMouseInfo)
         self.root.bind_all('<F8>', self._logRgbHexMouseInfo)
+        self.root.bind_all('<Control-S>', self._showStatsWindow) # Ctrl+Shift+S opens the hidden Stats window.
 
 
         self.root.resizable(False, False) # Prevent the window from being resized.
 
         self.xyInfoTextbox.focus() # Put the focus on the XY coordinate text field to start.
 
+        self.sampler.start()
+
         self._updateMouseInfoJob = self.root.after(100, self._updateMouseInfoTextFields) # Begin updating the text fields.
 
         # Make the mouse info window "always on top".
@@ -880,6 +3682,9 @@ class MouseInfoWindow:
         # Application has closed, set isRunning to False and cancel any "after" commands already queued:
         self.root.after_cancel(self._updateMouseInfoJob)
         self.isRunning = False
+        self.sampler.stop()
+        if self.logJournal is not None:
+            self.logJournal.close()
 
         # Destroy the tkinter root widget:
         try:
@@ -887,7 +3692,7 @@ class MouseInfoWindow:
         except tkinter.TclError:
             pass
 
-def mouseInfo():
+def mouseInfo(maxRate=60, idleInterval=1000, maxLogLines=1000, journalFilename=None):
     """
     Launch the MouseInfo application in a new window.
 
@@ -895,7 +3700,25 @@ def mouseInfo():
     PyAutoGUI (which imports mouseinfo) is set up with a simple mouseInfo()
     function and I'd like to keep this consistent with that.
     """
-    MouseInfoWindow()
+    MouseInfoWindow(maxRate=maxRate, idleInterval=idleInterval, maxLogLines=maxLogLines, journalFilename=journalFilename)
+
+
+def __getattr__(name):
+    # Python 3.7 and later call this for module attributes that don't exist.
+    # These attributes were set when mouseinfo was imported, before
+    # importing it was made lazy, so they're imported or worked out the
+    # first time they're used instead. Older versions of Python don't have
+    # them until they're needed: tkinter, ttk, and Event once a MouseInfo
+    # window is created, and the others not at all.
+    if name in ('tkinter', 'ttk', 'Event'):
+        _importTkinter()
+        return globals()[name]
+    if name == '_PILLOW_INSTALLED':
+        return _pillowInstalled()
+    if name in ('scrotExists', 'xwdExists') and sys.platform.startswith('linux'):
+        return _programExists(name[:-len('Exists')])
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
 
 if __name__ == '__main__':
     MouseInfoWindow()
+
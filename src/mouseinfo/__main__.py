@@ -1,4 +1,170 @@
+from __future__ import division, print_function
+import argparse, csv, json, sys
 import mouseinfo
 
+
+def _parseCoordinates(text, count):
+    # Parse a string of count comma-delimited integers, like "10,20".
+    try:
+        values = tuple(int(value) for value in text.split(','))
+    except ValueError:
+        values = ()
+    if len(values) != count:
+        raise argparse.ArgumentTypeError('expected %s comma-delimited integers, not %r' % (count, text))
+    return values
+
+
+def _parsePositiveNumber(text):
+    # Parse a number that must be more than 0, like "60" or "0.5".
+    try:
+        value = float(text)
+    except ValueError:
+        value = 0
+    if not value > 0:
+        raise argparse.ArgumentTypeError('expected a number greater than 0, not %r' % (text,))
+    return value
+
+
+def _colorOrNone(rgb):
+    return None if rgb is None else list(rgb)
+
+
+class _JsonLinesWriter(object):
+    def __init__(self, fileObj):
+        self.fileObj = fileObj
+
+    def write(self, t, sample):
+        record = {'t': round(t, 6), 'x': sample.x, 'y': sample.y, 'rgb': _colorOrNone(sample.rgb)}
+        if sample.points is not None:
+            record['points'] = [_colorOrNone(rgb) for rgb in sample.points]
+        self.fileObj.write(json.dumps(record, separators=(',', ':'), sort_keys=True) + '\n')
+
+    def close(self):
+        pass
+
+
+class _CsvWriter(object):
+    def __init__(self, fileObj, points):
+        self.writer = csv.writer(fileObj, lineterminator='\n')
+        header = ['t', 'x', 'y', 'r', 'g', 'b']
+        for i in range(len(points or ())):
+            header.extend(['point%s_r' % (i), 'point%s_g' % (i), 'point%s_b' % (i)])
+        self.writer.writerow(header)
+
+    def write(self, t, sample):
+        row = ['%.6f' % (t), sample.x, sample.y]
+        for rgb in [sample.rgb] + list(sample.points or ()):
+            row.extend(['', '', ''] if rgb is None else rgb)
+        self.writer.writerow(row)
+
+    def close(self):
+        pass
+
+
+class _BinaryWriter(object):
+    # Writes the samples in the binary recording format (see
+    # mouseinfo.openRecording()), which uses the samples' own timestamps.
+    def __init__(self, fileObj, rate):
+        from mouseinfo._mouseinfo_recording import RecordingWriter
+        self.recordingWriter = RecordingWriter(getattr(fileObj, 'buffer', fileObj), rate)
+
+    def write(self, t, sample):
+        self.recordingWriter.write(sample)
+
+    def close(self):
+        self.recordingWriter.close() # This flushes, but doesn't close, the output file.
+
+
+class _TraceWriter(_BinaryWriter):
+    # Writes the samples in the compressed trace format (see mouseinfo.openTrace()).
+    def __init__(self, fileObj, rate):
+        from mouseinfo._mouseinfo_recording import TraceWriter
+        self.recordingWriter = TraceWriter(getattr(fileObj, 'buffer', fileObj), rate)
+
+
+def _createWriter(outputFormat, fileObj, points, rate):
+    # Each writer is only given the settings it uses.
+    if outputFormat == 'jsonl':
+        return _JsonLinesWriter(fileObj)
+    if outputFormat == 'csv':
+        return _CsvWriter(fileObj, points)
+    if outputFormat == 'binary':
+        return _BinaryWriter(fileObj, rate)
+    if outputFormat == 'trace':
+        return _TraceWriter(fileObj, rate)
+    raise ValueError("outputFormat must be 'jsonl', 'csv', 'binary', or 'trace', not %r" % (outputFormat,))
+
+
+def runHeadless(rate, duration=None, outputFormat='jsonl', output=None, region=None, points=None):
+    """Sample the mouse position and the colors under it rate times a second
+    without opening a window, writing one line per sample to the output file
+    object (stdout by default) in JSON Lines or CSV format, or as binary
+    records (see mouseinfo.openRecording() and mouseinfo.openTrace())."""
+    if output is None:
+        output = sys.stdout
+    writer = _createWriter(outputFormat, output, points, rate)
+    scheduler = mouseinfo.RateScheduler(rate, duration)
+    startTime = None
+    lastFlushTime = 0
+    try:
+        for deadline in scheduler:
+            sample = mouseinfo.takeSample(region, points)
+            if startTime is None:
+                startTime = deadline
+            writer.write(deadline - startTime, sample)
+
+            # Flush a few times a second so that the output can be watched
+            # live, without paying for a flush on every line.
+            if deadline - lastFlushTime >= 0.25:
+                output.flush()
+                lastFlushTime = deadline
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+        output.flush()
+    return scheduler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m mouseinfo',
+                                     description='Display the XY position and RGB color of the pixel under the mouse.')
+    parser.add_argument('--headless', action='store_true',
+                        help='sample without opening a window and write the samples to stdout or --output')
+    parser.add_argument('--rate', type=_parsePositiveNumber, default=60,
+                        help='samples per second in headless mode (default: 60)')
+    parser.add_argument('--duration', type=_parsePositiveNumber, default=None,
+                        help='seconds to sample for in headless mode (default: until Ctrl-C)')
+    parser.add_argument('--format', dest='outputFormat', choices=['jsonl', 'csv', 'binary', 'trace'], default='jsonl',
+                        help='headless output format; binary and trace are the formats read by mouseinfo.openRecording() and mouseinfo.openTrace() (default: jsonl)')
+    parser.add_argument('--output', '-o', default='-',
+                        help='file to write headless samples to (default: stdout)')
+    parser.add_argument('--region', type=lambda text: _parseCoordinates(text, 4), default=None, metavar='LEFT,TOP,WIDTH,HEIGHT',
+                        help='capture only this region of the screen for each sample')
+    parser.add_argument('--point', type=lambda text: _parseCoordinates(text, 2), action='append', dest='points', metavar='X,Y',
+                        help='also record the color at this point; can be given more than once')
+    parser.add_argument('--journal', default=None, metavar='FILENAME',
+                        help='append every log entry in the window to this file as it is logged')
+    args = parser.parse_args(argv)
+
+    if not args.headless:
+        mouseinfo.MouseInfoWindow(journalFilename=args.journal)
+        return 0
+
+    if args.output == '-':
+        output = sys.stdout
+    else:
+        output = open(args.output, 'wb' if args.outputFormat in ('binary', 'trace') else 'w')
+    try:
+        scheduler = runHeadless(args.rate, args.duration, args.outputFormat, output, args.region, args.points)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    if scheduler.skipped:
+        print('%s of %s samples were skipped because sampling could not keep up with --rate.' % (scheduler.skipped, scheduler.skipped + scheduler.ticks),
+              file=sys.stderr)
+    return 0
+
+
 if __name__ == '__main__':
-    mouseinfo.MouseInfoWindow()
+    sys.exit(main())
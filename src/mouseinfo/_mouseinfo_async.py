@@ -0,0 +1,199 @@
+# asyncio support for MouseInfo. This is in its own module because the async
+# syntax can't be parsed by Python 2, which the rest of MouseInfo supports.
+# mouseinfo.stream() imports it the first time it's called.
+#
+# Every SampleStream with the same rate, region, and points on the same event
+# loop shares a single _SharedSampler, so many coroutines can watch the mouse
+# while only one capture is done per tick. The blocking capture work runs in
+# the event loop's default executor. Each SampleStream only holds the newest
+# sample, so a slow consumer skips stale samples instead of making a queue
+# grow without limit.
+#
+# waitUntil() is the asyncio version of mouseinfo._waitUntil(), behind
+# waitForPixelAsync() and waitForRegionChangeAsync().
+
+import asyncio, weakref
+
+import mouseinfo
+
+# Maps each event loop to a dictionary of (rate, region, points) keys to the
+# _SharedSampler running on that loop.
+_sharedSamplers = weakref.WeakKeyDictionary()
+
+
+def _runningLoop():
+    # asyncio.get_running_loop() was added in Python 3.7.
+    return getattr(asyncio, 'get_running_loop', asyncio.get_event_loop)()
+
+
+class _SharedSampler(object):
+    def __init__(self, loop, key, rate, region, points):
+        self.loop = loop
+        self.key = key
+        self.rate = rate
+        self.region = region
+        self.points = points
+        self.skipped = 0 # The number of ticks skipped because capturing took too long.
+        self.subscribers = weakref.WeakSet()
+        self.task = None
+
+
+    def subscribe(self, subscriber):
+        self.subscribers.add(subscriber)
+        if self.task is None:
+            self.task = self.loop.create_task(self._run())
+
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+        if not self.subscribers and self.task is not None:
+            self.task.cancel()
+            self._forget()
+
+
+    def _forget(self):
+        samplers = _sharedSamplers.get(self.loop)
+        if samplers is not None and samplers.get(self.key) is self:
+            del samplers[self.key]
+
+
+    async def _run(self):
+        period = 1.0 / self.rate
+        nextTime = self.loop.time()
+        try:
+            while self.subscribers:
+                sample = await self.loop.run_in_executor(None, mouseinfo.takeSample, self.region, self.points)
+                for subscriber in list(self.subscribers):
+                    subscriber._put(sample)
+
+                # Sleep until the next tick. If capturing took longer than a
+                # tick, skip the missed ticks instead of sampling back to back.
+                nextTime += period
+                now = self.loop.time()
+                if now - nextTime >= period:
+                    missed = int((now - nextTime) / period)
+                    self.skipped += missed
+                    nextTime += missed * period
+                await asyncio.sleep(max(0, nextTime - now))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            for subscriber in list(self.subscribers):
+                subscriber._putError(e)
+        finally:
+            self._forget()
+
+
+class SampleStream(object):
+    """An asynchronous iterator of mouseinfo.Sample objects. Create these
+    with mouseinfo.stream() and use them with async for. Call aclose() (or
+    use async with) to stop receiving samples.
+
+    The dropped attribute counts the samples that were replaced by a newer
+    one before this stream's consumer got to them."""
+
+    def __init__(self, rate=60, region=None, points=None):
+        if rate <= 0:
+            raise ValueError('rate must be a positive number, not %r' % (rate,))
+        self.rate = rate
+        self.region = None if region is None else tuple(region)
+        self.points = None if points is None else [tuple(point) for point in points]
+        self.dropped = 0
+        self._sampler = None
+        self._latest = None
+        self._error = None
+        self._event = None
+        self._closed = False
+
+
+    def _subscribe(self):
+        loop = _runningLoop()
+        key = (self.rate, self.region, None if self.points is None else tuple(self.points))
+        samplers = _sharedSamplers.setdefault(loop, {})
+        sampler = samplers.get(key)
+        if sampler is None:
+            sampler = _SharedSampler(loop, key, self.rate, self.region, self.points)
+            samplers[key] = sampler
+        self._event = asyncio.Event()
+        self._sampler = sampler
+        sampler.subscribe(self)
+
+
+    def _put(self, sample):
+        if self._latest is not None:
+            self.dropped += 1
+        self._latest = sample
+        self._event.set()
+
+
+    def _putError(self, error):
+        self._error = error
+        self._event.set()
+
+
+    def __aiter__(self):
+        return self
+
+
+    async def __anext__(self):
+        if self._closed:
+            raise StopAsyncIteration
+        if self._sampler is None:
+            self._subscribe()
+        await self._event.wait()
+        self._event.clear()
+        if self._error is not None:
+            error, self._error = self._error, None
+            await self.aclose()
+            raise error
+        sample, self._latest = self._latest, None
+        return sample
+
+
+    async def aclose(self):
+        """Stop receiving samples. The shared sampling loop stops when its
+        last stream is closed."""
+        self._closed = True
+        if self._sampler is not None:
+            self._sampler.unsubscribe(self)
+            self._sampler = None
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, excType, excValue, traceback):
+        await self.aclose()
+
+
+async def waitUntil(condition, operation, region, timeout):
+    # Like mouseinfo._waitUntil(), but condition() runs in the default
+    # executor, and the damage callbacks (which may come from another thread)
+    # wake this coroutine with call_soon_threadsafe().
+    loop = _runningLoop()
+    damaged = asyncio.Event()
+
+    def wake():
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(damaged.set)
+
+    subscription = mouseinfo._subscribeDamage(operation, region, wake)
+    deadline = None if timeout is None else loop.time() + timeout
+    try:
+        while True:
+            damaged.clear()
+            if await loop.run_in_executor(None, condition):
+                return True
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                return False
+            if subscription is None:
+                remaining = mouseinfo._DAMAGE_POLL_INTERVAL if remaining is None else min(remaining, mouseinfo._DAMAGE_POLL_INTERVAL)
+            try:
+                await asyncio.wait_for(damaged.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        if subscription is not None:
+            subscription.close()
@@ -0,0 +1,162 @@
+# The frame difference engine behind mouseinfo.createFrameDiffer(). This is
+# in its own module because it needs NumPy, which is slow to import and
+# optional for the rest of MouseInfo. mouseinfo.createFrameDiffer() imports
+# it the first time it's called.
+#
+# Each frame is split into square tiles, and each tile gets a 64-bit
+# signature: the sum of its bytes, read as machine words, with each word
+# multiplied by a random odd number for its column and another for its row
+# (all modulo 2**64). Any change to a tile changes its signature, except
+# with a chance of about one in 2**64, and it also notices pixels that
+# moved within a tile, which a plain sum wouldn't. Only the previous frame's
+# signatures are kept, not its pixels, and the signatures are computed
+# straight from the capture buffer, one band of tiles at a time so that the
+# temporary arrays stay small.
+
+from __future__ import division
+import numpy
+import mouseinfo
+
+
+class FrameDiffer(object):
+    """Finds the parts of the screen (or of a region of it) that changed
+    since the last frame. The frame is split into tileSize x tileSize tiles,
+    and only a 64-bit signature of each tile is kept between frames.
+
+    After each diff(), changedTiles is a NumPy array of booleans, one for
+    each tile, that are True for the tiles that changed."""
+
+    def __init__(self, tileSize=64, region=None):
+        if tileSize <= 0 or tileSize % 8:
+            raise ValueError('tileSize must be a positive multiple of 8, not %r' % (tileSize,))
+        self.tileSize = tileSize
+        self.region = None if region is None else tuple(region)
+        self.changedTiles = None
+        self._signatures = None # The last frame's tile signatures.
+        self._layout = None # The (width, height, rawmode) of the last frame, whose signatures can be compared.
+        self._weights = {} # Maps (rowWords, tileSize) to the column and row weights for them.
+
+
+    def diff(self, frame=None):
+        """Compare a frame to the previous one and return a list of the
+        (left, top, width, height) rectangles that changed, in screen
+        coordinates. Neighboring changed tiles are merged into larger
+        rectangles. The first frame, and a frame of a different size than the
+        previous one, counts as changed everywhere.
+
+        frame is a Pillow Image or a height x width x 3 NumPy array of RGB
+        pixels. If it's None, the screen (or this FrameDiffer's region) is
+        captured."""
+        if frame is None:
+            left, top, width, height = self.region if self.region is not None else (0, 0) + tuple(mouseinfo.size())
+            raw = mouseinfo._rawPixels((left, top, width, height))
+        else:
+            left, top = self.region[:2] if self.region is not None else (0, 0)
+            raw, width, height = self._frameRaw(frame)
+
+        signatures = self._tileSignatures(raw, width, height)
+        layout = (width, height, raw[3])
+        if self._signatures is None or layout != self._layout:
+            self.changedTiles = numpy.ones(signatures.shape, dtype=bool)
+        else:
+            self.changedTiles = signatures != self._signatures
+        self._signatures = signatures
+        self._layout = layout
+        return self._rectangles(self.changedTiles, left, top, width, height)
+
+
+    def reset(self):
+        """Forget the previous frame, so the next one counts as changed everywhere."""
+        self._signatures = None
+        self.changedTiles = None
+
+
+    def _frameRaw(self, frame):
+        # Returns a (buffer, offset, bytesPerLine, rawmode) tuple, width, and
+        # height for a Pillow Image or NumPy array frame.
+        if hasattr(frame, 'tobytes') and hasattr(frame, 'mode'):
+            if frame.mode != 'RGB':
+                frame = frame.convert('RGB')
+            width, height = frame.size
+            return (frame.tobytes(), 0, width * 3, 'RGB'), width, height
+        frame = numpy.ascontiguousarray(frame, dtype=numpy.uint8)
+        if frame.ndim != 3 or frame.shape[2] != 3:
+            raise ValueError('frame must be a height x width x 3 array, not one of shape %r' % (frame.shape,))
+        height, width = frame.shape[:2]
+        return (frame, 0, width * 3, 'RGB'), width, height
+
+
+    def _wordRows(self, raw, width, height):
+        # Returns a height x n NumPy view of each row's bytes as the widest
+        # unsigned integers that evenly divide the row, the tiles, the row
+        # stride, and the offset, and the number of them in each tile.
+        buffer, offset, bytesPerLine, rawmode = raw
+        bytesPerPixel = mouseinfo._RAW_MODES[rawmode][0]
+        rowBytes = width * bytesPerPixel
+        tileBytes = self.tileSize * bytesPerPixel
+        flat = numpy.frombuffer(buffer, dtype=numpy.uint8)
+        rows = numpy.lib.stride_tricks.as_strided(flat[offset:], shape=(height, rowBytes),
+                                                  strides=(bytesPerLine, 1), writeable=False)
+        for dtype in (numpy.uint64, numpy.uint32, numpy.uint16):
+            size = numpy.dtype(dtype).itemsize
+            if rowBytes % size == 0 and tileBytes % size == 0 and bytesPerLine % size == 0 and offset % size == 0:
+                try:
+                    return rows.view(dtype), tileBytes // size
+                except ValueError:
+                    pass # Older versions of NumPy can't view a non-contiguous array as a wider type.
+        return rows, tileBytes
+
+
+    def _tileWeights(self, rowWords):
+        # Returns the random odd multipliers for every word of a row and for
+        # every row of a tile. They're the same for every frame.
+        key = (rowWords, self.tileSize)
+        if key not in self._weights:
+            randomState = numpy.random.RandomState(len(self._weights))
+            weights = randomState.randint(0, 2 ** 62, size=rowWords + self.tileSize, dtype=numpy.int64).astype(numpy.uint64) * 4 + 1
+            self._weights[key] = (weights[:rowWords], weights[rowWords:, None])
+        return self._weights[key]
+
+
+    def _tileSignatures(self, raw, width, height):
+        # Returns a rows x columns NumPy array of each tile's signature.
+        words, tileWords = self._wordRows(raw, width, height)
+        columnWeights, rowWeights = self._tileWeights(words.shape[1])
+        columnStarts = numpy.arange(0, words.shape[1], tileWords)
+        tileRows = -(-height // self.tileSize)
+        signatures = numpy.empty((tileRows, len(columnStarts)), dtype=numpy.uint64)
+        for tileRow in range(tileRows):
+            band = words[tileRow * self.tileSize:(tileRow + 1) * self.tileSize]
+            # Integer arithmetic in NumPy arrays wraps around silently, which is the modulo 2**64 wanted here.
+            rowSums = numpy.add.reduceat(band * columnWeights, columnStarts, axis=1, dtype=numpy.uint64)
+            signatures[tileRow] = (rowSums * rowWeights[:len(band)]).sum(axis=0, dtype=numpy.uint64)
+        return signatures
+
+
+    def _rectangles(self, changedTiles, left, top, width, height):
+        # Merge the runs of changed tiles in each row of tiles into
+        # rectangles, then merge each rectangle with the one directly above
+        # it if they span the same columns.
+        tileSize = self.tileSize
+        rectangles = []
+        openRectangles = {} # Maps the (firstColumn, endColumn) of each rectangle that reached the previous row to its index.
+        for row in range(changedTiles.shape[0]):
+            changed = numpy.concatenate(([False], changedTiles[row], [False]))
+            edges = numpy.flatnonzero(changed[1:] != changed[:-1])
+            stillOpen = {}
+            for firstColumn, endColumn in zip(edges[::2], edges[1::2]):
+                span = (int(firstColumn), int(endColumn))
+                rectangleTop = top + row * tileSize
+                rectangleHeight = min(tileSize, height - row * tileSize)
+                if span in openRectangles:
+                    index = openRectangles[span]
+                    x, y, w, h = rectangles[index]
+                    rectangles[index] = (x, y, w, h + rectangleHeight)
+                else:
+                    index = len(rectangles)
+                    rectangleLeft = left + span[0] * tileSize
+                    rectangleWidth = min(span[1] * tileSize, width) - span[0] * tileSize
+                    rectangles.append((rectangleLeft, rectangleTop, rectangleWidth, rectangleHeight))
+                stillOpen[span] = index
+            openRectangles = stillOpen
+        return rectangles
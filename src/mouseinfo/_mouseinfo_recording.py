@@ -0,0 +1,562 @@
+# The binary session recording format for MouseInfo.
+#
+# A recording file is a 32-byte header followed by fixed-width records, one
+# per sample. Every field is little-endian:
+#
+#     Header:  magic (8 bytes, b'MIREC\0\0\0'), version (uint16),
+#              record size (uint16), reserved (uint32), sample rate in Hz
+#              (double, 0 if unknown), wall clock start time (double, seconds
+#              since the epoch)
+#     Record:  timestamp (double, monotonic seconds), x (int32), y (int32),
+#              red, green, blue, flags (uint8 each)
+#
+# That's 20 bytes per sample, compared to about 30 bytes for a line of the
+# MouseInfo window's text log, and reading it back doesn't need any parsing.
+# Since the records are all the same size, Recording can memory-map the file
+# and find any sample (or, with a binary search of the timestamps, any point
+# in time) without reading the rest of the file. Opening a recording only
+# reads its header, so it takes the same time no matter how long it is.
+
+import bisect, collections, mmap, os, struct, time
+
+MAGIC = b'MIREC\x00\x00\x00'
+VERSION = 1
+HEADER_FORMAT = '<8sHHIdd'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT) # 32 bytes
+RECORD_FORMAT = '<diiBBBB'
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT) # 20 bytes
+
+# The bits of a record's flags field:
+FLAG_NO_COLOR = 0x01 # The color wasn't read, so red, green, and blue are 0.
+FLAG_USER = 0x10 # This bit and the ones above it are free for the caller to use.
+
+COLUMNS = ('timestamp', 'x', 'y', 'red', 'green', 'blue', 'flags')
+_COLUMN_FORMATS = ('d', 'i', 'i', 'B', 'B', 'B', 'B')
+_COLUMN_OFFSETS = (0, 8, 12, 16, 17, 18, 19)
+
+Record = collections.namedtuple('Record', COLUMNS)
+
+
+def _numpyDtype(numpy):
+    return numpy.dtype({'names': list(COLUMNS),
+                        'formats': ['<f8', '<i4', '<i4', 'u1', 'u1', 'u1', 'u1'],
+                        'offsets': list(_COLUMN_OFFSETS),
+                        'itemsize': RECORD_SIZE})
+
+
+class RecordingWriter(object):
+    """Writes samples to a new binary recording file. Use
+    mouseinfo.createRecording() to make one. fileOrFilename can also be a
+    binary file object, such as sys.stdout.buffer, which close() leaves
+    open."""
+
+    def __init__(self, fileOrFilename, rate=0, bufferSize=64 * 1024):
+        self.rate = rate
+        self.count = 0 # The number of records written.
+        if hasattr(fileOrFilename, 'write'):
+            self.filename = getattr(fileOrFilename, 'name', None)
+            self._fileObj = fileOrFilename
+            self._ownsFile = False
+        else:
+            self.filename = fileOrFilename
+            self._fileObj = open(fileOrFilename, 'wb', bufferSize)
+            self._ownsFile = True
+        self._fileObj.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, RECORD_SIZE, 0, float(rate), time.time()))
+        self._lastTimestamp = None
+
+
+    def writeRecord(self, timestamp, x, y, rgb=None, flags=0):
+        """Adds a sample to the recording. rgb is a (red, green, blue) tuple,
+        or None if the color wasn't read. Timestamps must not go backwards."""
+        if self._lastTimestamp is not None and timestamp < self._lastTimestamp:
+            raise ValueError('timestamp %r is earlier than the previous timestamp %r' % (timestamp, self._lastTimestamp))
+        self._lastTimestamp = timestamp
+        if rgb is None:
+            flags |= FLAG_NO_COLOR
+            rgb = (0, 0, 0)
+        self._fileObj.write(struct.pack(RECORD_FORMAT, timestamp, x, y, rgb[0], rgb[1], rgb[2], flags))
+        self.count += 1
+
+
+    def write(self, sample, flags=0):
+        """Adds a mouseinfo.Sample to the recording."""
+        self.writeRecord(sample.timestamp, sample.x, sample.y, sample.rgb, flags)
+
+
+    def flush(self):
+        self._fileObj.flush()
+
+
+    def close(self):
+        if self._ownsFile:
+            self._fileObj.close()
+        else:
+            self._fileObj.flush()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+
+class _Column(object):
+    # A read-only sequence of one field of every record, which unpacks each
+    # value straight out of the memory-mapped file when it's accessed. This is
+    # what Recording.column() returns when NumPy isn't installed.
+    def __init__(self, buffer, count, columnFormat, offset):
+        self._buffer = buffer
+        self._count = count
+        self._struct = struct.Struct('<' + columnFormat)
+        self._offset = HEADER_SIZE + offset
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('column index out of range')
+        return self._struct.unpack_from(self._buffer, self._offset + index * RECORD_SIZE)[0]
+
+
+class Recording(object):
+    """A binary recording file opened for reading with mouseinfo.openRecording().
+
+    The file is memory-mapped, so opening it only reads the header. Records
+    can be read with len(), indexing (which returns Record namedtuples), and
+    iteration. column(name) and records() give zero-copy NumPy views if NumPy
+    is installed. timeRange() finds the records between two timestamps with
+    a binary search."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as fileObj:
+            header = fileObj.read(HEADER_SIZE)
+            if len(header) < HEADER_SIZE or header[:len(MAGIC)] != MAGIC:
+                raise ValueError('%r is not a MouseInfo recording file' % (filename,))
+            magic, version, recordSize, reserved, self.rate, self.startTime = struct.unpack(HEADER_FORMAT, header)
+            if version != VERSION or recordSize != RECORD_SIZE:
+                raise ValueError('%r is a version %s recording, which this version of MouseInfo cannot read' % (filename, version))
+
+            # A recording that was cut off in the middle of a record (because
+            # the recorder was killed, for example) just ignores that record.
+            fileSize = os.fstat(fileObj.fileno()).st_size
+            self._count = (fileSize - HEADER_SIZE) // RECORD_SIZE
+            if self._count > 0:
+                self._mmap = mmap.mmap(fileObj.fileno(), HEADER_SIZE + self._count * RECORD_SIZE, access=mmap.ACCESS_READ)
+            else:
+                self._mmap = None # mmap can't map an empty range.
+        self._struct = struct.Struct(RECORD_FORMAT)
+        self._records = None # The NumPy record array, created the first time it's needed.
+
+
+    def __len__(self):
+        return self._count
+
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('recording index out of range')
+        return Record(*self._struct.unpack_from(self._mmap, HEADER_SIZE + index * RECORD_SIZE))
+
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+
+    def records(self):
+        """Returns a NumPy structured array view of every record, with a field
+        for each of the Record namedtuple's fields. No data is copied; the
+        array reads from the memory-mapped file. Raises ImportError if NumPy
+        isn't installed."""
+        if self._records is None:
+            import numpy
+            if self._mmap is None:
+                self._records = numpy.zeros(0, dtype=_numpyDtype(numpy))
+            else:
+                self._records = numpy.frombuffer(self._mmap, dtype=_numpyDtype(numpy), count=self._count, offset=HEADER_SIZE)
+        return self._records
+
+
+    def column(self, name):
+        """Returns one field ('timestamp', 'x', 'y', 'red', 'green', 'blue', or
+        'flags') of every record without copying it: a NumPy array view if
+        NumPy is installed, or otherwise a read-only sequence that reads each
+        value from the file as it's accessed."""
+        if name not in COLUMNS:
+            raise ValueError('name must be one of %s, not %r' % (', '.join(COLUMNS), name))
+        try:
+            return self.records()[name]
+        except ImportError:
+            i = COLUMNS.index(name)
+            return _Column(self._mmap, self._count, _COLUMN_FORMATS[i], _COLUMN_OFFSETS[i])
+
+
+    def timeRange(self, start=None, end=None):
+        """Returns (startIndex, endIndex), the indexes of the records with
+        start <= timestamp < end. Either can be None to mean the start or end
+        of the recording. This is a binary search of the timestamps, so it
+        only reads a few records from the file."""
+        # NumPy's searchsorted() would copy the strided timestamp column
+        # first, so bisect the records in the file instead.
+        timestamps = _Column(self._mmap, self._count, _COLUMN_FORMATS[0], _COLUMN_OFFSETS[0])
+        startIndex = 0 if start is None else bisect.bisect_left(timestamps, start)
+        endIndex = self._count if end is None else bisect.bisect_left(timestamps, end)
+        return startIndex, max(startIndex, endIndex)
+
+
+    def between(self, start=None, end=None):
+        """Returns the records with start <= timestamp < end, as a NumPy
+        structured array view if NumPy is installed or as a list of Record
+        namedtuples otherwise."""
+        startIndex, endIndex = self.timeRange(start, end)
+        try:
+            return self.records()[startIndex:endIndex]
+        except ImportError:
+            return self[startIndex:endIndex]
+
+
+    def close(self):
+        """Closes the memory-mapped file. NumPy views returned by records()
+        and column() keep the file mapped until they're deleted."""
+        self._records = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass # A NumPy view still uses the mmap, so it will be closed when the view is garbage collected.
+            self._mmap = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+
+# =========================================================================
+# The compressed trace format
+#
+# Pointer traces are very redundant: the mouse sits still for seconds at a
+# time, samples come at a steady rate, and the same few colors repeat. A
+# trace file stores the same records as a recording file, but encodes each
+# one as what changed since the previous record:
+#
+#     Header:  magic (8 bytes, b'MITRC\0\0\0'), version (uint16), reserved
+#              (uint16), palette size (uint32), sample rate in Hz (double),
+#              wall clock start time (double), time resolution (double)
+#     Tokens:  0x80 to 0xfe: a run of 1 to 127 records that are the same as
+#                  the previous record, with the same time between them
+#              0xff, count: a run of count (a varint) such records
+#              0x00 to 0x1f: one record, where each bit says what changed,
+#                  followed by the changes in this order:
+#                  TRACE_XY: dx, dy (zigzag varints)
+#                  TRACE_PALETTE_COLOR: a palette index (varint)
+#                  TRACE_NEW_COLOR: red, green, blue (bytes)
+#                  TRACE_FLAGS: flags (byte)
+#                  TRACE_TIME: the change in the time between records, in
+#                      units of the time resolution (zigzag varint)
+#
+# A trace that was cut off in the middle of a record ends before that record.
+# Timestamps are rounded to the time resolution (1 millisecond by default)
+# so that the jitter in the sampling times doesn't break up runs. Every new
+# color is stored in the next slot of a fixed-size ring-buffer palette, so
+# the encoder and decoder use a bounded amount of memory no matter how long
+# the trace is.
+
+TRACE_MAGIC = b'MITRC\x00\x00\x00'
+TRACE_VERSION = 1
+TRACE_HEADER_FORMAT = '<8sHHIddd'
+TRACE_HEADER_SIZE = struct.calcsize(TRACE_HEADER_FORMAT) # 40 bytes
+
+TRACE_XY = 0x01
+TRACE_PALETTE_COLOR = 0x02
+TRACE_NEW_COLOR = 0x04
+TRACE_FLAGS = 0x08
+TRACE_TIME = 0x10
+_TRACE_RUN = 0x80
+_TRACE_LONG_RUN = 0xff
+
+
+def _appendVarint(output, value):
+    # Append the non-negative integer value to the output bytearray, 7 bits per byte.
+    while value >= 0x80:
+        output.append((value & 0x7f) | 0x80)
+        value >>= 7
+    output.append(value)
+
+
+def _zigzag(value):
+    # Map signed integers to non-negative ones so small negative numbers stay small: 0, -1, 1, -2... become 0, 1, 2, 3...
+    return (value << 1) if value >= 0 else ((-value << 1) - 1)
+
+
+def _unzigzag(value):
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1)
+
+
+class TraceWriter(object):
+    """Writes records to a compressed trace file as they come in. Use
+    mouseinfo.createTrace() to make one. It has the same write(),
+    writeRecord(), flush(), and close() methods as RecordingWriter.
+    fileOrFilename can also be a binary file object, which close() leaves
+    open."""
+
+    def __init__(self, fileOrFilename, rate=0, timeResolution=0.001, paletteSize=4096, bufferSize=64 * 1024):
+        if timeResolution <= 0:
+            raise ValueError('timeResolution must be a positive number, not %r' % (timeResolution,))
+        if paletteSize <= 0:
+            raise ValueError('paletteSize must be a positive number, not %r' % (paletteSize,))
+        self.rate = rate
+        self.timeResolution = timeResolution
+        self.paletteSize = paletteSize
+        self.bufferSize = bufferSize
+        self.count = 0 # The number of records written.
+        self.bytesWritten = TRACE_HEADER_SIZE # The size of the trace so far, including buffered bytes.
+        if hasattr(fileOrFilename, 'write'):
+            self.filename = getattr(fileOrFilename, 'name', None)
+            self._fileObj = fileOrFilename
+            self._ownsFile = False
+        else:
+            self.filename = fileOrFilename
+            self._fileObj = open(fileOrFilename, 'wb')
+            self._ownsFile = True
+        self._fileObj.write(struct.pack(TRACE_HEADER_FORMAT, TRACE_MAGIC, TRACE_VERSION, 0, paletteSize,
+                                        float(rate), time.time(), float(timeResolution)))
+
+        self._output = bytearray()
+        self._palette = {} # Maps an (r, g, b) tuple to its slot in the palette.
+        self._paletteSlots = [None] * paletteSize # The color in each slot, so it can be removed when the slot is reused.
+        self._nextSlot = 0
+        self._tick = 0 # The previous record's timestamp, in units of timeResolution.
+        self._tickDelta = 0 # The time between the previous two records, in units of timeResolution.
+        self._x = 0
+        self._y = 0
+        self._rgb = None
+        self._flags = 0
+        self._runLength = 0 # The number of unchanged records that haven't been written yet.
+
+
+    def writeRecord(self, timestamp, x, y, rgb=None, flags=0):
+        """Adds a sample to the trace. rgb is a (red, green, blue) tuple, or
+        None if the color wasn't read. Timestamps must not go backwards."""
+        tick = int(round(timestamp / self.timeResolution))
+        if tick < self._tick and self.count > 0:
+            raise ValueError('timestamp %r is earlier than the previous timestamp %r' % (timestamp, self._tick * self.timeResolution))
+        if rgb is None:
+            flags |= FLAG_NO_COLOR
+            rgb = (0, 0, 0)
+        else:
+            rgb = (rgb[0], rgb[1], rgb[2])
+        tickDelta = tick - self._tick
+        self._tick = tick
+        self.count += 1
+
+        changes = 0
+        if x != self._x or y != self._y:
+            changes |= TRACE_XY
+        if rgb != self._rgb:
+            changes |= TRACE_PALETTE_COLOR if rgb in self._palette else TRACE_NEW_COLOR
+        if flags != self._flags:
+            changes |= TRACE_FLAGS
+        if tickDelta != self._tickDelta:
+            changes |= TRACE_TIME
+        if not changes:
+            self._runLength += 1
+            return
+
+        output = self._output
+        if self._runLength:
+            self._writeRun()
+        output.append(changes)
+        if changes & TRACE_XY:
+            _appendVarint(output, _zigzag(x - self._x))
+            _appendVarint(output, _zigzag(y - self._y))
+            self._x = x
+            self._y = y
+        if changes & TRACE_PALETTE_COLOR:
+            _appendVarint(output, self._palette[rgb])
+        elif changes & TRACE_NEW_COLOR:
+            output.extend(rgb)
+            oldColor = self._paletteSlots[self._nextSlot]
+            if oldColor is not None:
+                del self._palette[oldColor]
+            self._palette[rgb] = self._nextSlot
+            self._paletteSlots[self._nextSlot] = rgb
+            self._nextSlot = (self._nextSlot + 1) % self.paletteSize
+        self._rgb = rgb
+        if changes & TRACE_FLAGS:
+            output.append(flags)
+            self._flags = flags
+        if changes & TRACE_TIME:
+            _appendVarint(output, _zigzag(tickDelta - self._tickDelta))
+            self._tickDelta = tickDelta
+
+        if len(output) >= self.bufferSize:
+            self._writeOutput()
+
+
+    def write(self, sample, flags=0):
+        """Adds a mouseinfo.Sample (or a Record) to the trace."""
+        if isinstance(sample, Record):
+            rgb = None if sample.flags & FLAG_NO_COLOR else (sample.red, sample.green, sample.blue)
+            self.writeRecord(sample.timestamp, sample.x, sample.y, rgb, sample.flags & ~FLAG_NO_COLOR | flags)
+        else:
+            self.writeRecord(sample.timestamp, sample.x, sample.y, sample.rgb, flags)
+
+
+    def _writeRun(self):
+        if self._runLength <= _TRACE_LONG_RUN - _TRACE_RUN:
+            self._output.append(_TRACE_RUN + self._runLength - 1)
+        else:
+            self._output.append(_TRACE_LONG_RUN)
+            _appendVarint(self._output, self._runLength)
+        self._runLength = 0
+
+
+    def _writeOutput(self):
+        self._fileObj.write(bytes(self._output))
+        self.bytesWritten += len(self._output)
+        del self._output[:]
+
+
+    def flush(self):
+        """Writes every record so far to the file. This ends any run of
+        unchanged records, so calling it often makes the trace bigger."""
+        if self._runLength:
+            self._writeRun()
+        self._writeOutput()
+        self._fileObj.flush()
+
+
+    def close(self):
+        self.flush()
+        if self._ownsFile:
+            self._fileObj.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+
+class TraceReader(object):
+    """Reads the records of a compressed trace file in order, as Record
+    namedtuples, by iterating over it. Use mouseinfo.openTrace() to make
+    one. The file is read bufferSize bytes at a time, so memory use doesn't
+    depend on the length of the trace."""
+
+    def __init__(self, fileOrFilename, bufferSize=64 * 1024):
+        if hasattr(fileOrFilename, 'read'):
+            self.filename = getattr(fileOrFilename, 'name', None)
+            self._fileObj = fileOrFilename
+            self._ownsFile = False
+        else:
+            self.filename = fileOrFilename
+            self._fileObj = open(fileOrFilename, 'rb')
+            self._ownsFile = True
+        self.bufferSize = bufferSize
+
+        header = self._fileObj.read(TRACE_HEADER_SIZE)
+        if len(header) < TRACE_HEADER_SIZE or header[:len(TRACE_MAGIC)] != TRACE_MAGIC:
+            raise ValueError('%r is not a MouseInfo trace file' % (self.filename,))
+        magic, version, reserved, self.paletteSize, self.rate, self.startTime, self.timeResolution = \
+            struct.unpack(TRACE_HEADER_FORMAT, header)
+        if version != TRACE_VERSION:
+            raise ValueError('%r is a version %s trace, which this version of MouseInfo cannot read' % (self.filename, version))
+        self._buffer = bytearray()
+        self._pos = 0
+
+
+    def _readByte(self):
+        if self._pos == len(self._buffer):
+            self._buffer = bytearray(self._fileObj.read(self.bufferSize))
+            self._pos = 0
+            if not self._buffer:
+                raise EOFError('The end of the trace file was reached.')
+        value = self._buffer[self._pos]
+        self._pos += 1
+        return value
+
+
+    def _readVarint(self):
+        value = 0
+        shift = 0
+        while True:
+            byte = self._readByte()
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+
+    def __iter__(self):
+        palette = [None] * self.paletteSize
+        nextSlot = 0
+        tick = 0
+        tickDelta = 0
+        x = y = flags = 0
+        rgb = (0, 0, 0)
+        timeResolution = self.timeResolution
+        while True:
+            # A trace that was cut off in the middle of a record (because the
+            # writer was killed, for example) just ends before that record.
+            try:
+                token = self._readByte()
+                if token & _TRACE_RUN:
+                    runLength = self._readVarint() if token == _TRACE_LONG_RUN else token - _TRACE_RUN + 1
+                else:
+                    runLength = 0
+                    if token & TRACE_XY:
+                        x += _unzigzag(self._readVarint())
+                        y += _unzigzag(self._readVarint())
+                    if token & TRACE_PALETTE_COLOR:
+                        rgb = palette[self._readVarint()]
+                    elif token & TRACE_NEW_COLOR:
+                        rgb = (self._readByte(), self._readByte(), self._readByte())
+                        palette[nextSlot] = rgb
+                        nextSlot = (nextSlot + 1) % self.paletteSize
+                    if token & TRACE_FLAGS:
+                        flags = self._readByte()
+                    if token & TRACE_TIME:
+                        tickDelta += _unzigzag(self._readVarint())
+            except EOFError:
+                return
+
+            if runLength:
+                for i in range(runLength):
+                    tick += tickDelta
+                    yield Record(tick * timeResolution, x, y, rgb[0], rgb[1], rgb[2], flags)
+                continue
+
+            tick += tickDelta
+            yield Record(tick * timeResolution, x, y, rgb[0], rgb[1], rgb[2], flags)
+
+
+    def close(self):
+        if self._ownsFile:
+            self._fileObj.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
@@ -0,0 +1,299 @@
+# The pixel watch engine behind mouseinfo.createPixelWatcher(). This is in
+# its own module because it needs NumPy, which is slow to import and
+# optional for the rest of MouseInfo. mouseinfo.createPixelWatcher() imports
+# it the first time it's called.
+#
+# Every tick, the smallest region covering all of the watches is captured
+# once. The color watches are evaluated together: their pixels' positions in
+# that region are kept in one index array (rebuilt only when watches are
+# added or removed), so a single fancy-indexing pass gathers every watched
+# pixel, one vectorized comparison checks them all against their target
+# colors, and numpy.add.reduceat() totals the matching and changed pixels of
+# each watch. Only watches with a predicate function need a Python call each.
+
+from __future__ import division
+import collections, threading
+import numpy
+import mouseinfo
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue # Python 2
+
+
+WatchEvent = collections.namedtuple('WatchEvent', ['timestamp', 'watch', 'kind', 'pixels'])
+WatchEvent.__doc__ = """Something that happened to a Watch: kind is 'match' when its
+condition became true, 'unmatch' when it became false, or 'change' when any
+of its pixels changed. pixels is a height x width x 3 NumPy array of the
+watched pixels' colors when it happened."""
+
+
+class Watch(object):
+    """A point or rectangle of the screen watched by a PixelWatcher. Create
+    these with PixelWatcher.watch(). The matched attribute is True while its
+    condition is true, and None until it's first checked."""
+
+    def __init__(self, region, color, tolerance, mode, predicate, callback, changes, name):
+        self.region = region
+        self.color = color
+        self.tolerance = tolerance
+        self.mode = mode
+        self.predicate = predicate
+        self.callback = callback
+        self.changes = changes
+        self.name = name
+        self.matched = None
+        self._matchedEvent = threading.Event()
+
+
+    def wait(self, timeout=None):
+        """Block until this watch's condition is true, or until timeout
+        seconds have passed. Returns True if it's true."""
+        return self._matchedEvent.wait(timeout) if timeout is not None else self._matchedEvent.wait()
+
+
+    def __repr__(self):
+        return '%s(%r, region=%r, matched=%r)' % (self.__class__.__name__, self.name, self.region, self.matched)
+
+
+class PixelWatcher(object):
+    """Watches points and rectangles of the screen for colors, conditions,
+    and changes, capturing the screen once per tick for all of them. Events
+    are passed to each watch's callback (on the watcher's thread), or put in
+    the events queue for watches without a callback."""
+
+    def __init__(self, rate=10):
+        if rate <= 0:
+            raise ValueError('rate must be a positive number, not %r' % (rate,))
+        self.rate = rate
+        self.events = queue.Queue() # WatchEvents of watches without a callback.
+        self.ticks = 0 # The number of frames captured and evaluated.
+        self.late = 0 # The number of ticks that started later than scheduled.
+        self.lastError = None # The last exception raised while capturing or evaluating, if any.
+
+        self._watches = []
+        self._lock = threading.RLock()
+        self._plan = None # The arrays used to evaluate every watch, rebuilt when the watches change.
+        self._previousPixels = None # The gathered pixels of the last tick, for finding changes.
+        self._stopEvent = threading.Event()
+        self._thread = None
+
+
+    def watch(self, target, color=None, tolerance=0, mode='all', predicate=None, callback=None, changes=False, name=None):
+        """Start watching target, which is either an (x, y) point or a (left,
+        top, width, height) rectangle, and return its Watch.
+
+        If color is given, the watch's condition is that its pixels are all
+        (or, if mode is 'any', any of them are) within tolerance of the
+        (red, green, blue) color in every channel. If predicate is given, it
+        is instead called with a height x width x 3 NumPy array of the
+        pixels, and its return value is the condition. 'match' and 'unmatch'
+        events are sent when the condition changes. If changes is True,
+        'change' events are also sent whenever any of the pixels change."""
+        if len(target) == 2:
+            region = (int(target[0]), int(target[1]), 1, 1)
+        elif len(target) == 4:
+            region = tuple(int(value) for value in target)
+        else:
+            raise ValueError('target must be an (x, y) point or a (left, top, width, height) rectangle, not %r' % (target,))
+        if region[2] <= 0 or region[3] <= 0:
+            raise ValueError('target width and height must be positive: %r' % (target,))
+        if mode not in ('all', 'any'):
+            raise ValueError("mode must be 'all' or 'any', not %r" % (mode,))
+        if color is None and predicate is None and not changes:
+            raise ValueError('a watch needs a color, a predicate, or changes=True')
+        if color is not None and predicate is not None:
+            raise ValueError('a watch can have a color or a predicate, not both')
+
+        watch = Watch(region, None if color is None else tuple(color), tolerance, mode, predicate, callback, changes, name)
+        with self._lock:
+            self._watches.append(watch)
+            self._plan = None
+        return watch
+
+
+    def unwatch(self, watch):
+        """Stop watching watch."""
+        with self._lock:
+            self._watches.remove(watch)
+            self._plan = None
+
+
+    def watches(self):
+        """Returns a list of every Watch."""
+        with self._lock:
+            return list(self._watches)
+
+
+    def _makePlan(self):
+        # Precompute everything about the watches that doesn't change from
+        # tick to tick: the region that covers them all, and, for the watches
+        # whose pixels are gathered (those with a color or changes=True), the
+        # row and column of each of their pixels in that region and each
+        # pixel's target color and tolerance.
+        watches = list(self._watches)
+        gathered = [watch for watch in watches if watch.color is not None or watch.changes]
+        left = min(watch.region[0] for watch in watches)
+        top = min(watch.region[1] for watch in watches)
+        right = max(watch.region[0] + watch.region[2] for watch in watches)
+        bottom = max(watch.region[1] + watch.region[3] for watch in watches)
+
+        rows, columns, starts, targets, tolerances = [], [], [], [], []
+        count = 0
+        for watch in gathered:
+            watchLeft, watchTop, width, height = watch.region
+            watchRows, watchColumns = numpy.mgrid[watchTop - top:watchTop - top + height, watchLeft - left:watchLeft - left + width]
+            rows.append(watchRows.ravel())
+            columns.append(watchColumns.ravel())
+            starts.append(count)
+            count += width * height
+            targets.append(numpy.tile(numpy.array(watch.color or (0, 0, 0), dtype=numpy.int16), (width * height, 1)))
+            tolerances.append(numpy.full(width * height, watch.tolerance, dtype=numpy.int16))
+
+        self._plan = {'region': (left, top, right - left, bottom - top),
+                      'gathered': gathered,
+                      'predicates': [watch for watch in watches if watch.predicate is not None]}
+        if gathered:
+            self._plan.update({
+                'rows': numpy.concatenate(rows),
+                'columns': numpy.concatenate(columns),
+                'starts': numpy.array(starts, dtype=numpy.intp),
+                'sizes': numpy.array([watch.region[2] * watch.region[3] for watch in gathered], dtype=numpy.intp),
+                'targets': numpy.concatenate(targets),
+                'tolerances': numpy.concatenate(tolerances),
+                'hasColor': numpy.array([watch.color is not None for watch in gathered]),
+                'modeAll': numpy.array([watch.mode == 'all' for watch in gathered]),
+                'changes': numpy.array([watch.changes for watch in gathered]),
+                # Each color watch's condition as of the last tick: 1, 0, or -1 if it hasn't been checked.
+                'state': numpy.array([-1 if watch.matched is None else int(watch.matched) for watch in gathered], dtype=numpy.int8)})
+        self._previousPixels = None
+
+
+    def poll(self):
+        """Capture the screen once, evaluate every watch, deliver the events,
+        and return them as a list of WatchEvents."""
+        with self._lock:
+            if not self._watches:
+                return []
+            if self._plan is None:
+                self._makePlan()
+            events = self._evaluate(self._plan)
+            self.ticks += 1
+        for event in events:
+            if event.watch.callback is not None:
+                event.watch.callback(event)
+            else:
+                self.events.put(event)
+        return events
+
+
+    def _evaluate(self, plan):
+        left, top, width, height = plan['region']
+        timestamp = mouseinfo._timer()
+        frame = mouseinfo._rawArrayView(numpy, mouseinfo._rawPixels(plan['region']), width, height)
+        events = []
+
+        # Predicates are the only watches that need a Python call each tick.
+        predicateTransitions = set()
+        for watch in plan['predicates']:
+            watchPixels = self._watchPixels(frame, plan, watch)
+            matched = bool(watch.predicate(watchPixels))
+            if matched != watch.matched:
+                predicateTransitions.add(watch)
+                events.append(WatchEvent(timestamp, watch, self._setMatched(watch, matched), watchPixels))
+
+        if plan['gathered']:
+            # Gather every watched pixel in one pass, compare them all to their
+            # target colors and to the last tick's pixels, and total the
+            # results for each watch. Only the watches that have an event are
+            # looked at in Python.
+            pixels = frame[plan['rows'], plan['columns']]
+            distances = numpy.abs(pixels.astype(numpy.int16) - plan['targets']).max(axis=1)
+            matchCounts = numpy.add.reduceat(distances <= plan['tolerances'], plan['starts'], dtype=numpy.intp)
+            matched = numpy.where(plan['modeAll'], matchCounts == plan['sizes'], matchCounts > 0)
+            transitions = plan['hasColor'] & (matched.astype(numpy.int8) != plan['state'])
+            plan['state'][transitions] = matched[transitions]
+            if self._previousPixels is None:
+                changed = numpy.zeros(len(plan['gathered']), dtype=bool)
+            else:
+                changed = numpy.add.reduceat((pixels != self._previousPixels).any(axis=1), plan['starts'], dtype=numpy.intp) > 0
+            self._previousPixels = pixels
+
+            for i in numpy.flatnonzero(transitions | (plan['changes'] & changed)):
+                watch = plan['gathered'][i]
+                if transitions[i]:
+                    kind = self._setMatched(watch, bool(matched[i]))
+                elif watch in predicateTransitions:
+                    continue # This tick's 'match' or 'unmatch' event already covers the change.
+                else:
+                    kind = 'change'
+                events.append(WatchEvent(timestamp, watch, kind, self._watchPixels(frame, plan, watch)))
+        return events
+
+
+    def _setMatched(self, watch, matched):
+        # Record a watch's new condition and return the kind of event for it.
+        watch.matched = matched
+        if matched:
+            watch._matchedEvent.set()
+            return 'match'
+        watch._matchedEvent.clear()
+        return 'unmatch'
+
+
+    def _watchPixels(self, frame, plan, watch):
+        # Copy a watch's pixels out of the frame, which is only valid until the next capture.
+        watchLeft, watchTop, width, height = watch.region
+        row, column = watchTop - plan['region'][1], watchLeft - plan['region'][0]
+        return frame[row:row + height, column:column + width].copy()
+
+
+    def start(self):
+        """Start polling rate times a second on a background thread."""
+        if self._thread is not None:
+            return
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target=self._run, name='mouseinfo-pixelwatcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def stop(self):
+        """Stop polling and wait for the background thread to finish."""
+        if self._thread is None:
+            return
+        self._stopEvent.set()
+        self._thread.join()
+        self._thread = None
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
+
+
+    def _run(self):
+        period = 1.0 / self.rate
+        nextTickTime = mouseinfo._timer()
+        while not self._stopEvent.is_set():
+            tickTime = mouseinfo._timer()
+            try:
+                self.poll()
+            except Exception as e:
+                self.lastError = e
+            if mouseinfo._statsHistograms is not None:
+                mouseinfo._recordTiming('watcher.tick', mouseinfo._timer() - tickTime)
+
+            nextTickTime += period
+            delay = nextTickTime - mouseinfo._timer()
+            if delay < 0:
+                # Skip the ticks that were missed instead of running them back to back.
+                self.late += 1
+                nextTickTime = mouseinfo._timer()
+                delay = 0
+            self._stopEvent.wait(delay)
@@ -0,0 +1,646 @@
+# Low-level X11 code for MouseInfo that goes beyond the simple requests made
+# in __init__.py.
+#
+# The MIT-SHM extension lets the X server copy screen pixels straight into a
+# shared memory segment that this process has mapped, so a capture doesn't
+# need a subprocess, a temporary file, or a PNG encode/decode round trip.
+# python-xlib doesn't support MIT-SHM, so this calls libX11 and libXext
+# through ctypes. The libraries are only loaded when an XShmCapture object is
+# created.
+#
+# PointerTracker uses python-xlib's RECORD extension support to be told about
+# every pointer motion event, instead of asking the X server where the
+# pointer is.
+#
+# DamageMonitor uses python-xlib's DAMAGE extension support to be told which
+# areas of the screen are drawn to, so that waitForPixel() and
+# waitForRegionChange() only read pixels again after they may have changed.
+
+import collections, ctypes, ctypes.util, os, select, threading
+from ctypes import (
+    CFUNCTYPE, POINTER, Structure, c_char_p, c_int, c_size_t, c_ubyte,
+    c_uint, c_ulong, c_void_p,
+)
+import mouseinfo
+
+ZPIXMAP = 2
+ALL_PLANES = 0xffffffff
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+SHMAT_FAILED = c_void_p(-1).value
+
+
+class XImage(Structure):
+    _fields_ = [('width', c_int),
+                ('height', c_int),
+                ('xoffset', c_int),
+                ('format', c_int),
+                ('data', c_void_p),
+                ('byte_order', c_int),
+                ('bitmap_unit', c_int),
+                ('bitmap_bit_order', c_int),
+                ('bitmap_pad', c_int),
+                ('depth', c_int),
+                ('bytes_per_line', c_int),
+                ('bits_per_pixel', c_int),
+                ('red_mask', c_ulong),
+                ('green_mask', c_ulong),
+                ('blue_mask', c_ulong),
+                ('obdata', c_void_p),
+                # struct funcs: create_image, destroy_image, get_pixel, put_pixel, sub_image, add_pixel
+                ('create_image', c_void_p),
+                ('destroy_image', c_void_p),
+                ('get_pixel', c_void_p),
+                ('put_pixel', c_void_p),
+                ('sub_image', c_void_p),
+                ('add_pixel', c_void_p)]
+
+
+class XShmSegmentInfo(Structure):
+    _fields_ = [('shmseg', c_ulong),
+                ('shmid', c_int),
+                ('shmaddr', c_void_p),
+                ('readOnly', c_int)]
+
+
+class XErrorEvent(Structure):
+    _fields_ = [('type', c_int),
+                ('display', c_void_p),
+                ('resourceid', c_ulong),
+                ('serial', c_ulong),
+                ('error_code', c_ubyte),
+                ('request_code', c_ubyte),
+                ('minor_code', c_ubyte)]
+
+
+XErrorHandler = CFUNCTYPE(c_int, c_void_p, POINTER(XErrorEvent))
+XDestroyImageFunc = CFUNCTYPE(c_int, POINTER(XImage))
+
+_x11 = None
+_xext = None
+_libc = None
+
+
+def _loadLibraries():
+    # Load libX11, libXext, and libc and declare the functions this module
+    # uses. Raises OSError if the X libraries aren't installed.
+    global _x11, _xext, _libc
+    if _x11 is not None:
+        return
+
+    x11Path = ctypes.util.find_library('X11')
+    xextPath = ctypes.util.find_library('Xext')
+    if x11Path is None or xextPath is None:
+        raise OSError('libX11 and libXext must be installed to use MIT-SHM screen capture.')
+    x11 = ctypes.CDLL(x11Path)
+    xext = ctypes.CDLL(xextPath)
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+
+    x11.XOpenDisplay.argtypes = [c_char_p]
+    x11.XOpenDisplay.restype = c_void_p
+    x11.XCloseDisplay.argtypes = [c_void_p]
+    x11.XCloseDisplay.restype = c_int
+    x11.XDefaultScreen.argtypes = [c_void_p]
+    x11.XDefaultScreen.restype = c_int
+    x11.XRootWindow.argtypes = [c_void_p, c_int]
+    x11.XRootWindow.restype = c_ulong
+    x11.XDefaultVisual.argtypes = [c_void_p, c_int]
+    x11.XDefaultVisual.restype = c_void_p
+    x11.XDefaultDepth.argtypes = [c_void_p, c_int]
+    x11.XDefaultDepth.restype = c_int
+    x11.XDisplayWidth.argtypes = [c_void_p, c_int]
+    x11.XDisplayWidth.restype = c_int
+    x11.XDisplayHeight.argtypes = [c_void_p, c_int]
+    x11.XDisplayHeight.restype = c_int
+    x11.XSync.argtypes = [c_void_p, c_int]
+    x11.XSync.restype = c_int
+    x11.XSetErrorHandler.argtypes = [c_void_p]
+    x11.XSetErrorHandler.restype = c_void_p
+
+    xext.XShmQueryExtension.argtypes = [c_void_p]
+    xext.XShmQueryExtension.restype = c_int
+    xext.XShmCreateImage.argtypes = [c_void_p, c_void_p, c_uint, c_int, c_void_p,
+                                     POINTER(XShmSegmentInfo), c_uint, c_uint]
+    xext.XShmCreateImage.restype = POINTER(XImage)
+    xext.XShmAttach.argtypes = [c_void_p, POINTER(XShmSegmentInfo)]
+    xext.XShmAttach.restype = c_int
+    xext.XShmDetach.argtypes = [c_void_p, POINTER(XShmSegmentInfo)]
+    xext.XShmDetach.restype = c_int
+    xext.XShmGetImage.argtypes = [c_void_p, c_ulong, POINTER(XImage), c_int, c_int, c_ulong]
+    xext.XShmGetImage.restype = c_int
+
+    libc.shmget.argtypes = [c_int, c_size_t, c_int]
+    libc.shmget.restype = c_int
+    libc.shmat.argtypes = [c_int, c_void_p, c_int]
+    libc.shmat.restype = c_void_p
+    libc.shmdt.argtypes = [c_void_p]
+    libc.shmdt.restype = c_int
+    libc.shmctl.argtypes = [c_int, c_int, c_void_p]
+    libc.shmctl.restype = c_int
+
+    _x11, _xext, _libc = x11, xext, libc
+
+
+# Xlib has one error handler for the whole process, and its default handler
+# exits the process. Swapping handlers around each request would race with
+# other threads' X connections (such as Tk's), so one handler is installed
+# the first time an XShmCapture is created and left in place. It records
+# the errors on XShmCapture displays, and passes the errors on every other
+# display to the handler that was installed before it.
+_errorHandler = None # The installed XErrorHandler, kept so the ctypes callback isn't garbage collected.
+_previousErrorHandler = None
+_displayErrors = {} # Maps each open XShmCapture display to the last X error code on it, or None.
+
+
+def _handleXError(display, errorEvent):
+    if display in _displayErrors:
+        _displayErrors[display] = errorEvent.contents.error_code
+        return 0
+    if _previousErrorHandler:
+        return XErrorHandler(_previousErrorHandler)(display, errorEvent)
+    return 0
+
+
+def _installErrorHandler():
+    global _errorHandler, _previousErrorHandler
+    if _errorHandler is None:
+        _errorHandler = XErrorHandler(_handleXError)
+        _previousErrorHandler = _x11.XSetErrorHandler(ctypes.cast(_errorHandler, c_void_p))
+
+
+class XShmCapture(object):
+    """Captures the screen (or a rectangular region of it) through the X
+    MIT-SHM extension.
+
+    The pixels returned by grab() and array() live in a shared memory segment
+    that is reused by the next capture, so they are only valid until then.
+    screenshot() returns an independent Pillow Image.
+
+    Raises NotImplementedError if the X server doesn't support MIT-SHM (for
+    example, over a forwarded SSH connection) or uses a pixel format other
+    than 32-bit BGRX."""
+
+    def __init__(self, displayName=None):
+        _loadLibraries()
+        _installErrorHandler()
+
+        if displayName is None:
+            displayName = os.environ.get('DISPLAY')
+        if displayName is None:
+            raise NotImplementedError('The DISPLAY environment variable is not set.')
+
+        self._lock = threading.Lock()
+        self._display = _x11.XOpenDisplay(displayName.encode('ascii'))
+        if not self._display:
+            raise NotImplementedError('Could not open X display %r.' % (displayName))
+
+        self._screen = _x11.XDefaultScreen(self._display)
+        self._root = _x11.XRootWindow(self._display, self._screen)
+        self._visual = _x11.XDefaultVisual(self._display, self._screen)
+        self._depth = _x11.XDefaultDepth(self._display, self._screen)
+        self._shmInfo = None
+        self._segmentSize = 0
+        self._images = {} # Maps (width, height) to an XImage header that points into the shared segment.
+        _displayErrors[self._display] = None
+
+        if not _xext.XShmQueryExtension(self._display):
+            self.close()
+            raise NotImplementedError('The X server does not support the MIT-SHM extension.')
+
+        try:
+            self._allocateSegment(self._screenSize())
+        except NotImplementedError:
+            self.close()
+            raise
+
+
+    def _callChecked(self, func, *args):
+        # Call an Xlib function and wait with XSync() until the X server has
+        # handled it, so any error it caused has reached _handleXError().
+        # Returns its result and the X error code, or None.
+        _displayErrors[self._display] = None
+        result = func(*args)
+        _x11.XSync(self._display, 0)
+        return result, _displayErrors[self._display]
+
+
+    def _screenSize(self):
+        return (_x11.XDisplayWidth(self._display, self._screen),
+                _x11.XDisplayHeight(self._display, self._screen))
+
+
+    def _createImage(self, width, height):
+        image = _xext.XShmCreateImage(self._display, self._visual, self._depth, ZPIXMAP,
+                                      None, ctypes.byref(self._shmInfo), width, height)
+        if not image:
+            raise NotImplementedError('XShmCreateImage() failed.')
+        contents = image.contents
+        if contents.bits_per_pixel != 32 or contents.byte_order != 0 or contents.red_mask != 0xff0000 \
+                or contents.green_mask != 0xff00 or contents.blue_mask != 0xff:
+            self._destroyImage(image)
+            raise NotImplementedError('Unsupported X pixel format for MIT-SHM capture.')
+        contents.data = self._shmInfo.shmaddr
+        return image
+
+
+    def _destroyImage(self, image):
+        # XShmCreateImage() images have a destroy_image function that frees
+        # only the XImage struct, not the shared memory it points to.
+        image.contents.data = None
+        XDestroyImageFunc(image.contents.destroy_image)(image)
+
+
+    def _allocateSegment(self, screenSize):
+        # Create a shared memory segment big enough for a full screen capture
+        # and attach it to both this process and the X server.
+        self._releaseSegment()
+
+        self._shmInfo = XShmSegmentInfo()
+        # Create a throwaway image first to learn how many bytes a full screen needs.
+        probe = _xext.XShmCreateImage(self._display, self._visual, self._depth, ZPIXMAP,
+                                      None, ctypes.byref(self._shmInfo), screenSize[0], screenSize[1])
+        if not probe:
+            raise NotImplementedError('XShmCreateImage() failed.')
+        segmentSize = probe.contents.bytes_per_line * probe.contents.height
+        self._destroyImage(probe)
+
+        shmId = _libc.shmget(IPC_PRIVATE, segmentSize, IPC_CREAT | 0o600)
+        if shmId == -1:
+            raise NotImplementedError('shmget() failed: %s' % (os.strerror(ctypes.get_errno())))
+        shmAddr = _libc.shmat(shmId, None, 0)
+        if shmAddr is None or shmAddr == SHMAT_FAILED:
+            _libc.shmctl(shmId, IPC_RMID, None)
+            raise NotImplementedError('shmat() failed: %s' % (os.strerror(ctypes.get_errno())))
+
+        self._shmInfo.shmid = shmId
+        self._shmInfo.shmaddr = shmAddr
+        self._shmInfo.readOnly = 0
+        attached, error = self._callChecked(_xext.XShmAttach, self._display, ctypes.byref(self._shmInfo))
+
+        # Now that both sides have attached, mark the segment for removal so
+        # that the kernel frees it even if this process crashes.
+        _libc.shmctl(shmId, IPC_RMID, None)
+
+        if not attached or error is not None:
+            _libc.shmdt(shmAddr)
+            self._shmInfo = None
+            raise NotImplementedError('XShmAttach() failed. (Is this a remote X connection?)')
+        self._segmentSize = segmentSize
+        self._screenDimensions = screenSize
+
+
+    def _releaseSegment(self):
+        for image in self._images.values():
+            self._destroyImage(image)
+        self._images = {}
+        if self._shmInfo is not None:
+            _xext.XShmDetach(self._display, ctypes.byref(self._shmInfo))
+            _x11.XSync(self._display, 0)
+            _libc.shmdt(self._shmInfo.shmaddr)
+            self._shmInfo = None
+            self._segmentSize = 0
+
+
+    def grab(self, region=None):
+        """Capture the screen, or the (left, top, width, height) region of it,
+        into the shared memory segment. Returns a (buffer, width, height,
+        bytesPerLine) tuple, where buffer is a ctypes array of BGRX bytes that
+        is overwritten by the next capture."""
+        with self._lock:
+            screenSize = self._screenSize()
+            if screenSize != self._screenDimensions:
+                # The screen was resized (e.g. by RandR), so the segment may be too small.
+                self._allocateSegment(screenSize)
+
+            if region is None:
+                left, top, width, height = 0, 0, screenSize[0], screenSize[1]
+            else:
+                left, top, width, height = region
+            if width <= 0 or height <= 0:
+                raise ValueError('region width and height must be positive: %r' % (region,))
+
+            image = self._images.get((width, height))
+            if image is None:
+                if len(self._images) >= 8:
+                    # Don't keep image headers around for every region size ever requested.
+                    self._destroyImage(self._images.pop(next(iter(self._images))))
+                image = self._createImage(width, height)
+                self._images[(width, height)] = image
+
+            ok, error = self._callChecked(_xext.XShmGetImage, self._display, self._root, image, left, top, ALL_PLANES)
+            if not ok or error is not None:
+                raise ValueError('XShmGetImage() failed for region %r (X error code %s).' % (region, error))
+
+            bytesPerLine = image.contents.bytes_per_line
+            buffer = (ctypes.c_char * (bytesPerLine * height)).from_address(self._shmInfo.shmaddr)
+            return buffer, width, height, bytesPerLine
+
+
+    def screenshot(self, region=None):
+        """Return a Pillow Image of the screen or of the given (left, top,
+        width, height) region. The X server writes into shared memory without
+        any copying; Pillow does one in-memory pass to turn the server's BGRX
+        bytes into an independent RGB Image."""
+        from PIL import Image
+        buffer, width, height, bytesPerLine = self.grab(region)
+        return Image.frombuffer('RGB', (width, height), buffer, 'raw', 'BGRX', bytesPerLine, 1)
+
+
+    def array(self, region=None):
+        """Return a zero-copy height x width x 3 NumPy RGB view of the shared
+        memory segment. The view is only valid until the next capture, so
+        call .copy() on it to keep the pixels."""
+        import numpy
+        buffer, width, height, bytesPerLine = self.grab(region)
+        bgrx = numpy.frombuffer(buffer, dtype=numpy.uint8).reshape(height, bytesPerLine // 4, 4)
+        return bgrx[:, :width, 2::-1] # Reversing the first three bytes of BGRX gives RGB.
+
+
+    def close(self):
+        """Detach and free the shared memory segment and close the X connection."""
+        if self._display:
+            with self._lock:
+                self._releaseSegment()
+                _x11.XCloseDisplay(self._display)
+                _displayErrors.pop(self._display, None)
+                self._display = None
+
+
+class PointerTracker(object):
+    """Follows the mouse pointer by listening for the X server's pointer
+    motion events with the RECORD extension, on connections that are
+    separate from the rest of MouseInfo.
+
+    position() returns the latest known position without a round trip to the
+    X server, and history() returns the most recent (serverTime, x, y) motion
+    events, including the ones between position() calls. serverTime is the
+    X server's timestamp in milliseconds. At most historySize events are
+    kept.
+
+    Raises NotImplementedError if the X server doesn't have the RECORD
+    extension."""
+
+    def __init__(self, displayName=None, historySize=10000):
+        from Xlib.display import Display
+
+        # RECORD needs two connections: the one that blocks while receiving
+        # the recorded events, and one to control the recording with.
+        self._controlDisplay = Display(displayName)
+        if not self._controlDisplay.has_extension('RECORD'):
+            self._controlDisplay.close()
+            raise NotImplementedError('The X server does not support the RECORD extension.')
+        self._recordDisplay = Display(displayName)
+
+        self._lock = threading.Lock()
+        self._history = collections.deque(maxlen=historySize)
+        self._context = None
+        self._thread = None
+
+        # Start with the current position, since there won't be any motion events until the mouse moves.
+        pointer = self._controlDisplay.screen().root.query_pointer()
+        self._position = (pointer.root_x, pointer.root_y)
+        self._timestamp = None
+
+
+    def start(self):
+        """Start listening for pointer motion events in a background thread."""
+        from Xlib import X
+        from Xlib.ext import record
+
+        if self._thread is not None:
+            return
+        self._context = self._controlDisplay.record_create_context(
+            0,
+            [record.AllClients],
+            [{'core_requests': (0, 0),
+              'core_replies': (0, 0),
+              'ext_requests': (0, 0, 0, 0),
+              'ext_replies': (0, 0, 0, 0),
+              'delivered_events': (0, 0),
+              'device_events': (X.MotionNotify, X.MotionNotify),
+              'errors': (0, 0),
+              'client_started': False,
+              'client_died': False}])
+        self._thread = threading.Thread(target=self._run, name='mouseinfo-pointer-tracker')
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def _run(self):
+        # record_enable_context() doesn't return until the context is disabled by stop().
+        self._recordDisplay.record_enable_context(self._context, self._handleReply)
+        self._recordDisplay.record_free_context(self._context)
+
+
+    def _handleReply(self, reply):
+        from Xlib import X
+        from Xlib.ext import record
+        from Xlib.protocol import rq
+
+        if reply.category != record.FromServer or reply.client_swapped:
+            return
+        data = reply.data
+        while len(data):
+            event, data = rq.EventField(None).parse_binary_value(data, self._recordDisplay.display, None, None)
+            if event.type == X.MotionNotify:
+                with self._lock:
+                    self._position = (event.root_x, event.root_y)
+                    self._timestamp = event.time
+                    self._history.append((event.time, event.root_x, event.root_y))
+
+
+    def position(self):
+        """Returns the (x, y) position from the latest pointer motion event."""
+        return self._position
+
+
+    def timestamp(self):
+        """Returns the X server timestamp (in milliseconds) of the latest
+        pointer motion event, or None if the pointer hasn't moved yet."""
+        return self._timestamp
+
+
+    def history(self):
+        """Returns a list of (serverTime, x, y) tuples for the recorded
+        pointer motion events, oldest first."""
+        with self._lock:
+            return list(self._history)
+
+
+    def clearHistory(self):
+        with self._lock:
+            self._history.clear()
+
+
+    def stop(self):
+        """Stop listening for pointer motion events and close the X connections."""
+        if self._thread is not None:
+            self._controlDisplay.record_disable_context(self._context)
+            self._controlDisplay.flush()
+            self._thread.join()
+            self._thread = None
+        self._controlDisplay.close()
+        self._recordDisplay.close()
+
+
+def _boundingArea(a, b):
+    # Returns the smallest (left, top, width, height) rectangle that contains both a and b.
+    left, top = min(a[0], b[0]), min(a[1], b[1])
+    return (left, top, max(a[0] + a[2], b[0] + b[2]) - left, max(a[1] + a[3], b[1] + b[3]) - top)
+
+
+class DamageSubscription(object):
+    """A region of the screen and the function a DamageMonitor calls when it
+    is drawn to. Returned by DamageMonitor.subscribe()."""
+
+    def __init__(self, monitor, region, callback):
+        self.region = region
+        self.callback = callback
+        self._monitor = monitor
+
+
+    def close(self):
+        """Stop calling this subscription's callback."""
+        self._monitor._unsubscribe(self)
+
+
+class DamageMonitor(object):
+    """Listens for the X server's reports (through the DAMAGE extension) of
+    which areas of the screen have been drawn to, on a connection separate
+    from the rest of MouseInfo. A background thread sleeps until a report
+    arrives and then calls the callback of every subscription whose region
+    was drawn to, so waiting for the screen to change takes no CPU time.
+
+    The X server reports the bounding box of everything drawn since the
+    damage was last cleared, and only when that box grows. The damage is
+    only cleared (with one round trip to the X server) once the box reaches
+    a subscribed region. So drawing that never touches a subscribed region,
+    such as a video playing elsewhere on the screen, stops being reported as
+    soon as its box stops growing. The price is that a callback can be
+    called for drawing that is near its region but not in it, and the X
+    server also reports drawing that leaves the pixels the same, so
+    callbacks should read the pixels again to see if they really changed.
+
+    An exception raised by a callback doesn't stop the reports for the
+    other subscriptions; the last one is kept in the lastError attribute.
+
+    Raises NotImplementedError if the X server doesn't have the DAMAGE
+    extension."""
+
+    def __init__(self, displayName=None):
+        from Xlib.display import Display
+        from Xlib.ext import damage
+
+        self._display = Display(displayName)
+        if not self._display.has_extension('DAMAGE'):
+            self._display.close()
+            raise NotImplementedError('The X server does not support the DAMAGE extension.')
+        # The X server rejects DAMAGE requests from clients that haven't asked for its version first.
+        self._display.damage_query_version()
+        self._notifyType = self._display.extension_event.DamageNotify
+        self._damage = self._display.screen().root.damage_create(damage.DamageReportBoundingBox)
+        self._display.flush()
+
+        self.lastError = None # The last exception raised by a callback, if any.
+        self._lock = threading.Lock()
+        self._subscriptions = []
+        self._damagedArea = None # The bounding box reported since the damage was last cleared, or None.
+        self._clearRequested = False # Set by subscribe(), since drawing inside an old bounding box isn't reported.
+        self._closing = False
+        self._wakeRead, self._wakeWrite = os.pipe() # subscribe() and close() write to this pipe to wake up the thread.
+        self._thread = threading.Thread(target=self._run, name='mouseinfo-damage-monitor')
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def subscribe(self, region, callback):
+        """Call callback() on this object's thread whenever any of the (left,
+        top, width, height) region is drawn to. Returns a DamageSubscription,
+        whose close() method stops the calls."""
+        subscription = DamageSubscription(self, tuple(region), callback)
+        with self._lock:
+            self._subscriptions.append(subscription)
+            self._clearRequested = True
+        os.write(self._wakeWrite, b'x')
+        return subscription
+
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+
+    def _run(self):
+        fileno = self._display.fileno()
+        while True:
+            readable = select.select([fileno, self._wakeRead], [], [])[0]
+            if self._wakeRead in readable:
+                os.read(self._wakeRead, 4096)
+                if self._closing:
+                    return
+            self._readReports()
+            with self._lock:
+                clear, self._clearRequested = self._clearRequested, False
+
+            # Clear the damage once it reaches a subscribed region (or a new
+            # subscription asked for it), then call the callbacks. The
+            # callbacks are called after the X server has cleared it, so
+            # anything drawn after they read the pixels is reported again.
+            # Reports that arrive before the clearing is done may be for
+            # drawing after it, so they start the next bounding box, and
+            # the damage is cleared again if that one reaches a subscribed
+            # region too.
+            while self._damagedArea is not None and (clear or self._overlapsSubscription(self._damagedArea)):
+                clear = False
+                area, self._damagedArea = self._damagedArea, None
+                self._display.damage_subtract(self._damage)
+                self._display.sync()
+                self._readReports()
+                if self._damagedArea is not None:
+                    area = _boundingArea(area, self._damagedArea)
+                self._callSubscriptions(area)
+
+
+    def _readReports(self):
+        # Merge the damage reports that have arrived into _damagedArea.
+        while True:
+            count = self._display.pending_events()
+            if not count:
+                return
+            for i in range(count):
+                event = self._display.next_event()
+                if event.type == self._notifyType:
+                    area = (event.area.x, event.area.y, event.area.width, event.area.height)
+                    self._damagedArea = area if self._damagedArea is None else _boundingArea(self._damagedArea, area)
+
+
+    def _overlapsSubscription(self, area):
+        with self._lock:
+            return any(mouseinfo._regionsOverlap(subscription.region, area) for subscription in self._subscriptions)
+
+
+    def _callSubscriptions(self, area):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if mouseinfo._regionsOverlap(subscription.region, area):
+                try:
+                    subscription.callback()
+                except Exception as e:
+                    self.lastError = e # A broken callback mustn't stop the reports for everyone else.
+
+
+    def close(self):
+        """Stop listening for damage reports and close the X connection."""
+        if self._thread is None:
+            return
+        self._closing = True
+        os.write(self._wakeWrite, b'x')
+        self._thread.join()
+        self._thread = None
+        self._display.damage_destroy(self._damage)
+        self._display.close()
+        os.close(self._wakeRead)
+        os.close(self._wakeWrite)
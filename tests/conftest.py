@@ -0,0 +1,37 @@
+import pytest
+import mouseinfo
+
+
+@pytest.fixture
+def testBackend():
+    """Returns a function that registers a CaptureBackend named 'test' with
+    the given keyword arguments, pins it for every operation it supports,
+    and returns it. Calling it again replaces the backend. The backend is
+    unregistered after the test."""
+    def useTestBackend(**kwargs):
+        backend = mouseinfo.CaptureBackend('test', **kwargs)
+        mouseinfo.registerBackend(backend)
+        mouseinfo.useBackend('test')
+        return backend
+
+    yield useTestBackend
+    if 'test' in [backend.name for backend in mouseinfo.getBackends()]:
+        mouseinfo.unregisterBackend('test')
+
+
+@pytest.fixture
+def bgrxBackend(testBackend):
+    """A 'test' backend whose rawPixels captures a 4x2 screen of BGRX pixels,
+    with 2 bytes of padding at the end of each row. The top row is (1, 2, 3)
+    and the bottom row is (4, 5, 6)."""
+    rows = bytearray(b'\x03\x02\x01\x00' * 4 + b'\x00\x00' + b'\x06\x05\x04\x00' * 4 + b'\x00\x00')
+    return testBackend(screenshot=lambda filename=None, region=None: None, region=True,
+                       rawPixels=lambda region: (rows, region[1] * 18 + region[0] * 4, 18, 'BGRX'))
+
+
+@pytest.fixture
+def fakeDisplay():
+    """Returns a function that calls useFakeDisplay() with its arguments and
+    returns the FakeDisplay. The operations are unpinned after the test."""
+    yield mouseinfo.useFakeDisplay
+    mouseinfo.useBackend(None)
@@ -1,10 +1,883 @@
 from __future__ import division, print_function
+import json, os, subprocess, sys, time
 import pytest
 import mouseinfo
 
+runningOnX11 = sys.platform.startswith('linux') and 'DISPLAY' in os.environ
+
+
 def test_basic():
     pass # TODO - add unit tests
 
 
+def test_importIsLazy():
+    # Importing mouseinfo shouldn't need a display, open a connection to one,
+    # or import any of the slow modules that are only needed later.
+    env = dict(os.environ)
+    env.pop('DISPLAY', None)
+    packageDir = os.path.dirname(os.path.dirname(os.path.abspath(mouseinfo.__file__)))
+    env['PYTHONPATH'] = os.pathsep.join([packageDir] + [path for path in [env.get('PYTHONPATH')] if path])
+    code = ('import sys, mouseinfo; '
+            'print(" ".join(sorted(name for name in sys.modules '
+            'if name.split(".")[0] in ("PIL", "tkinter", "Tkinter", "Xlib", "rubicon", "pyperclip"))))')
+    output = subprocess.check_output([sys.executable, '-c', code], env=env, universal_newlines=True)
+    assert output.strip() == ''
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='requires module __getattr__')
+def test_lazyModuleAttributes():
+    # The attributes that used to be set while importing mouseinfo are still there.
+    assert mouseinfo._PILLOW_INSTALLED is mouseinfo._pillowInstalled()
+    if sys.platform.startswith('linux'):
+        assert mouseinfo.scrotExists in (True, False) and mouseinfo.xwdExists in (True, False)
+    with pytest.raises(AttributeError):
+        mouseinfo.noSuchAttribute
+
+
+def test_useBackend():
+    testBackend = mouseinfo.CaptureBackend('test', position=lambda: (12, 34), getPixel=lambda x, y: (1, 2, 3))
+    mouseinfo.registerBackend(testBackend)
+    try:
+        assert testBackend.capabilities() == set(['position', 'singlePixel'])
+        mouseinfo.useBackend('test')
+        assert mouseinfo.position() == (12, 34)
+        assert mouseinfo.getPixel(0, 0) == (1, 2, 3)
+        assert mouseinfo.getBackendInfo()['position']['backend'] == 'test'
+        assert mouseinfo.getBackendInfo()['position']['pinned']
+
+        with pytest.raises(ValueError):
+            mouseinfo.useBackend('test', 'screenshot')
+    finally:
+        mouseinfo.unregisterBackend('test')
+    assert 'test' not in [backend.name for backend in mouseinfo.getBackends()]
+
+
+def test_fakeDisplay(fakeDisplay):
+    display = fakeDisplay(64, 48, color=(10, 20, 30), path=[(1, 2), (3, 4)])
+    assert mouseinfo.position() == (1, 2)
+    assert mouseinfo.position() == (3, 4)
+    assert mouseinfo.position() == (3, 4) # The mouse stays at the end of the path.
+    assert mouseinfo.size() == (64, 48)
+
+    display.fill((255, 0, 0), region=(2, 2, 4, 4))
+    display.setPixel(0, 0, (1, 2, 3))
+    assert mouseinfo.getPixel(3, 3) == (255, 0, 0)
+    assert mouseinfo.getPixel(0, 0) == (1, 2, 3)
+    assert mouseinfo.getPixel(10, 10) == (10, 20, 30)
+    assert mouseinfo.takeSample(points=[(5, 5), (64, 0)]).points == [(255, 0, 0), None]
+    with pytest.raises(ValueError):
+        mouseinfo.getPixel(64, 0)
+
+    if mouseinfo._pillowInstalled():
+        im = mouseinfo.screenshot(region=(1, 1, 4, 4))
+        assert im.size == (4, 4)
+        assert im.getpixel((0, 0)) == (10, 20, 30) and im.getpixel((1, 1)) == (255, 0, 0)
+        assert mouseinfo.screenshot().getpixel((0, 0)) == (1, 2, 3)
+
+    mouseinfo.useBackend(None)
+    assert not display.isAvailable() # The fake display isn't used unless it's pinned.
+
+
+def test_monitors(fakeDisplay):
+    # A 1920x1080 primary monitor, a 1280x1024 monitor to its left, and a
+    # 1920x1080 monitor above it, which leaves gaps where no monitor is.
+    monitors = [mouseinfo.Monitor(0, 0, 1920, 1080, 'a', True),
+                mouseinfo.Monitor(-1280, 0, 1280, 1024, 'b', False),
+                mouseinfo.Monitor(0, -1080, 1920, 1080, 'c', False)]
+    index = mouseinfo.MonitorIndex(monitors)
+    assert index.monitorAt(0, 0) is monitors[0]
+    assert index.monitorAt(1919, 1079) is monitors[0]
+    assert index.monitorAt(-1, 1023) is monitors[1]
+    assert index.monitorAt(-1, 1024) is None # Below the shorter monitor.
+    assert index.monitorAt(5, -1) is monitors[2]
+    assert index.monitorAt(-1, -1) is None
+    assert index.monitorAt(1920, 0) is None
+
+    display = fakeDisplay(300, 100, monitors=[(100, 0, 200, 100), (0, 0, 100, 60)])
+    display.fill((0, 0, 255), region=(0, 0, 100, 60))
+    display.moveTo(50, 30)
+    assert mouseinfo.takeSample().rgb == (0, 0, 255) # Colors are read on every monitor.
+    display.moveTo(50, 80)
+    assert mouseinfo.takeSample().rgb is None
+    assert mouseinfo.getMonitors()[0].primary and mouseinfo.getMonitors()[0].left == 100
+    assert mouseinfo.regionAround(98, 2, regionSize=9) == (91, 0, 9, 9) # Clipped to the second monitor.
+
+    display.setMonitors([(0, 0, 300, 100)])
+    assert mouseinfo.takeSample().rgb == (0, 0, 0)
+
+
+def test_stats(testBackend):
+    histogram = mouseinfo.LatencyHistogram()
+    for i in range(1, 101):
+        histogram.add(i / 1000) # 1 ms to 100 ms.
+    summary = histogram.summary()
+    assert summary['count'] == 100 and summary['max'] == 0.1
+    assert 0.05 <= summary['p50'] <= 0.05 * 1.13
+    assert 0.099 <= summary['p99'] <= 0.1
+
+    timings = []
+    testBackend(position=lambda: (1, 2))
+    try:
+        mouseinfo.position()
+        assert mouseinfo.getStats() == {} # Statistics are disabled by default.
+
+        mouseinfo.enableStats()
+        mouseinfo.addStatsHook(lambda name, seconds: timings.append(name))
+        for i in range(10):
+            mouseinfo.position()
+        assert mouseinfo.getStats()['position:test']['count'] == 10
+        assert json.loads(mouseinfo.exportStats())['timings']['position:test']['count'] == 10
+        assert timings == ['position:test'] * 10
+    finally:
+        del mouseinfo._statsHooks[:]
+        mouseinfo.disableStats()
+    assert not mouseinfo.statsEnabled()
+
+
+@pytest.mark.parametrize('useNumpy', [True, False])
+def test_getPixels(monkeypatch, fakeDisplay, useNumpy):
+    if useNumpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(mouseinfo, '_importNumpy', lambda: None)
+
+    display = fakeDisplay(64, 48, color=(10, 20, 30))
+    display.fill((1, 2, 3), region=(5, 5, 3, 3))
+    display.setPixel(60, 40, (9, 8, 7))
+    assert list(bytearray(mouseinfo.getPixels([(5, 5), (60, 40), (0, 0)]).tobytes())) == [1, 2, 3, 9, 8, 7, 10, 20, 30]
+    assert len(mouseinfo.getPixels([])) == 0
+
+    region = mouseinfo.getRegionPixels((4, 4, 5, 5))
+    assert list(bytearray(region.tobytes()))[:6] == [10, 20, 30, 10, 20, 30]
+    assert list(bytearray(region.tobytes()))[18:21] == [1, 2, 3] # The pixel at 5, 5.
+
+
+@pytest.mark.parametrize('useNumpy', [True, False])
+def test_getPixelsBgrx(monkeypatch, bgrxBackend, useNumpy):
+    if useNumpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(mouseinfo, '_importNumpy', lambda: None)
+
+    assert list(bytearray(mouseinfo.getPixels([(3, 0), (1, 1)]).tobytes())) == [1, 2, 3, 4, 5, 6]
+    assert list(bytearray(mouseinfo.getRegionPixels((2, 0, 2, 2)).tobytes())) == [1, 2, 3] * 2 + [4, 5, 6] * 2
+
+
+def test_pixelWatcher(fakeDisplay):
+    pytest.importorskip('numpy')
+    display = fakeDisplay(64, 48)
+    watcher = mouseinfo.createPixelWatcher()
+    point = watcher.watch((5, 5), color=(255, 0, 0), tolerance=10)
+    anyRed = watcher.watch((0, 0, 10, 10), color=(255, 0, 0), tolerance=10, mode='any')
+    changes = watcher.watch((20, 20, 4, 4), changes=True)
+    callbackEvents = []
+    bright = watcher.watch((30, 30, 2, 2), predicate=lambda pixels: pixels.mean() > 128, callback=callbackEvents.append)
+
+    assert [event.kind for event in watcher.poll()] == ['unmatch'] * 3 # changes has no condition to report.
+    assert watcher.poll() == []
+    assert not point.wait(timeout=0)
+
+    display.setPixel(5, 5, (250, 5, 0))
+    display.setPixel(21, 21, (1, 1, 1))
+    display.fill((255, 255, 255), region=(30, 30, 2, 2))
+    events = watcher.poll()
+    assert [(event.watch, event.kind) for event in events] == [(bright, 'match'), (point, 'match'), (anyRed, 'match'), (changes, 'change')]
+    assert events[1].pixels.tolist() == [[[250, 5, 0]]]
+    assert point.wait(timeout=0)
+    assert [event.watch for event in callbackEvents] == [bright, bright]
+    assert [watcher.events.get_nowait().watch for i in range(watcher.events.qsize())] == [point, anyRed, point, anyRed, changes]
+
+    watcher.unwatch(anyRed)
+    display.setPixel(5, 5, (0, 0, 0))
+    assert [(event.watch, event.kind) for event in watcher.poll()] == [(point, 'unmatch')]
+    assert watcher.ticks == 4
+
+
+def test_frameCache(fakeDisplay):
+    display = fakeDisplay(100, 70, color=(10, 20, 30))
+    cache = mouseinfo.getFrameCache()
+    cache.clear()
+    try:
+        # The first read captures the 64x64 tile around the pixel, and the others in it are free.
+        assert mouseinfo.getPixel(5, 5, maxAge=10) == (10, 20, 30)
+        assert (cache.hits, cache.misses, len(cache)) == (0, 1, 1)
+        assert mouseinfo.getPixel(63, 63, maxAge=10) == (10, 20, 30)
+        assert cache.hits == 1
+        generation = cache.generation
+        assert mouseinfo.getPixel(99, 69, maxAge=10) == (10, 20, 30)
+        assert cache.get((64, 64, 36, 6)).region == (64, 64, 36, 6) # Tiles are cut off at the edge of the screen.
+        assert cache.generation == generation + 1
+
+        # Changing the screen drops the frames under the change.
+        display.setPixel(6, 6, (1, 2, 3))
+        assert len(cache) == 1
+        assert mouseinfo.getPixel(6, 6, maxAge=10) == (1, 2, 3)
+
+        im = mouseinfo.screenshot(region=(0, 0, 10, 10), maxAge=10)
+        assert im.getpixel((6, 6)) == (1, 2, 3)
+        im.putpixel((6, 6), (0, 0, 0)) # Changing the returned Image doesn't change the cache.
+        assert mouseinfo.screenshot(maxAge=10).size == (100, 70)
+        assert mouseinfo.screenshot(region=(90, 60, 10, 10), maxAge=10).getpixel((0, 0)) == (10, 20, 30)
+        assert mouseinfo.getPixel(6, 6, maxAge=10) == (1, 2, 3)
+
+        cache.invalidate((0, 0, 1, 1))
+        assert len(cache) == 1 # Only the (64, 64, 36, 6) tile doesn't overlap.
+        assert mouseinfo.getPixel(1, 1, maxAge=0.000001) == (10, 20, 30) and cache.misses >= 5
+
+        cache.maxBytes = 100 * 70 * 3 - 1 # Too small for the whole screen.
+        mouseinfo.screenshot(maxAge=10)
+        assert cache.totalBytes <= cache.maxBytes
+
+        # Frames captured by another backend are never used.
+        assert mouseinfo.getPixel(70, 5, maxAge=10) == (10, 20, 30)
+        display = fakeDisplay(100, 70, color=(40, 50, 60))
+        assert mouseinfo.getPixel(70, 5, maxAge=10) == (40, 50, 60)
+    finally:
+        cache.maxBytes = 64 * 1024 * 1024
+        cache.clear()
+    assert cache.totalBytes == 0 and display._damageSubscriptions == []
+
+
+def test_framePool(fakeDisplay):
+    pool = mouseinfo.FrameBufferPool(maxIdle=2)
+    display = fakeDisplay(64, 48, color=(10, 20, 30))
+    with pool.screenshot() as frame:
+        assert frame.image.size == (64, 48) and frame.getPixel(63, 47) == (10, 20, 30)
+        kept = frame.keep()
+    with pytest.raises(ValueError):
+        frame.image
+
+    # Sustained capturing reuses the same Image.
+    display.setPixel(12, 11, (1, 2, 3))
+    for i in range(20):
+        with pool.screenshot((10, 10, 5, 5)) as frame:
+            assert frame.getPixel(12, 11) == (1, 2, 3)
+    assert (pool.allocations, pool.leases) == (2, 21)
+    assert kept.getpixel((12, 11)) == (10, 20, 30) # The kept copy didn't change.
+
+    frame = pool.screenshot((10, 10, 5, 5))
+    image = frame.image
+    frame.release()
+    frame.release()
+    assert pool.screenshot((0, 0, 5, 5)).image is image
+
+    assert mouseinfo.takeSample(region=(0, 0, 64, 48), points=[(12, 11), (100, 100)]).points == [(1, 2, 3), None]
+
+
+def test_framePoolBgrx(bgrxBackend):
+    # Backends that capture BGRX pixels are decoded straight into the leased Image.
+    with mouseinfo.leaseScreenshot((1, 0, 3, 2)) as frame:
+        assert [frame.getPixel(x, y) for x, y in ((1, 0), (3, 1))] == [(1, 2, 3), (4, 5, 6)]
+
+
+def test_framePoolWithoutRawPixels(testBackend):
+    # Backends without rawPixels lease a plain screenshot, which isn't reused.
+    from PIL import Image
+    testBackend(screenshot=lambda filename=None, region=None: Image.new('RGB', region[2:], (7, 8, 9)), region=True)
+    pool = mouseinfo.FrameBufferPool()
+    for i in range(2):
+        with pool.screenshot((0, 0, 5, 5)) as frame:
+            assert frame.getPixel(4, 4) == (7, 8, 9)
+    assert (pool.allocations, pool.leases) == (2, 2)
+
+
+def test_frameDiffer(fakeDisplay):
+    numpy = pytest.importorskip('numpy')
+    display = fakeDisplay(100, 70)
+    differ = mouseinfo.createFrameDiffer(tileSize=32)
+    assert differ.diff() == [(0, 0, 100, 70)]
+    assert differ.diff() == []
+
+    display.setPixel(99, 69, (1, 0, 0))
+    display.fill((255, 255, 255), region=(0, 0, 40, 40))
+    assert differ.diff() == [(0, 0, 64, 64), (96, 64, 4, 6)]
+    assert differ.changedTiles.tolist() == [[True, True, False, False], [True, True, False, False], [False, False, False, True]]
+
+    # Swapping two pixels within a tile changes its signature too.
+    display.setPixel(40, 40, (1, 2, 3))
+    differ.diff()
+    display.setPixel(40, 40, (0, 0, 0))
+    display.setPixel(41, 40, (1, 2, 3))
+    assert differ.diff() == [(32, 32, 32, 32)]
+
+    regionDiffer = mouseinfo.createFrameDiffer(tileSize=8, region=(10, 10, 20, 20))
+    regionDiffer.diff()
+    display.setPixel(29, 29, (9, 9, 9))
+    assert regionDiffer.diff() == [(26, 26, 4, 4)]
+
+    frame = numpy.zeros((20, 30, 3), dtype=numpy.uint8)
+    arrayDiffer = mouseinfo.createFrameDiffer(tileSize=8)
+    arrayDiffer.diff(frame)
+    frame[19, 0] = 1
+    assert arrayDiffer.diff(frame) == [(0, 16, 8, 4)]
+    assert arrayDiffer.diff(frame[:10]) == [(0, 0, 30, 10)] # A different size changes everything.
+
+
+def test_waitForPixel(fakeDisplay):
+    import threading
+    display = fakeDisplay(64, 48)
+    assert mouseinfo.getBackend('fake').capabilities() >= set(['damage'])
+    assert not mouseinfo.waitForPixel(5, 5, (255, 0, 0), timeout=0)
+    assert not mouseinfo.waitForRegionChange((0, 0, 10, 10), timeout=0)
+    assert display._damageSubscriptions == []
+
+    # Count the pixel reads, and signal the first one after each startWaiting().
+    reads = []
+    readDone = threading.Event()
+    def countReads(read):
+        def countingRead(*args):
+            pixels = read(*args)
+            reads.append(args)
+            readDone.set()
+            return pixels
+        return countingRead
+    display.getPixel, display.rawPixels = countReads(display.getPixel), countReads(display.rawPixels)
+
+    def startWaiting(wait, *args, **kwargs):
+        # Call wait() on a thread, and return once it has subscribed and
+        # read the pixels for the first time.
+        readDone.clear()
+        del reads[:]
+        results = []
+        thread = threading.Thread(target=lambda: results.append(wait(*args, **kwargs)))
+        thread.start()
+        assert readDone.wait(30)
+        return thread, results
+
+    # A change outside the watched region doesn't wake the waiter, and one
+    # inside does. The fake display calls the damage callbacks on the thread
+    # that draws, so the waiter is woken (or not) before setPixel() returns.
+    thread, results = startWaiting(mouseinfo.waitForPixel, 5, 5, (255, 0, 0), tolerance=10, timeout=30)
+    display.setPixel(20, 20, (255, 0, 0))
+    assert len(reads) == 1
+    display.fill((250, 5, 0), (4, 4, 2, 2))
+    thread.join(30)
+    assert results == [True] and len(reads) == 2
+
+    thread, results = startWaiting(mouseinfo.waitForRegionChange, (0, 0, 10, 10), timeout=30)
+    display.setPixel(20, 20, (1, 1, 1))
+    assert len(reads) == 1
+    display.setPixel(9, 9, (1, 1, 1))
+    thread.join(30)
+    assert results == [True] and len(reads) == 2
+    assert display._damageSubscriptions == []
+
+    # Without damage reports, the pixel is polled instead.
+    display.subscribeDamage = None
+    display.framebuffer[:3] = bytearray([7, 8, 9])
+    assert mouseinfo.waitForPixel(0, 0, (7, 8, 9), timeout=1)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='requires asyncio.run()')
+def test_waitForPixelAsync(fakeDisplay):
+    import asyncio
+
+    async def waitAndChange():
+        waiting = asyncio.ensure_future(mouseinfo.waitForPixelAsync(3, 3, (0, 255, 0), timeout=5))
+        changing = asyncio.ensure_future(mouseinfo.waitForRegionChangeAsync((0, 0, 8, 8), timeout=5))
+        await asyncio.sleep(0.05)
+        display.setPixel(3, 3, (0, 255, 0))
+        return await asyncio.gather(waiting, changing, mouseinfo.waitForPixelAsync(9, 9, (1, 1, 1), timeout=0.01))
+
+    display = fakeDisplay(16, 16)
+    assert asyncio.run(waitAndChange()) == [True, True, False]
+    assert display._damageSubscriptions == []
+
+
+def test_regionAround(testBackend):
+    testBackend(size=lambda: (100, 50))
+    assert mouseinfo.regionAround(50, 25, 9) == (46, 21, 9, 9)
+    assert mouseinfo.regionAround(0, 0, 9) == (0, 0, 9, 9)
+    assert mouseinfo.regionAround(99, 49, 9) == (91, 41, 9, 9)
+
+
+def test_sampler(testBackend):
+    # Drive the polling with made-up poll times instead of the sampler thread.
+    testBackend(position=lambda: (150, 5), size=lambda: (100, 50), getPixel=lambda x, y: (x, y, 0))
+    sampler = mouseinfo.Sampler(maxRate=100)
+    assert sampler._poll(10.0) == 0.01
+    sample = sampler.takeLatest()
+    assert (sample.timestamp, sample.x, sample.y) == (10.0, 150, 5)
+    assert sample.rgb is None # The mouse is outside of the screen.
+    assert sampler.takeLatest() is None
+    assert sampler.takeError() is None
+
+    # Errors are returned once by takeError().
+    def failingPosition():
+        raise OSError('no display')
+    testBackend(position=failingPosition, size=lambda: (100, 50))
+    sampler._poll(10.01)
+    assert sampler.takeLatest() is None
+    assert str(sampler.takeError()) == 'no display'
+    assert sampler.takeError() is None and sampler.lastError is None
+
+    # The thread calibrates before its first poll, even if it's stopped right away.
+    testBackend(position=lambda: (1, 2), size=lambda: (100, 50))
+    sampler = mouseinfo.Sampler(maxRate=100, readPixels=False, calibrate=True)
+    sampler.start()
+    sampler.stop()
+    assert 'test' in sampler.backendInfo['position']['costs']
+
+
+def test_windowUpdateDelay(monkeypatch):
+    # The window's refresh tick follows the sampler's next poll, but never
+    # runs more often than maxRate. (No window is opened for this.)
+    window = mouseinfo.MouseInfoWindow.__new__(mouseinfo.MouseInfoWindow)
+    window._updateInterval = 1000.0 / 60
+    window.sampler = mouseinfo.Sampler(maxRate=60)
+    monkeypatch.setattr(mouseinfo, '_timer', lambda: 100.0)
+    assert window._nextUpdateDelay() == 16 # The sampler hasn't polled yet.
+    window.sampler.nextPollTime = 100.5
+    assert window._nextUpdateDelay() == 501
+    window.sampler.nextPollTime = 99.0 # The sampler is still busy with a late poll.
+    assert window._nextUpdateDelay() == 16
+
+
+def test_samplerBackoff(fakeDisplay):
+    # Drive the polling with made-up poll times instead of the sampler thread.
+    display = fakeDisplay(64, 48, color=(1, 2, 3))
+    display.moveTo(5, 5)
+    reads = []
+    getPixel = display.getPixel
+    display.getPixel = lambda x, y: reads.append((x, y)) or getPixel(x, y)
+    sampler = mouseinfo.Sampler(maxRate=100, idleInterval=1000)
+    assert sampler._poll(10.0) == 0.01 and sampler.takeLatest().rgb == (1, 2, 3)
+
+    # While the mouse is still, the interval grows by half each poll up to
+    # idleInterval. The color is read once more when the sampler subscribes
+    # to the damage reports under the mouse, and never again while the
+    # screen doesn't change.
+    pollTime, intervals = 10.0, []
+    while pollTime < 30:
+        pollTime += intervals[-1] if intervals else 0.01
+        intervals.append(sampler._poll(pollTime))
+    assert intervals[:3] == pytest.approx([0.015, 0.0225, 0.03375])
+    assert intervals[-1] == 1.0
+    assert reads == [(5, 5), (5, 5)]
+    assert len(display._damageSubscriptions) == 1
+
+    # Drawing somewhere else doesn't wake the sampler, and drawing under the mouse does.
+    display.setPixel(20, 20, (9, 9, 9))
+    sampler._poll(pollTime + 1)
+    assert not sampler._wakeEvent.is_set() and len(reads) == 2
+    display.setPixel(5, 5, (7, 8, 9))
+    assert sampler._wakeEvent.is_set()
+    sampler._poll(pollTime + 1.1)
+    assert sampler.takeLatest().rgb == (7, 8, 9) and len(reads) == 3
+
+    # Moving the mouse goes straight back to maxRate and drops the subscription.
+    display.moveTo(6, 5)
+    assert sampler._poll(pollTime + 1.2) == 0.01 and sampler.takeLatest().x == 6
+    assert display._damageSubscriptions == []
+    assert sampler.polls == len(intervals) + 4
+
+    # Without damage reports, the color is read every pixelInterval instead.
+    display.subscribeDamage = None
+    del reads[:]
+    sampler = mouseinfo.Sampler(maxRate=100, idleInterval=1000, pixelInterval=5000)
+    for pollTime in range(100, 112):
+        sampler._poll(pollTime)
+    assert reads == [(6, 5)] * 3 # At 100, 105 and 110 seconds.
+
+
+def test_widgetRenderer():
+    class FakeVariable(object):
+        # Records set() calls the way a tkinter StringVar would receive them.
+        def __init__(self, name):
+            self.name = name
+            self.values = []
+        def __str__(self):
+            return self.name
+        def set(self, value):
+            self.values.append(value)
+        def configure(self, **options):
+            self.values.append(options)
+
+    xyVariable, colorFrame = FakeVariable('PY_VAR0'), FakeVariable('.colorFrame')
+    renderer = mouseinfo._WidgetRenderer()
+    for x in (1, 1, 2, 2, 2):
+        renderer.setVar(xyVariable, '%s,0' % (x))
+        renderer.configure(colorFrame, 'background', 'black')
+        renderer.endFrame()
+    assert xyVariable.values == ['1,0', '2,0']
+    assert colorFrame.values == [{'background': 'black'}]
+    assert (renderer.tclCalls, renderer.skippedCalls, renderer.redraws) == (3, 7, 2)
+
+
+def test_logBuffer():
+    logBuffer = mouseinfo.LogBuffer()
+    logBuffer.append('1,2')
+    logBuffer.append('3,4 (1, 2, 3) #010203')
+    assert len(logBuffer) == 2
+    assert logBuffer.entries[0].text == '1,2'
+    assert logBuffer.text() == '1,2\n3,4 (1, 2, 3) #010203\n'
+
+
+def test_logBufferTextWidget():
+    try:
+        mouseinfo._importTkinter()
+        root = mouseinfo.tkinter.Tk()
+    except Exception as e:
+        pytest.skip('tkinter cannot open a window here: %s' % (e,))
+    try:
+        textWidget = mouseinfo.tkinter.Text(root)
+        logBuffer = mouseinfo.LogBuffer(textWidget, maxDisplayLines=3)
+        for i in range(5):
+            logBuffer.append(str(i))
+        assert textWidget.get('1.0', 'end-1c') == '2\n3\n4\n'
+        assert logBuffer.text() == '0\n1\n2\n3\n4\n'
+    finally:
+        root.destroy()
+
+
+def test_logJournal(tmpdir):
+    journalFilename = str(tmpdir.join('journal.txt'))
+    with open(journalFilename, 'w') as fileObj:
+        fileObj.write('earlier session\n')
+    journal = mouseinfo.LogJournal(journalFilename, flushInterval=0.05, maxBytes=100, backupCount=10)
+    try:
+        logBuffer = mouseinfo.LogBuffer(journal=journal)
+        logBuffer.append('first line')
+        timeout = time.time() + 5
+        while os.path.getsize(journalFilename) == len('earlier session\n') and time.time() < timeout:
+            time.sleep(0.01) # Wait for the flushInterval to pass.
+        with open(journalFilename) as fileObj:
+            assert fileObj.read() == 'earlier session\nfirst line\n'
+
+        # A snapshot holds only this session's lines.
+        snapshotFilename = str(tmpdir.join('snapshot.txt'))
+        assert journal.snapshot(snapshotFilename).wait(5)
+        with open(snapshotFilename) as fileObj:
+            assert fileObj.read() == 'first line\n'
+
+        for i in range(50):
+            logBuffer.append('%s,%s' % (i, i))
+        journal.flush()
+        assert journal.rotations > 0
+        assert journal.backupFilenames()[-1] == journalFilename + '.1'
+
+        assert journal.snapshot(snapshotFilename).wait(5)
+        with open(snapshotFilename) as fileObj:
+            assert fileObj.read() == logBuffer.text()
+
+        # The journal's own files can't be overwritten by a snapshot.
+        for filename in (journalFilename, journalFilename + '.1', journalFilename + '.10'):
+            with pytest.raises(ValueError):
+                journal.snapshot(filename)
+        with open(journalFilename + '.1') as fileObj:
+            assert 'first line\n' in fileObj.read()
+    finally:
+        journal.close()
+    assert journal.lastError is None
+    with pytest.raises(ValueError):
+        journal.write('too late\n')
+
+
+class FakeClock(object):
+    # A clock for RateScheduler that only moves forward when it sleeps (or
+    # when a test moves it), so schedules don't depend on the machine's speed.
+    def __init__(self):
+        self.now = 100.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_rateScheduler():
+    clock = FakeClock()
+    scheduler = mouseinfo.RateScheduler(100, duration=0.1, clock=clock.time, sleep=clock.sleep)
+    deadlines = []
+    for deadline in scheduler:
+        deadlines.append(deadline)
+        if len(deadlines) == 3:
+            clock.now += 0.035 # This tick took three and a half periods, so the next two are skipped.
+    assert deadlines == pytest.approx([100.0, 100.01, 100.02, 100.05, 100.06, 100.07, 100.08, 100.09])
+    assert (scheduler.ticks, scheduler.skipped) == (8, 2)
+
+
+def test_headless(tmpdir, monkeypatch, capsys, testBackend):
+    from mouseinfo.__main__ import main
+
+    clock = FakeClock()
+    rateScheduler = mouseinfo.RateScheduler
+    monkeypatch.setattr(mouseinfo, 'RateScheduler', lambda rate, duration: rateScheduler(rate, duration, clock.time, clock.sleep))
+    testBackend(position=lambda: (1, 2), size=lambda: (100, 50), getPixel=lambda x, y: (x, y, 0))
+    outputFilename = str(tmpdir.join('samples.jsonl'))
+    main(['--headless', '--rate', '100', '--duration', '0.1', '--point', '3,4', '--point', '500,0', '-o', outputFilename])
+
+    with open(outputFilename) as fileObj:
+        records = [json.loads(line) for line in fileObj]
+    assert len(records) == 10
+    assert records[0] == {'t': 0, 'x': 1, 'y': 2, 'rgb': [1, 2, 0], 'points': [[3, 4, 0], None]}
+    assert records[-1]['t'] == 0.09
+
+    # --rate and --duration must be more than 0.
+    for badArgs in (['--rate', '0'], ['--rate', '-5'], ['--rate', 'fast'], ['--duration', '0'], ['--duration', 'nan']):
+        with pytest.raises(SystemExit) as excinfo:
+            main(['--headless'] + badArgs)
+        assert excinfo.value.code == 2
+    assert 'expected a number greater than 0' in capsys.readouterr().err
+
+
+def test_recording(tmpdir):
+    recordingFilename = str(tmpdir.join('session.mirec'))
+    with mouseinfo.createRecording(recordingFilename, rate=100) as recordingWriter:
+        for i in range(1000):
+            recordingWriter.write(mouseinfo.Sample(i / 100, i, -i, None if i % 10 == 0 else (i % 256, 2, 3)))
+        with pytest.raises(ValueError):
+            recordingWriter.write(mouseinfo.Sample(0, 0, 0, None)) # Timestamps can't go backwards.
+    with open(recordingFilename, 'ab') as fileObj:
+        fileObj.write(b'\x00' * 7) # A record that was cut off by a crash is ignored.
+
+    with mouseinfo.openRecording(recordingFilename) as recording:
+        assert recording.rate == 100
+        assert len(recording) == 1000
+        assert recording[0] == (0, 0, 0, 0, 0, 0, 1) # 1 is FLAG_NO_COLOR.
+        assert recording[-1] == (9.99, 999, -999, 999 % 256, 2, 3, 0)
+        assert list(recording.column('x')[10:13]) == [10, 11, 12]
+        assert recording.timeRange(1.0, 2.0) == (100, 200)
+        assert recording.timeRange(None, 0.005) == (0, 1)
+        assert recording.timeRange(20, None) == (1000, 1000)
+        assert [record[1] for record in recording.between(5.0, 5.03)] == [500, 501, 502]
+
+
+def test_trace(tmpdir):
+    from mouseinfo._mouseinfo_recording import TraceWriter
+
+    # A mouse that moves, sits still for a while, and passes over a few colors:
+    samples = []
+    for i in range(2000):
+        x, y = (min(i, 500), 7) if i < 1500 else (i - 1000, 9)
+        rgb = None if i % 300 == 0 else ((i // 50) % 6, 0, 255)
+        samples.append(mouseinfo.Sample(10 + i / 100 + (0.0002 if i % 3 else 0), x, y, rgb))
+
+    traceFilename = str(tmpdir.join('session.mitrc'))
+    with TraceWriter(traceFilename, rate=100, paletteSize=4) as traceWriter: # Colors cycle through the palette.
+        for sample in samples:
+            traceWriter.write(sample)
+    assert traceWriter.bytesWritten < 2000 * 20 / 10
+
+    with mouseinfo.openTrace(traceFilename) as trace:
+        assert trace.rate == 100
+        records = list(trace)
+    assert len(records) == 2000
+    for sample, record in zip(samples, records):
+        assert abs(record.timestamp - sample.timestamp) <= 0.0005 + 1e-9
+        assert (record.x, record.y) == (sample.x, sample.y)
+        assert record.flags == (1 if sample.rgb is None else 0)
+        assert (record.red, record.green, record.blue) == (sample.rgb or (0, 0, 0))
+
+    # A trace that was cut off ends before the incomplete record:
+    with open(traceFilename, 'rb') as fileObj:
+        data = fileObj.read()
+    with open(traceFilename, 'wb') as fileObj:
+        fileObj.write(data[:-1])
+    with mouseinfo.openTrace(traceFilename) as trace:
+        assert 0 < len(list(trace)) < 2000
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='requires asyncio.run()')
+def test_stream(testBackend):
+    import asyncio
+
+    captures = []
+    def testPosition():
+        captures.append(None)
+        return (1, 2)
+
+    async def consume(count):
+        samples = []
+        async with mouseinfo.stream(rate=200) as sampleStream:
+            async for sample in sampleStream:
+                samples.append(sample)
+                if len(samples) == count:
+                    break
+        return samples
+
+    async def consumeAll():
+        return await asyncio.gather(consume(10), consume(10), consume(10))
+
+    testBackend(position=testPosition, size=lambda: (100, 50), getPixel=lambda x, y: (x, y, 0))
+    results = asyncio.run(consumeAll())
+
+    assert [len(samples) for samples in results] == [10, 10, 10]
+    assert results[0][0].rgb == (1, 2, 0)
+    assert len(captures) < 20 # The three streams shared the same captures.
+
+
+def test_findRegressions(monkeypatch):
+    pytest.importorskip('numpy') # Some of the benchmark suites need it.
+    benchmarksDir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks')
+    monkeypatch.syspath_prepend(benchmarksDir)
+    import run_benchmarks
+
+    results = {'getpixel/getPixel': {'value': 0.003, 'unit': 's'},
+               'log/append()': {'value': 0.0001, 'unit': 's'},
+               'log/flush()': {'value': 0.0002, 'unit': 's'}}
+    thresholds = {'getpixel/getPixel': 0.002, 'log/*': 0.00015}
+    regressions = run_benchmarks.findRegressions(results, thresholds)
+    assert sorted((r['name'], r['reason']) for r in regressions) == [('getpixel/getPixel', 'threshold getpixel/getPixel'),
+                                                                     ('log/flush()', 'threshold log/*')]
+
+    # Against a baseline, results more than tolerance slower are regressions too.
+    baseline = {'log/append()': {'value': 0.00008, 'unit': 's'}, 'log/flush()': {'value': 0.00018, 'unit': 's'}}
+    regressions = run_benchmarks.findRegressions(results, baseline=baseline, tolerance=0.2)
+    assert [(r['name'], r['reason']) for r in regressions] == [('log/append()', 'baseline')]
+    assert regressions[0]['limit'] == pytest.approx(0.000096)
+    assert run_benchmarks.findRegressions(results, baseline=baseline, tolerance=0.5) == []
+
+    # Every pattern in thresholds.json names a suite that exists.
+    with open(run_benchmarks.DEFAULT_THRESHOLDS) as fileObj:
+        patterns = json.load(fileObj)['thresholds']
+    assert all(pattern.split('/')[0] in run_benchmarks.SUITES for pattern in patterns)
+
+
+@pytest.mark.skipif(not runningOnX11, reason='requires an X display')
+def test_xshmScreenshotMatchesGetPixel():
+    try:
+        im = mouseinfo._xshmScreenshot()
+    except NotImplementedError:
+        pytest.skip('X server does not support MIT-SHM')
+    assert im.size == mouseinfo.size()
+    assert im.getpixel((0, 0)) == mouseinfo._xlibGetPixel(0, 0)
+
+    region = mouseinfo._xshmScreenshot(region=(5, 6, 7, 8))
+    assert region.size == (7, 8)
+    assert region.getpixel((0, 0)) == mouseinfo._xlibGetPixel(5, 6)
+
+
+@pytest.mark.skipif(not runningOnX11, reason='requires an X display')
+def test_pointerTracking(testBackend):
+    from Xlib import X
+    from Xlib.display import Display
+    from Xlib.ext import xtest
+
+    try:
+        mouseinfo.startPointerTracking()
+    except NotImplementedError:
+        pytest.skip('X server does not support RECORD')
+    try:
+        display = Display()
+        for x, y in ((10, 20), (30, 40)):
+            xtest.fake_input(display, X.MotionNotify, x=x, y=y)
+        display.sync()
+
+        timeout = time.time() + 5
+        while mouseinfo.position() != (30, 40) and time.time() < timeout:
+            time.sleep(0.01)
+        assert mouseinfo.position() == (30, 40)
+        assert [(x, y) for serverTime, x, y in mouseinfo.getPointerHistory()][-2:] == [(10, 20), (30, 40)]
+        display.close()
+    finally:
+        mouseinfo.stopPointerTracking()
+    assert mouseinfo.getBackendInfo()['position']['backend'] is None
+
+    # A backend pinned before tracking started is pinned again afterwards.
+    testBackend(position=lambda: (1, 2))
+    mouseinfo.startPointerTracking()
+    mouseinfo.stopPointerTracking()
+    assert mouseinfo.position() == (1, 2)
+    assert mouseinfo.getBackendInfo()['position']['pinned']
+
+
+@pytest.mark.skipif(not runningOnX11, reason='requires an X display')
+def test_damageWaitForPixel():
+    import threading
+    from Xlib import X
+    from Xlib.display import Display
+
+    # Map a window, then paint it red while waitForPixel() waits for the
+    # X server's damage report.
+    display = Display()
+    screen = display.screen()
+    window = screen.root.create_window(10, 10, 20, 20, 0, screen.root_depth, background_pixel=screen.black_pixel,
+                                       override_redirect=True)
+    window.map()
+    display.sync()
+    try:
+        subscription = mouseinfo._xDamageSubscribe((10, 10, 20, 20), lambda: None)
+        if subscription is None:
+            pytest.skip('X server does not support DAMAGE')
+        subscription.close()
+        assert mouseinfo.waitForPixel(15, 15, (0, 0, 0), timeout=5)
+
+        def paint():
+            gc = window.create_gc(foreground=display.screen().default_colormap.alloc_color(65535, 0, 0).pixel)
+            window.fill_rectangle(gc, 0, 0, 20, 20)
+            display.sync()
+        threading.Timer(0.05, paint).start()
+        assert mouseinfo.waitForRegionChange((10, 10, 20, 20), timeout=5)
+        assert mouseinfo.waitForPixel(15, 15, (255, 0, 0), timeout=5)
+    finally:
+        window.destroy()
+        display.close()
+
+
+
+@pytest.mark.skipif(not runningOnX11, reason='requires an X display')
+def test_damageIgnoresOtherRegions():
+    import threading
+    from Xlib.display import Display
+
+    # Map two windows, and check that drawing in one of them only reaches
+    # the subscriptions (and waits) for that one.
+    display = Display()
+    screen = display.screen()
+    red = screen.default_colormap.alloc_color(65535, 0, 0).pixel
+    watchedWindow, otherWindow = [screen.root.create_window(left, 10, 20, 20, 0, screen.root_depth,
+                                                            background_pixel=screen.black_pixel, override_redirect=True)
+                                  for left in (10, 100)]
+    for window in (watchedWindow, otherWindow):
+        window.map()
+    display.sync()
+
+    def paint(window, color):
+        window.fill_rectangle(window.create_gc(foreground=color), 0, 0, 20, 20)
+        display.sync()
+
+    try:
+        subscription = mouseinfo._xDamageSubscribe((10, 10, 20, 20), lambda: None)
+        if subscription is None:
+            pytest.skip('X server does not support DAMAGE')
+        subscription.close()
+
+        watched, other = threading.Event(), threading.Event()
+        subscriptions = [mouseinfo._xDamageSubscribe((10, 10, 20, 20), watched.set),
+                         mouseinfo._xDamageSubscribe((100, 10, 20, 20), other.set)]
+        # Drawing before the subscriptions may still be reported once, so
+        # wait for a report about the other window before starting.
+        paint(otherWindow, screen.white_pixel)
+        assert other.wait(5)
+        watched.clear()
+        other.clear()
+
+        # The other window's report arriving shows the monitor has handled
+        # the drawing, and the watched window's subscription wasn't called.
+        paint(otherWindow, screen.black_pixel)
+        assert other.wait(5)
+        assert not watched.is_set()
+        paint(watchedWindow, screen.white_pixel)
+        assert watched.wait(5)
+        for subscription in subscriptions:
+            subscription.close()
+
+        # A wait ignores the other window, and wakes up for the watched one.
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(mouseinfo.waitForPixel(15, 15, (255, 0, 0), timeout=30)))
+        waiter.start()
+        paint(otherWindow, red)
+        assert mouseinfo.waitForPixel(105, 15, (255, 0, 0), timeout=5)
+        assert waiter.is_alive()
+        paint(watchedWindow, red)
+        waiter.join(30)
+        assert results == [True]
+    finally:
+        watchedWindow.destroy()
+        otherWindow.destroy()
+        display.close()
+
 if __name__ == '__main__':
     pytest.main()